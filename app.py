@@ -1,11 +1,13 @@
 # app.py
 import streamlit as st
-import tempfile
 import os
-from process_video import process_ride_video
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import json
+import time
+from job_manager import JobManager
+from upload_store import save_upload_to_disk, upload_suffix
+# pandas, plotly and the pipeline modules are imported where results are
+# shown (and the pipeline on the first submit, see job_manager.py), so the
+# page shell renders without paying for them
 
 # Page configuration
 st.set_page_config(
@@ -103,11 +105,21 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# How often the page reruns to poll a running analysis job (seconds)
+JOB_POLL_SECONDS = float(os.environ.get("RIDE_JOB_POLL_SECONDS", "1.0"))
+
+@st.cache_resource
+def get_job_manager():
+    """One worker pool per server process, shared by every session."""
+    return JobManager()
+
+job_manager = get_job_manager()
+
 # Initialize session state
 if 'results' not in st.session_state:
     st.session_state.results = None
-if 'processing' not in st.session_state:
-    st.session_state.processing = False
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
 if 'show_contact' not in st.session_state:
     st.session_state.show_contact = False
 if 'show_developer' not in st.session_state:
@@ -150,49 +162,21 @@ with st.sidebar:
     )
     
     if uploaded_file is not None:
-        if st.button("🚀 Analyze Video", type="primary", use_container_width=True):
-            st.session_state.processing = True
+        analysis_running = st.session_state.job_id is not None
+        if st.button("🚀 Analyze Video", type="primary", use_container_width=True,
+                     disabled=analysis_running):
             st.session_state.results = None
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
+            # Stream the upload to disk in chunks, hashing as we copy
+            # (the job deletes the file when done)
+            tmp_path, video_hash, _ = save_upload_to_disk(
+                uploaded_file, suffix=upload_suffix(uploaded_file.name)
+            )
             
-            try:
-                # Process video with progress
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                status_text.text("Initializing models...")
-                progress_bar.progress(10)
-                
-                status_text.text("Processing video frames...")
-                progress_bar.progress(30)
-                
-                results = process_ride_video(tmp_path)
-                progress_bar.progress(70)
-                
-                status_text.text("Generating recommendations...")
-                progress_bar.progress(90)
-                
-                if results:
-                    st.session_state.results = results
-                    progress_bar.progress(100)
-                    status_text.text("✅ Analysis complete!")
-                    st.success("Video analyzed successfully!")
-                else:
-                    st.error("Failed to process video. Please check the file format.")
-                
-            except Exception as e:
-                st.error(f"Error processing video: {str(e)}")
-            finally:
-                # Cleanup
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-                st.session_state.processing = False
-                progress_bar.empty()
-                status_text.empty()
+            # Hand the analysis to the background worker pool (answered from
+            # the shared result cache if this exact video was analysed before)
+            st.session_state.job_id = job_manager.submit(tmp_path, video_hash=video_hash)
+            st.rerun()
     
     st.markdown("---")
     st.markdown("### Quick Links")
@@ -370,11 +354,40 @@ if st.session_state.show_developer:
     This project is licensed under the MIT License - see the LICENSE file for details.
     """)
 
+# Pick up the result of a background analysis job
+job = None
+if st.session_state.job_id is not None:
+    job = job_manager.get_job(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+        st.warning("The analysis job expired. Please analyze the video again.")
+    elif job['status'] == 'done':
+        st.session_state.results = job['result']
+        st.session_state.job_id = None
+        if job['cached']:
+            st.success("Loaded a previous analysis of this video.")
+        else:
+            st.success("Video analyzed successfully!")
+    elif job['status'] == 'failed':
+        st.session_state.job_id = None
+        st.error(f"Error processing video: {job['error']}")
+
 # Main content area
-if st.session_state.processing:
+if st.session_state.job_id is not None:
     st.info("⏳ Processing video... This may take a few minutes depending on video length.")
+    st.progress(job['progress'])
+    if job['status'] == 'queued':
+        st.text(f"Queued (position {job.get('queue_position', 1)}) - waiting for a free worker...")
+    else:
+        st.text(job['message'])
     
 elif st.session_state.results:
+    import pandas as pd
+    import plotly.express as px
+    from sampling import format_report as format_sampling
+    from telemetry import format_report as format_telemetry
+    from two_tier import format_report as format_two_tier
+
     results = st.session_state.results
     
     # Verdict Section
@@ -543,6 +556,31 @@ STATISTICS BREAKDOWN
         mime="text/plain"
     )
     
+    # Per-window stage timings recorded during the analysis
+    if results.get('timing_profile'):
+        timing_summary = results['timing_profile']['summary']
+        with st.expander("⏱️ Processing Time Breakdown"):
+            timing_rows = [
+                {'Stage': stage, 'Seconds': round(seconds, 3)}
+                for stage, seconds in {**timing_summary['window_totals'],
+                                       **timing_summary['ride_stages']}.items()
+            ]
+            st.dataframe(pd.DataFrame(timing_rows), use_container_width=True, hide_index=True)
+            st.caption(f"{timing_summary['windows']} windows, "
+                       f"{timing_summary['wall_seconds']:.1f}s total wall time")
+            if results.get('sampling'):
+                st.caption(format_sampling(results['sampling']))
+            if results.get('two_tier'):
+                st.caption(format_two_tier(results['two_tier']))
+            if results.get('telemetry'):
+                st.caption(format_telemetry(results['telemetry']))
+        st.download_button(
+            label="⏱️ Download Timing Profile (JSON)",
+            data=json.dumps(results['timing_profile'], indent=2),
+            file_name="ride_timing_profile.json",
+            mime="application/json"
+        )
+    
 else:
     # Welcome screen
     st.info("👈 Please upload a video file in the sidebar to begin analysis.")
@@ -575,3 +613,7 @@ else:
         - Reduce accidents
         """)
 
+# Keep polling while a background job is queued or running
+if st.session_state.job_id is not None:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,8 @@
+"""
+Offline benchmarks for the ride-analysis pipeline.
+
+    python -m benchmarks.bench_pipeline --output bench_results/pipeline.json
+    python -m benchmarks.compare old.json new.json
+
+See benchmarks/README.md for details.
+"""
@@ -0,0 +1,163 @@
+# benchmarks/backend_parity.py
+"""
+Parity check between a detector backend and the ultralytics (PyTorch) path.
+
+Runs both backends on the same frames sampled from a ride video (or a
+synthetic one), matches detections one-to-one (same class, IoU >= --iou) and
+reports recall/precision of the candidate against ultralytics, the mean IoU
+of matched boxes and ms/frame of each backend.
+
+    python -m benchmarks.backend_parity --backend onnxruntime --video fixtures/short_ride.mp4
+    python -m benchmarks.backend_parity --backend openvino --threads 4 --frames 50
+
+Exits with status 1 if recall or precision falls below --min-match, so it can
+gate a backend change the same way compare.py gates a regression.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import new_result, write_result
+from benchmarks.synthetic_video import generate_synthetic_video
+
+
+def sample_frames(video_path, count, stride=15):
+    """Every `stride`-th frame (the window sampling step) up to `count` frames."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for idx in range(0, max(total, 1), stride):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+        if len(frames) >= count:
+            break
+    cap.release()
+    return frames
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays -> (N, M)."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_detections(ref, cand, iou_threshold=0.5):
+    """
+    Greedy one-to-one matching of (boxes, cls) pairs by IoU within a class.
+    Returns (matched, ref_count, cand_count, sum_of_matched_iou).
+    """
+    ref_boxes, ref_cls = ref
+    cand_boxes, cand_cls = cand
+    if not len(ref_boxes) or not len(cand_boxes):
+        return 0, len(ref_boxes), len(cand_boxes), 0.0
+    iou = box_iou(ref_boxes, cand_boxes)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0.0
+    matched, iou_sum = 0, 0.0
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        matched += 1
+        iou_sum += float(iou[i, j])
+        iou[i, :] = 0.0
+        iou[:, j] = 0.0
+    return matched, len(ref_boxes), len(cand_boxes), iou_sum
+
+
+def run_backend(name, frames, weights, threads=None, conf=None, **options):
+    from detector_backends import create_backend, DEFAULT_CONF
+    started = time.perf_counter()
+    backend = create_backend(name, weights=weights, intra_op_threads=threads,
+                             conf=conf or DEFAULT_CONF, **options)
+    init_s = time.perf_counter() - started
+    backend.detect(frames[0])  # warm-up
+    outputs = []
+    started = time.perf_counter()
+    for frame in frames:
+        boxes, cls, _ = backend.detect(frame)
+        outputs.append((boxes, cls))
+    ms_per_frame = 1000.0 * (time.perf_counter() - started) / len(frames)
+    return backend, outputs, {'init_s': init_s, 'ms_per_frame': ms_per_frame}
+
+
+def run(backend, frames, weights="yolov8n.pt", threads=None, iou_threshold=0.5, conf=None, **options):
+    """Returns the parity metrics of `backend` against the ultralytics path."""
+    _, ref_out, ref_perf = run_backend('ultralytics', frames, weights, threads, conf)
+    _, cand_out, cand_perf = run_backend(backend, frames, weights, threads, conf, **options)
+    matched = ref_total = cand_total = 0
+    iou_sum = 0.0
+    for ref, cand in zip(ref_out, cand_out):
+        m, r, c, s = match_detections(ref, cand, iou_threshold)
+        matched, ref_total, cand_total, iou_sum = matched + m, ref_total + r, cand_total + c, iou_sum + s
+    return {
+        'frames': len(frames),
+        'reference_detections': ref_total,
+        'candidate_detections': cand_total,
+        'matched': matched,
+        'recall': matched / ref_total if ref_total else 1.0,
+        'precision': matched / cand_total if cand_total else 1.0,
+        'mean_iou': iou_sum / matched if matched else None,
+        'reference_ms_per_frame': ref_perf['ms_per_frame'],
+        'candidate_ms_per_frame': cand_perf['ms_per_frame'],
+        'speedup': ref_perf['ms_per_frame'] / cand_perf['ms_per_frame'] if cand_perf['ms_per_frame'] else None,
+        'candidate_init_s': cand_perf['init_s'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a detector backend against the ultralytics path.")
+    parser.add_argument("--backend", default="onnxruntime", help="Candidate backend (onnxruntime, openvino)")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--model-path", help="Pre-exported model for the candidate (default: export once)")
+    parser.add_argument("--video", help="Ride video to sample frames from (default: synthetic 1280x720)")
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for both backends")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed for two boxes to match")
+    parser.add_argument("--conf", type=float, default=None,
+                        help="Confidence threshold for both backends (lower = more boxes compared)")
+    parser.add_argument("--min-match", type=float, default=0.95,
+                        help="Exit 1 if recall or precision is below this fraction")
+    parser.add_argument("--output", default=os.path.join("bench_results", "backend_parity.json"))
+    args = parser.parse_args(argv)
+
+    video = args.video or generate_synthetic_video(1280, 720, 10, 30, 5)
+    frames = sample_frames(video, args.frames)
+    if not frames:
+        print(f"No frames could be read from {video}")
+        return 1
+    options = {'model_path': args.model_path} if args.model_path else {}
+    metrics = run(args.backend, frames, args.weights, args.threads, args.iou, args.conf, **options)
+
+    result = new_result('backend_parity', {
+        'backend': args.backend, 'weights': args.weights, 'video': video,
+        'threads': args.threads, 'iou': args.iou, 'conf': args.conf,
+    })
+    result['scenarios'].append({'name': args.backend, 'params': {'backend': args.backend}, 'metrics': metrics})
+    write_result(result, args.output)
+
+    print(f"{args.backend} vs ultralytics on {metrics['frames']} frames: "
+          f"recall {metrics['recall']:.3f}, precision {metrics['precision']:.3f}, "
+          f"mean IoU {metrics['mean_iou'] or 0:.3f}")
+    print(f"  ms/frame: ultralytics {metrics['reference_ms_per_frame']:.1f}, "
+          f"{args.backend} {metrics['candidate_ms_per_frame']:.1f} ({metrics['speedup'] or 0:.2f}x)")
+    if min(metrics['recall'], metrics['precision']) < args.min_match:
+        print(f"PARITY FAILED: below {args.min_match:.2f}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
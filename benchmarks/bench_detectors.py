@@ -0,0 +1,150 @@
+# benchmarks/bench_detectors.py
+"""
+Microbenchmarks for the per-window heuristics in video_processor.py,
+measured in isolation from decoding, optical flow and YOLO.
+
+Each detector is driven over a synthetic scene sequence (see
+synthetic_scenes.py) exactly the way the window loop calls it: per-box
+detectors are looped over every box, whole-scene detectors are called once.
+
+    python -m benchmarks.bench_detectors --output bench_results/detectors.json
+    python -m benchmarks.bench_detectors --densities 5 50 --only detect_jaywalker
+    python -m benchmarks.bench_detectors --baseline bench_results/detectors_base.json --fail-above 15
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import new_result, write_result
+from benchmarks.synthetic_scenes import generate_scene_sequence
+from flow_stats import FlowIntegral
+
+
+def _per_box(method, needs_prev=False):
+    """Wraps a per-object detector in the same per-box loop process_video uses."""
+    def run(proc, scene, prev):
+        prev_boxes = prev.boxes if prev is not None else []
+        for idx, (box, label) in enumerate(zip(scene.boxes, scene.labels)):
+            prev_box = prev_boxes[idx] if idx < len(prev_boxes) else None
+            method(proc, box, label, prev_box, scene)
+    return run
+
+
+# name -> callable(proc, scene, prev_scene)
+DETECTOR_CASES = {
+    'classify_dhaka_vehicle': _per_box(
+        lambda p, box, label, prev_box, s: p.classify_dhaka_vehicle(label, box)),
+    'detect_pinch_point': lambda p, s, prev: p.detect_pinch_point(s.boxes, s.width),
+    '_calculate_center_gap': lambda p, s, prev: p._calculate_center_gap(s.boxes, s.width),
+    'detect_intentional_pinch_entry': lambda p, s, prev: p.detect_intentional_pinch_entry(
+        s.boxes, prev.boxes if prev is not None else [], s.flow_x, s.width),
+    'detect_leguna_brake': _per_box(
+        lambda p, box, label, prev_box, s: p.detect_leguna_brake(
+            box, label, ((box[2] - box[0]) - (prev_box[2] - prev_box[0])) / (prev_box[2] - prev_box[0])
+            if prev_box is not None and prev_box[2] > prev_box[0] else 0)),
+    'detect_wrong_way': _per_box(
+        lambda p, box, label, prev_box, s: p.detect_wrong_way(box, prev_box, s.width / 2)),
+    'detect_jaywalker': _per_box(
+        lambda p, box, label, prev_box, s: p.detect_jaywalker(box, s.flow) if label == 'person' else None),
+    'detect_jaywalkers': lambda p, s, prev: p.detect_jaywalkers(
+        s.box_array[[i for i, label in enumerate(s.labels) if label == 'person']],
+        FlowIntegral().set_flow(s.flow)),
+    'detect_bus_blockade': _per_box(
+        lambda p, box, label, prev_box, s: p.detect_bus_blockade(label, box, prev_box)),
+    'check_blind_spot_loitering': lambda p, s, prev: p.check_blind_spot_loitering(
+        s.boxes, s.labels, s.width),
+    'check_red_light': lambda p, s, prev: p.check_red_light(s.frame, s.boxes, s.labels, 'slow'),
+    'detect_gap_shooting': lambda p, s, prev: p.detect_gap_shooting('critical', 2.0, 0.5),
+    'detect_speed_breaker': lambda p, s, prev: p.detect_speed_breaker(s.flow),
+    'detect_weaving': lambda p, s, prev: p.detect_weaving(s.flow_x),
+    'detect_slalom_aggressive': lambda p, s, prev: p.detect_slalom_aggressive(
+        s.boxes, s.labels, s.flow_x, s.width),
+}
+
+DEFAULT_DENSITIES = (2, 10, 40, 100)
+
+
+def make_processor():
+    """A VideoProcessor with fresh detector state; the YOLO model is never loaded."""
+    from video_processor import VideoProcessor
+    return VideoProcessor(None)
+
+
+def time_detector(case, scenes, repeat=5):
+    """Returns per-window timings (microseconds) for one detector over the scene sequence."""
+    proc = make_processor()
+    per_pass = []
+    for _ in range(repeat):
+        proc.reset_state()
+        prev = None
+        started = time.perf_counter()
+        for scene in scenes:
+            case(proc, scene, prev)
+            prev = scene
+        per_pass.append(time.perf_counter() - started)
+    per_window = sorted(1e6 * t / len(scenes) for t in per_pass)
+    return {
+        'us_per_window': per_window[len(per_window) // 2],
+        'us_per_window_min': per_window[0],
+        'us_per_window_max': per_window[-1],
+    }
+
+
+def run(densities=DEFAULT_DENSITIES, windows=200, width=1280, height=720, repeat=5,
+        only=None, seed=0):
+    result = new_result('detectors', {
+        'densities': list(densities), 'windows': windows, 'width': width,
+        'height': height, 'repeat': repeat, 'seed': seed,
+    })
+    names = only or list(DETECTOR_CASES)
+    for density in densities:
+        needs_frames = 'check_red_light' in names
+        scenes = generate_scene_sequence(windows, density, width, height, seed=seed,
+                                         with_frames=needs_frames)
+        mean_boxes = sum(len(s.boxes) for s in scenes) / float(len(scenes))
+        for name in names:
+            metrics = time_detector(DETECTOR_CASES[name], scenes, repeat)
+            metrics['boxes_per_window'] = mean_boxes
+            result['scenarios'].append({
+                'name': f"{name}_d{density}",
+                'params': {'detector': name, 'density': density},
+                'metrics': metrics,
+            })
+            print(f"  {name:<32} d={density:<4} {metrics['us_per_window']:>10.1f} us/window")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark VideoProcessor detectors on synthetic scenes.")
+    parser.add_argument("--output", default=os.path.join("bench_results", "detectors.json"))
+    parser.add_argument("--densities", type=int, nargs="+", default=list(DEFAULT_DENSITIES),
+                        help="Average objects per window")
+    parser.add_argument("--windows", type=int, default=200, help="Scenes per sequence")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes per detector (median reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(DETECTOR_CASES), help="Subset of detectors")
+    parser.add_argument("--baseline", help="Earlier detectors.json to compare against")
+    parser.add_argument("--fail-above", type=float, default=None, metavar="PCT",
+                        help="With --baseline: exit 1 if any detector is slower by more than PCT percent")
+    args = parser.parse_args(argv)
+
+    result = run(args.densities, args.windows, args.width, args.height, args.repeat, args.only, args.seed)
+    write_result(result, args.output)
+
+    if args.baseline:
+        from benchmarks.compare import compare
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, result, args.fail_above)
+        if regressions:
+            print(f"\n{len(regressions)} detector regression(s) above {args.fail_above}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
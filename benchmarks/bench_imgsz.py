@@ -0,0 +1,132 @@
+# benchmarks/bench_imgsz.py
+"""
+Accuracy/throughput curve over detector input sizes.
+
+Runs the detector at each --sizes value on the same frames of a ride (every
+15th frame, as the window loop samples) and reports ms/frame, frames/s and
+how much of the full-resolution (largest size) detections each smaller size
+still finds. There is no ground truth for our rides, so the largest size is
+the reference: recall = matched / reference detections, precision = matched /
+detections at this size (same class, IoU >= --iou).
+
+    python -m benchmarks.bench_imgsz --video fixtures/reference_ride.mp4
+    python -m benchmarks.bench_imgsz --video ride.mp4 --backend onnxruntime --threads 4 \\
+        --markdown bench_results/imgsz_curve.md
+
+--markdown writes the curve as a table that can be pasted into the
+deployment notes, together with the machine and commit it was measured on.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+from benchmarks.backend_parity import match_detections, sample_frames
+from benchmarks.common import new_result, write_result
+
+DEFAULT_SIZES = (320, 480, 640)
+
+
+def measure_size(backend, frames, imgsz, weights="yolov8n.pt", threads=None):
+    """Returns (detections per frame, metrics) for one input size."""
+    from detector_backends import create_backend
+    detector = create_backend(backend, weights=weights, imgsz=imgsz, intra_op_threads=threads)
+    detector.prepare(frames[0].shape)
+    detector.detect(frames[0])  # warm-up
+    outputs = []
+    started = time.perf_counter()
+    for frame in frames:
+        boxes, cls, _ = detector.detect(frame)
+        outputs.append((boxes, cls))
+    elapsed = time.perf_counter() - started
+    counts = Counter()
+    for _, cls in outputs:
+        counts.update(detector.names.get(c, str(c)) for c in cls.tolist())
+    return outputs, {
+        'imgsz': imgsz,
+        'input_shape': list(detector.prepare(frames[0].shape).input_shape),
+        'ms_per_frame': 1000.0 * elapsed / len(frames),
+        'frames_per_s': len(frames) / elapsed if elapsed > 0 else 0.0,
+        'detections': sum(counts.values()),
+        'counts': dict(counts),
+    }
+
+
+def accuracy_against(reference, outputs, iou_threshold=0.5):
+    matched = ref_total = total = 0
+    for ref, out in zip(reference, outputs):
+        m, r, c, _ = match_detections(ref, out, iou_threshold)
+        matched, ref_total, total = matched + m, ref_total + r, total + c
+    return {
+        'recall_vs_reference': matched / ref_total if ref_total else 1.0,
+        'precision_vs_reference': matched / total if total else 1.0,
+    }
+
+
+def format_markdown(result):
+    config = result['config']
+    lines = [
+        f"Detector input size curve: backend `{config['backend']}`, {config['frames']} frames of "
+        f"`{os.path.basename(config['video'])}`, commit `{result['git_commit']}`, "
+        f"{result['machine'].get('processor')} x{result['machine'].get('cpu_count')}.",
+        f"Recall/precision are against imgsz={config['reference_imgsz']}.",
+        "",
+        "| imgsz | input (HxW) | ms/frame | frames/s | speedup | detections | recall | precision |",
+        "|------:|------------:|---------:|---------:|--------:|-----------:|-------:|----------:|",
+    ]
+    for scenario in result['scenarios']:
+        m = scenario['metrics']
+        lines.append(
+            f"| {m['imgsz']} | {m['input_shape'][0]}x{m['input_shape'][1]} | {m['ms_per_frame']:.1f} | "
+            f"{m['frames_per_s']:.1f} | {m['speedup_vs_reference']:.2f}x | {m['detections']} | "
+            f"{m['recall_vs_reference']:.3f} | {m['precision_vs_reference']:.3f} |")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy/throughput curve over detector input sizes.")
+    parser.add_argument("--video", required=True, help="Ride video to sample frames from")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--backend", default="ultralytics")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--output", default=os.path.join("bench_results", "imgsz.json"))
+    parser.add_argument("--markdown", metavar="PATH", help="Also write the curve as a markdown table")
+    args = parser.parse_args(argv)
+
+    frames = sample_frames(args.video, args.frames)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        return 1
+    sizes = sorted(set(args.sizes), reverse=True)
+    result = new_result('imgsz', {
+        'video': args.video, 'backend': args.backend, 'weights': args.weights, 'frames': len(frames),
+        'threads': args.threads, 'iou': args.iou, 'reference_imgsz': sizes[0],
+    })
+
+    reference = reference_metrics = None
+    for imgsz in sizes:
+        print(f"[imgsz] {imgsz} ...", flush=True)
+        outputs, metrics = measure_size(args.backend, frames, imgsz, args.weights, args.threads)
+        if reference is None:
+            reference, reference_metrics = outputs, metrics
+        metrics.update(accuracy_against(reference, outputs, args.iou))
+        metrics['speedup_vs_reference'] = reference_metrics['ms_per_frame'] / metrics['ms_per_frame']
+        result['scenarios'].append({'name': f"imgsz_{imgsz}", 'params': {'imgsz': imgsz}, 'metrics': metrics})
+    result['scenarios'].reverse()  # smallest (fastest) first
+
+    write_result(result, args.output)
+    table = format_markdown(result)
+    print("\n" + table)
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+            f.write(table)
+        print(f"Curve written to {args.markdown}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end throughput benchmark for the ride-analysis pipeline.
+
+Each scenario runs in a fresh process (so peak RSS is per scenario) over a
+deterministic synthetic video generated locally, or over a fixture video
+passed with --video. Nothing is downloaded, but the YOLO weights
+(yolov8n.pt) must already be present in the working directory.
+
+    python -m benchmarks.bench_pipeline --output bench_results/pipeline.json
+    python -m benchmarks.bench_pipeline --quick
+    python -m benchmarks.bench_pipeline --scenario 1920x1080:20:30:10 --repeat 3
+    python -m benchmarks.bench_pipeline --cameras
+
+--cameras runs the same 720p ride at the frame rates of common cameras
+(25/30 fps dashcams, 60/120 fps action cams). Windows are a fixed length of
+ride time, so compute per minute of ride should come out about the same for
+each; the per-camera table at the end shows the cost of each frame rate.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import time
+import tracemalloc
+import traceback
+
+from benchmarks.common import new_result, peak_rss_mb, percentile, write_result
+from benchmarks.synthetic_video import generate_synthetic_video
+
+# width, height, seconds, fps, object density
+DEFAULT_SCENARIOS = [
+    (640, 360, 10, 30, 3),
+    (1280, 720, 10, 30, 3),
+    (1920, 1080, 10, 30, 3),
+    (1280, 720, 10, 30, 20),
+    (1280, 720, 30, 30, 8),
+]
+QUICK_SCENARIOS = [
+    (640, 360, 4, 30, 3),
+]
+# Same ride, different cameras: only the frame rate changes
+CAMERA_SCENARIOS = [
+    (1280, 720, 10, 25, 3),
+    (1280, 720, 10, 30, 3),
+    (1280, 720, 10, 60, 3),
+    (1280, 720, 10, 120, 3),
+]
+
+
+def parse_scenario(text):
+    """'WxH:seconds:fps:density' -> tuple"""
+    try:
+        size, seconds, fps, density = text.split(':')
+        width, height = size.lower().split('x')
+        return int(width), int(height), float(seconds), int(fps), int(density)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WxH:seconds:fps:density, got {text!r}")
+
+
+def scenario_spec(width, height, seconds, fps, density):
+    return {
+        'name': f"{width}x{height}_{seconds:g}s_{fps}fps_d{density}",
+        'width': width, 'height': height, 'seconds': seconds, 'fps': fps, 'density': density,
+    }
+
+
+def _stage_stats(windows, stage):
+    values = [1000.0 * w.get(stage, 0.0) for w in windows]
+    return {
+        'mean_ms': statistics.fmean(values) if values else 0.0,
+        'p95_ms': percentile(values, 95),
+    }
+
+
+def _minor_faults():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+
+
+class AllocationProbe:
+    """
+    Progress callback that records, for every window, the peak of traced
+    allocations above the level at the end of the previous window. NumPy
+    arrays (and so every OpenCV output array) are traced by tracemalloc;
+    OpenCV's internal scratch memory is not, which is why minor page faults
+    are reported alongside.
+    """
+
+    def __init__(self):
+        self.window_bytes = []
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def __call__(self, event):
+        if event.stage != 'window':
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.window_bytes.append(max(0, peak - self._baseline))
+        self._baseline = current
+        tracemalloc.reset_peak()
+
+
+def measure_allocations(processor):
+    """One extra (untimed) pass under tracemalloc; returns per-window allocation stats in MB."""
+    processor.reset_state()
+    tracemalloc.start()
+    try:
+        probe = AllocationProbe()
+        processor.process_video(progress_callback=probe)
+    finally:
+        tracemalloc.stop()
+    values = [b / (1024.0 * 1024.0) for b in probe.window_bytes[1:]] or [0.0]  # first window warms caches
+    return {'mean_mb': statistics.fmean(values), 'p95_mb': percentile(values, 95), 'max_mb': max(values)}
+
+
+def run_scenario(spec, repeat=1):
+    """Runs one scenario in the current process and returns its metrics dict."""
+    import cv2
+    from video_processor import VideoProcessor
+    from text_generator import TextGenerator
+    from risk_model import RiskModel
+    from recommendations import RecommendationEngine
+    from instrumentation import RideTimingProfile, WINDOW_STAGES
+    from sampling import DEFAULT_WINDOW_SECONDS
+
+    video_path = spec.get('video') or generate_synthetic_video(
+        spec['width'], spec['height'], spec['seconds'], spec['fps'], spec['density'])
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    video_seconds = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    cap.release()
+
+    started = time.perf_counter()
+    processor = VideoProcessor(video_path, window_size=10, backend=spec.get('backend', 'ultralytics'),
+                               backend_options={'intra_op_threads': spec.get('threads')},
+                               reader=spec.get('reader', 'opencv'), decode_scale=spec.get('decode_scale'),
+                               sampling=spec.get('sampling', 'fixed'),
+                               window_seconds=spec.get('window_seconds') or DEFAULT_WINDOW_SECONDS,
+                               pipeline=spec.get('pipeline', 'inline'))
+    processor.load_model()
+    model_init_s = time.perf_counter() - started
+
+    runs = []
+    frame_data = None
+    profile = None
+    for run in range(max(1, repeat)):
+        if run > 0:
+            processor.reset_state()
+        profile = RideTimingProfile()
+        faults_before = _minor_faults()
+        started = time.perf_counter()
+        frame_data = processor.process_video(progress_callback=profile)
+        runs.append(time.perf_counter() - started)
+        faults = _minor_faults() - faults_before if faults_before is not None else None
+
+    wall_s = statistics.median(runs)
+    windows = len(frame_data)
+    ride_minutes = video_seconds / 60.0
+    window_alloc = measure_allocations(processor)
+
+    text_gen = TextGenerator()
+    passes = 20
+    started = time.perf_counter()
+    for _ in range(passes):
+        descriptions = [text_gen.generate_description(f) for f in frame_data]
+    text_us = 1e6 * (time.perf_counter() - started) / max(1, passes * windows)
+
+    risk_ai = RiskModel()
+    started = time.perf_counter()
+    risk_ai.train_mock_model()
+    risk_train_ms = 1000.0 * (time.perf_counter() - started)
+    started = time.perf_counter()
+    risk_predictions = risk_ai.predict_risk(descriptions) if descriptions else []
+    risk_predict_ms = 1000.0 * (time.perf_counter() - started)
+
+    rec_engine = RecommendationEngine()
+    stats = {}
+    started = time.perf_counter()
+    rec_engine.get_recommendations("CAUTION", stats, descriptions, frame_data)
+    recommendations_ms = 1000.0 * (time.perf_counter() - started)
+
+    return {
+        'video_seconds': video_seconds,
+        'fps': fps,
+        'window_frames': processor.sampling_report['interval'],
+        'window_seconds': processor.window_duration,
+        'windows': windows,
+        # Per minute of ride: constant across cameras when windows are time-based
+        'windows_per_ride_minute': windows / ride_minutes if ride_minutes > 0 else 0.0,
+        'compute_s_per_ride_minute': wall_s / ride_minutes if ride_minutes > 0 else 0.0,
+        'runs_s': runs,
+        'wall_s': wall_s,
+        'windows_per_s': windows / wall_s if wall_s > 0 else 0.0,
+        'realtime_factor': video_seconds / wall_s if wall_s > 0 else 0.0,
+        'model_init_s': model_init_s,
+        'peak_rss_mb': peak_rss_mb(),
+        # Memory churn: traced (NumPy/OpenCV output) allocation peak per window, the
+        # resulting allocation rate, and minor page faults (fresh pages touched)
+        'window_alloc_mb': window_alloc,
+        'alloc_rate_mb_per_s': window_alloc['mean_mb'] * windows / wall_s if wall_s > 0 else 0.0,
+        'minor_faults_per_window': faults / windows if faults is not None and windows else None,
+        'stages': {stage: _stage_stats(profile.windows, stage) for stage in WINDOW_STAGES},
+        'text_generation_us_per_window': text_us,
+        'risk_training_ms': risk_train_ms,
+        'risk_prediction_ms': risk_predict_ms,
+        'risk_prediction_us_per_window': 1000.0 * risk_predict_ms / max(1, len(risk_predictions)),
+        'recommendations_ms': recommendations_ms,
+    }
+
+
+def _scenario_worker(spec, repeat, threads, queue):
+    try:
+        if threads:
+            import cv2
+            cv2.setNumThreads(threads)
+        queue.put(('ok', run_scenario(spec, repeat)))
+    except Exception:
+        queue.put(('error', traceback.format_exc()))
+
+
+def run_isolated(spec, repeat=1, threads=None):
+    """Runs a scenario in a fresh spawned process so peak RSS is not shared."""
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_scenario_worker, args=(spec, repeat, threads, queue))
+    proc.start()
+    status, payload = queue.get()
+    proc.join()
+    if status != 'ok':
+        raise RuntimeError(f"Scenario {spec['name']} failed:\n{payload}")
+    return payload
+
+
+def print_camera_costs(scenarios):
+    """Per-camera cost table: frame rate, window length and compute per minute of ride."""
+    print(f"\n{'scenario':<34} {'fps':>6} {'window':>13} {'windows/min':>12} {'compute s/min':>14}")
+    for scenario in scenarios:
+        m = scenario['metrics']
+        window = f"{m['window_frames']} fr/{m['window_seconds']:.2f}s"
+        print(f"{scenario['name']:<34} {m['fps']:>6.2f} {window:>13} "
+              f"{m['windows_per_ride_minute']:>12.1f} {m['compute_s_per_ride_minute']:>14.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the full ride-analysis pipeline.")
+    parser.add_argument("--output", default=os.path.join("bench_results", "pipeline.json"))
+    parser.add_argument("--quick", action="store_true", help="Run a single small scenario")
+    parser.add_argument("--cameras", action="store_true",
+                        help="Run one 720p ride at 25/30/60/120 fps and compare cost per minute of ride")
+    parser.add_argument("--scenario", action="append", type=parse_scenario, default=[],
+                        metavar="WxH:SECONDS:FPS:DENSITY", help="Custom synthetic scenario (repeatable)")
+    parser.add_argument("--video", action="append", default=[],
+                        help="Also benchmark a local fixture video (repeatable)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario (median is reported)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="cv2.setNumThreads() and detector intra-op threads in each run (0 = default)")
+    parser.add_argument("--backend", default="ultralytics", help="Detector backend (see detector_backends.py)")
+    parser.add_argument("--reader", default="opencv", choices=("opencv", "ffmpeg", "auto"),
+                        help="Frame reader (see frame_readers.py)")
+    parser.add_argument("--decode-scale", type=float, default=None, help="Decode frames scaled by this factor")
+    parser.add_argument("--sampling", default="fixed", choices=("fixed", "keyframe"),
+                        help="Window plan (see sampling.py)")
+    parser.add_argument("--window-seconds", type=float, default=None,
+                        help="Window length in seconds of ride (default: sampling.DEFAULT_WINDOW_SECONDS)")
+    parser.add_argument("--pipeline", default="inline", choices=("inline", "processes"),
+                        help="Decode and flow inline, or in processes ahead of inference (see frame_transport.py)")
+    args = parser.parse_args(argv)
+
+    defaults = CAMERA_SCENARIOS if args.cameras else (QUICK_SCENARIOS if args.quick else DEFAULT_SCENARIOS)
+    specs = [scenario_spec(*s) for s in (args.scenario or defaults)]
+    for video in args.video:
+        specs.append({'name': f"fixture_{os.path.basename(video)}", 'video': os.path.abspath(video)})
+
+    result = new_result('pipeline', {'repeat': args.repeat, 'threads': args.threads, 'backend': args.backend,
+                                     'reader': args.reader, 'decode_scale': args.decode_scale,
+                                     'sampling': args.sampling, 'window_seconds': args.window_seconds,
+                                     'pipeline': args.pipeline})
+    for spec in specs:
+        spec.update(backend=args.backend, threads=args.threads or None, reader=args.reader,
+                    decode_scale=args.decode_scale, sampling=args.sampling, window_seconds=args.window_seconds,
+                    pipeline=args.pipeline)
+        print(f"[bench] {spec['name']} ...", flush=True)
+        metrics = run_isolated(spec, repeat=args.repeat, threads=args.threads or None)
+        print(f"        {metrics['windows']} windows, {metrics['windows_per_s']:.2f} windows/s, "
+              f"{metrics['realtime_factor']:.2f}x realtime, peak RSS {metrics['peak_rss_mb'] or 0:.0f} MB")
+        print(f"        allocations {metrics['window_alloc_mb']['mean_mb']:.1f} MB/window "
+              f"({metrics['alloc_rate_mb_per_s']:.0f} MB/s), "
+              f"{metrics['minor_faults_per_window'] or 0:.0f} minor faults/window")
+        result['scenarios'].append({'name': spec['name'], 'params': spec, 'metrics': metrics})
+
+    print_camera_costs(result['scenarios'])
+    write_result(result, args.output)
+    return result
+
+
+if __name__ == "__main__":
+    main()
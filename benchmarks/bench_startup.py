@@ -0,0 +1,185 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start import-time report for the entry points.
+
+Each target runs in a fresh interpreter: once per --repeat for wall time, and
+once more under `python -X importtime` for a per-package breakdown. The
+breakdown lists the packages imported at the top level with their cumulative
+import time, and which heavy dependencies (OpenCV, PyTorch, ultralytics,
+scikit-learn, pandas, plotly) got loaded at all.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget 1.0 --top 15 --output bench_results/startup.json
+
+Targets:
+    app_shell        the top-level imports of app.py: what the Streamlit page
+                     pays before it can draw (models and charts load later)
+    main_help        main.py --help
+    pipeline_import  import process_video (what the first submit pays)
+    first_analysis   process_video plus scikit-learn and ultralytics: the
+                     imports deferred to the first analysis
+
+"Cold" means a new process; the OS file cache is warm after the first run,
+so the first repeat is usually the slowest. --budget makes the run exit 1
+when app_shell's median wall time is above it.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import REPO_ROOT, new_result, write_result
+
+HEAVY_MODULES = ('cv2', 'torch', 'ultralytics', 'sklearn', 'pandas', 'plotly', 'streamlit')
+DEFAULT_BUDGET_S = 1.0
+_MARKER = "@@startup@@"
+
+# Run at the end of every target: reports heavy modules loaded and imports
+# that failed because a dependency is not installed
+_EPILOGUE = f"""
+import json as _json, sys as _sys
+print({_MARKER!r} + _json.dumps({{
+    'heavy_loaded': [m for m in {HEAVY_MODULES!r} if m in _sys.modules],
+    'missing': list(dict.fromkeys(_missing)),
+}}))
+"""
+
+
+def _guarded(statements):
+    """Source running each import statement, recording ModuleNotFoundError instead of failing."""
+    lines = ["_missing = []"]
+    for statement in statements:
+        lines.append("try:")
+        lines.extend("    " + line for line in statement.splitlines())
+        lines.append("except ModuleNotFoundError as _e:")
+        lines.append("    _missing.append(_e.name)")
+    return "\n".join(lines)
+
+
+def app_imports(path=os.path.join(REPO_ROOT, "app.py")):
+    """The top-level import statements of app.py, as source."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return [ast.get_source_segment(source, node) for node in tree.body
+            if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def target_sources():
+    """name -> Python source run by the child interpreter (cwd = repo root)."""
+    main_help = ("import runpy, sys\n"
+                 "sys.argv = ['main.py', '--help']\n"
+                 "try:\n"
+                 "    runpy.run_path('main.py', run_name='__main__')\n"
+                 "except SystemExit:\n"
+                 "    pass")
+    return {
+        'app_shell': _guarded(app_imports()),
+        'main_help': _guarded([main_help]),
+        'pipeline_import': _guarded(["import process_video"]),
+        'first_analysis': _guarded(["import process_video",
+                                    "from risk_model import RiskModel\nRiskModel()",
+                                    "import ultralytics"]),
+    }
+
+
+def _run(source, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", source + _EPILOGUE]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup target failed:\n{proc.stderr[-2000:]}")
+    info = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith(_MARKER):
+            info = json.loads(line[len(_MARKER):])
+    return wall, info, proc.stderr
+
+
+def parse_importtime(stderr):
+    """
+    Top-level imports from `-X importtime` output, merged per root package:
+    [(package, cumulative_ms, self_ms)] sorted slowest first.
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2]
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        root = name.strip().split(".")[0]
+        cumulative_ms, self_ms = int(parts[1]) / 1000.0, int(parts[0]) / 1000.0
+        entry = packages.setdefault(root, [0.0, 0.0])
+        entry[1] += self_ms
+        if level == 0:
+            entry[0] += cumulative_ms
+    rows = [(name, cum, own) for name, (cum, own) in packages.items() if cum > 0]
+    return sorted(rows, key=lambda row: -row[1])
+
+
+def measure(source, repeat=3, top=10):
+    """Wall time over `repeat` fresh interpreters plus one -X importtime breakdown."""
+    runs = []
+    info = {}
+    for _ in range(max(1, repeat)):
+        wall, info, _ = _run(source)
+        runs.append(wall)
+    _, _, stderr = _run(source, importtime=True)
+    rows = parse_importtime(stderr)
+    return {
+        'wall_s': statistics.median(runs),
+        'runs_s': runs,
+        'import_s': sum(cum for _, cum, _ in rows) / 1000.0,
+        'top_imports': [{'package': p, 'cumulative_ms': cum, 'self_ms': own} for p, cum, own in rows[:top]],
+        'heavy_loaded': info.get('heavy_loaded', []),
+        'missing': info.get('missing', []),
+    }
+
+
+def print_report(name, metrics):
+    line = f"{name:<16} {metrics['wall_s']:6.2f}s wall, {metrics['import_s']:5.2f}s in imports"
+    if metrics['heavy_loaded']:
+        line += f"; loads {', '.join(metrics['heavy_loaded'])}"
+    if metrics['missing']:
+        line += f"; not installed (not measured): {', '.join(metrics['missing'])}"
+    print(line)
+    for row in metrics['top_imports']:
+        print(f"    {row['package']:<28} {row['cumulative_ms']:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold-start import time of the entry points.")
+    parser.add_argument("--output", default=os.path.join("bench_results", "startup.json"))
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per target (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed per target")
+    parser.add_argument("--only", nargs="+", choices=sorted(target_sources()), help="Subset of targets")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_S, metavar="SECONDS",
+                        help="Exit 1 if app_shell's median wall time is above this")
+    args = parser.parse_args(argv)
+
+    result = new_result('startup', {'repeat': args.repeat, 'budget_s': args.budget})
+    for name, source in target_sources().items():
+        if args.only and name not in args.only:
+            continue
+        metrics = measure(source, args.repeat, args.top)
+        print_report(name, metrics)
+        result['scenarios'].append({'name': name, 'params': {}, 'metrics': metrics})
+    write_result(result, args.output)
+
+    shell = next((s['metrics'] for s in result['scenarios'] if s['name'] == 'app_shell'), None)
+    if shell is not None and shell['wall_s'] > args.budget:
+        print(f"\napp_shell cold start {shell['wall_s']:.2f}s is over the {args.budget:g}s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
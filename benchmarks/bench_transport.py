@@ -0,0 +1,196 @@
+# benchmarks/bench_transport.py
+"""
+Frame transport benchmark: shared-memory ring (frame_transport.FrameRing)
+against a multiprocessing.Queue of ndarrays.
+
+A producer process sends windows the way WindowPipeline's stages do: two
+BGR frames and a float32 flow field per window. The main process consumes
+them. Both transports hold at most --slots windows in flight, so both have
+back-pressure. The queue pickles each window through a pipe, while the
+ring passes a slot number and the consumer reads the producer's memory.
+
+    python -m benchmarks.bench_transport
+    python -m benchmarks.bench_transport --sizes 1280x720 1920x1080 3840x2160 --windows 200
+    python -m benchmarks.bench_transport --consumer-ms 0 40 --output bench_results/transport.json
+
+--consumer-ms is per-window work simulated in the consumer (inference and
+detectors). With 0 the transport is the bottleneck. With a slow consumer,
+the producer blocks and producer_blocked_s shows the back-pressure; a
+transport that copies less leaves more CPU for the stages.
+
+Metrics per transport and scenario: windows/s and MB/s delivered, latency
+from send to receive (p50/p95, ms), the time the producer spent blocked
+on a full transport, and the producer's and consumer's CPU time.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from benchmarks.common import new_result, percentile, write_result
+from frame_transport import DEFAULT_SLOTS, FrameRing
+
+TRANSPORTS = ('queue', 'ring')
+DEFAULT_SIZES = ((1920, 1080),)
+
+
+def window_fields(width, height):
+    """One window as WindowPipeline sends it, plus its send time."""
+    return {
+        'frame1': ((height, width, 3), np.uint8),
+        'frame2': ((height, width, 3), np.uint8),
+        'flow': ((height, width, 2), np.float32),
+        'sent': ((1,), np.float64),
+    }
+
+
+def _fill(arrays, n):
+    """Stands in for decoding/flow: writes every byte, like a decoder would."""
+    arrays['frame1'].fill(n % 251)
+    arrays['frame2'].fill((n + 1) % 251)
+    arrays['flow'].fill(n)
+
+
+def _touch(arrays):
+    """Stands in for reading the window: samples the data so it is really delivered."""
+    return int(arrays['frame1'][::64, ::64, 0].sum()) + float(arrays['flow'][::64, ::64, 0].sum())
+
+
+def _queue_producer(q, stats, width, height, windows):
+    fields = window_fields(width, height)
+    blocked = 0.0
+    for n in range(windows):
+        # A fresh window each time, as a decoder without a shared buffer must
+        arrays = {name: np.empty(shape, dtype) for name, (shape, dtype) in fields.items() if name != 'sent'}
+        _fill(arrays, n)
+        arrays['sent'] = time.perf_counter()
+        started = time.perf_counter()
+        q.put(arrays)
+        blocked += time.perf_counter() - started
+    q.put(None)
+    stats.put({'producer_blocked_s': blocked, 'producer_cpu_s': time.process_time()})
+
+
+def _ring_producer(ring, stats, windows):
+    blocked = 0.0
+    for n in range(windows + 1):
+        started = time.perf_counter()
+        slot = ring.acquire(0)
+        blocked += time.perf_counter() - started
+        views = ring.views(slot)
+        if n < windows:
+            _fill(views, n)
+        ring.meta[slot, 0] = n if n < windows else -1
+        views['sent'][0] = time.perf_counter()
+        ring.release(0)
+    stats.put({'producer_blocked_s': blocked, 'producer_cpu_s': time.process_time()})
+
+
+def run_transport(transport, width, height, windows, slots=DEFAULT_SLOTS, consumer_ms=0.0):
+    """Sends `windows` windows through one transport; returns its metrics dict."""
+    ctx = mp.get_context('spawn')
+    fields = window_fields(width, height)
+    window_bytes = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in fields.values())
+    stats = ctx.Queue()
+    ring = None
+    if transport == 'ring':
+        ring = FrameRing(fields, slots, stages=2, ctx=ctx)
+        producer = ctx.Process(target=_ring_producer, args=(ring, stats, windows))
+    else:
+        q = ctx.Queue(maxsize=slots)
+        producer = ctx.Process(target=_queue_producer, args=(q, stats, width, height, windows))
+
+    producer.start()
+    latencies = []
+    checksum = 0.0
+    cpu_started = time.process_time()
+    started = None
+    while True:
+        if ring is not None:
+            slot = ring.acquire(1)
+            views = ring.views(slot)
+            received = time.perf_counter()
+            if ring.meta[slot, 0] < 0:
+                ring.release(1)
+                break
+            sent = views['sent'][0]
+        else:
+            views = q.get()
+            received = time.perf_counter()
+            if views is None:
+                break
+            sent = views['sent']
+        started = started or received  # from the first delivery: excludes process start-up
+        latencies.append(1000.0 * (received - sent))
+        checksum += _touch(views)
+        if consumer_ms:
+            time.sleep(consumer_ms / 1000.0)
+        if ring is not None:
+            ring.release(1)
+    elapsed = time.perf_counter() - started
+    consumer_cpu = time.process_time() - cpu_started
+    producer_stats = stats.get()
+    producer.join()
+    if ring is not None:
+        ring.close()
+
+    delivered = len(latencies)
+    per_s = (delivered - 1) / elapsed if elapsed > 0 and delivered > 1 else 0.0
+    return {
+        'windows': delivered,
+        'window_mb': window_bytes / 1e6,
+        'windows_per_s': per_s,
+        'mb_per_s': per_s * window_bytes / 1e6,
+        'latency_ms': {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95),
+                       'max': max(latencies) if latencies else 0.0},
+        'producer_blocked_s': producer_stats['producer_blocked_s'],
+        'producer_cpu_s': producer_stats['producer_cpu_s'],
+        'consumer_cpu_s': consumer_cpu,
+        'in_flight_mb': slots * window_bytes / 1e6,
+        'checksum': checksum,
+    }
+
+
+def parse_size(text):
+    try:
+        width, height = text.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WxH, got {text!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare shared-memory ring and queue-of-ndarray frame transport.")
+    parser.add_argument("--output", default=os.path.join("bench_results", "transport.json"))
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=list(DEFAULT_SIZES), metavar="WxH")
+    parser.add_argument("--windows", type=int, default=100, help="Windows sent per scenario")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Windows in flight (ring slots / queue size)")
+    parser.add_argument("--consumer-ms", nargs="+", type=float, default=[0.0, 40.0],
+                        help="Simulated per-window consumer work, one scenario each")
+    args = parser.parse_args(argv)
+
+    result = new_result('transport', {'windows': args.windows, 'slots': args.slots})
+    print(f"{'scenario':<28} {'windows/s':>10} {'MB/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'blocked s':>10} {'prod cpu s':>11} {'cons cpu s':>11}")
+    for width, height in args.sizes:
+        for consumer_ms in args.consumer_ms:
+            for transport in TRANSPORTS:
+                name = f"{transport}_{width}x{height}_c{consumer_ms:g}ms"
+                metrics = run_transport(transport, width, height, args.windows, args.slots, consumer_ms)
+                print(f"{name:<28} {metrics['windows_per_s']:>10.1f} {metrics['mb_per_s']:>8.0f} "
+                      f"{metrics['latency_ms']['p50']:>8.2f} {metrics['latency_ms']['p95']:>8.2f} "
+                      f"{metrics['producer_blocked_s']:>10.2f} {metrics['producer_cpu_s']:>11.2f} "
+                      f"{metrics['consumer_cpu_s']:>11.2f}", flush=True)
+                result['scenarios'].append({
+                    'name': name,
+                    'params': {'transport': transport, 'width': width, 'height': height,
+                               'consumer_ms': consumer_ms, 'slots': args.slots},
+                    'metrics': metrics,
+                })
+    write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
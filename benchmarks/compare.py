@@ -0,0 +1,118 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark result files (same suite) scenario by scenario.
+
+    python -m benchmarks.compare bench_results/base.json bench_results/head.json
+    python -m benchmarks.compare base.json head.json --fail-above 10
+
+Exits with status 1 if any tracked metric regresses by more than
+--fail-above percent, so it can guard CI or a pre-merge check.
+"""
+import argparse
+import json
+import sys
+
+# (metric path, True if higher is better)
+TRACKED_METRICS = {
+    'pipeline': [
+        ('windows_per_s', True),
+        ('peak_rss_mb', False),
+        ('window_alloc_mb.mean_mb', False),
+        ('alloc_rate_mb_per_s', False),
+        ('minor_faults_per_window', False),
+        ('stages.decode.mean_ms', False),
+        ('stages.flow.mean_ms', False),
+        ('stages.inference.mean_ms', False),
+        ('stages.detectors.mean_ms', False),
+        ('text_generation_us_per_window', False),
+        ('risk_prediction_us_per_window', False),
+        ('recommendations_ms', False),
+    ],
+    'detectors': [
+        ('us_per_window', False),
+    ],
+    'backend_parity': [
+        ('recall', True),
+        ('precision', True),
+        ('candidate_ms_per_frame', False),
+    ],
+    'imgsz': [
+        ('ms_per_frame', False),
+        ('recall_vs_reference', True),
+    ],
+    'quantization': [
+        ('ms_per_frame', False),
+        ('total_detections', True),
+    ],
+}
+
+
+def lookup(metrics, path):
+    value = metrics
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def tracked_metrics(result):
+    suite = result.get('suite')
+    if suite in TRACKED_METRICS:
+        return TRACKED_METRICS[suite]
+    # Suites without a fixed list: compare every numeric top-level metric, lower is better
+    names = set()
+    for scenario in result.get('scenarios', []):
+        names.update(k for k, v in scenario['metrics'].items() if isinstance(v, (int, float)))
+    return [(name, name.endswith('_per_s')) for name in sorted(names)]
+
+
+def compare(base, head, fail_above=None):
+    """Prints a comparison table; returns the list of regressions beyond fail_above."""
+    if base.get('suite') != head.get('suite'):
+        raise ValueError(f"Different suites: {base.get('suite')} vs {head.get('suite')}")
+    base_by_name = {s['name']: s for s in base['scenarios']}
+    regressions = []
+    print(f"base {base.get('git_commit')} ({base.get('timestamp')})  ->  "
+          f"head {head.get('git_commit')} ({head.get('timestamp')})")
+    for scenario in head['scenarios']:
+        name = scenario['name']
+        if name not in base_by_name:
+            print(f"\n{name}: (new scenario, no baseline)")
+            continue
+        print(f"\n{name}")
+        for path, higher_is_better in tracked_metrics(head):
+            old = lookup(base_by_name[name]['metrics'], path)
+            new = lookup(scenario['metrics'], path)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old == 0:
+                continue
+            change = 100.0 * (new - old) / abs(old)
+            worse = change < 0 if higher_is_better else change > 0
+            marker = ""
+            if fail_above is not None and worse and abs(change) > fail_above:
+                marker = "  <-- REGRESSION"
+                regressions.append((name, path, old, new, change))
+            print(f"  {path:<36} {old:>12.4g} -> {new:>12.4g}  ({change:+6.1f}%){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result JSON files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--fail-above", type=float, default=None, metavar="PCT",
+                        help="Exit 1 if any metric gets worse by more than PCT percent")
+    args = parser.parse_args(argv)
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.head, encoding='utf-8') as f:
+        head = json.load(f)
+    regressions = compare(base, head, args.fail_above)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.fail_above}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
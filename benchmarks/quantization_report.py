@@ -0,0 +1,136 @@
+# benchmarks/quantization_report.py
+"""
+Throughput and detection-count report for the INT8 detector against yolov8n.pt.
+
+Runs the ultralytics FP32 path, the FP32 ONNX export and the INT8 model built
+by quantize_detector.py on the same frames of a reference ride (every 15th
+frame, as the window loop samples) and reports, per backend:
+    ms/frame, frames/s and speedup over yolov8n.pt
+    detection counts for person, car, bus, truck, motorcycle and bicycle,
+    and their change against yolov8n.pt (absolute and percent)
+
+    python quantize_detector.py rides/*.mp4
+    python -m benchmarks.quantization_report --video fixtures/reference_ride.mp4
+    python -m benchmarks.quantization_report --video ride.mp4 --quantize rides/a.mp4 rides/b.mp4
+
+Calibrate on other rides than the reference one, or the count deltas flatter
+the INT8 model.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+from benchmarks.backend_parity import sample_frames
+from benchmarks.common import new_result, write_result
+
+# COCO class ids of the classes the report tracks
+REPORT_CLASSES = {
+    0: 'person',
+    2: 'car',
+    5: 'bus',
+    7: 'truck',
+    3: 'motorcycle',
+    1: 'bicycle',
+}
+REFERENCE_BACKEND = 'ultralytics'
+DEFAULT_BACKENDS = ('ultralytics', 'onnxruntime', 'onnxruntime-int8')
+
+
+def measure_backend(name, frames, weights="yolov8n.pt", threads=None, **options):
+    """Returns throughput and per-class counts of one backend over `frames`."""
+    from detector_backends import create_backend
+    started = time.perf_counter()
+    backend = create_backend(name, weights=weights, intra_op_threads=threads, **options)
+    init_s = time.perf_counter() - started
+    backend.detect(frames[0])  # warm-up
+
+    counts = Counter()
+    started = time.perf_counter()
+    for frame in frames:
+        _, cls, _ = backend.detect(frame)
+        counts.update(cls.tolist())
+    elapsed = time.perf_counter() - started
+    return {
+        'init_s': init_s,
+        'ms_per_frame': 1000.0 * elapsed / len(frames),
+        'frames_per_s': len(frames) / elapsed if elapsed > 0 else 0.0,
+        'counts': {label: counts.get(cls, 0) for cls, label in REPORT_CLASSES.items()},
+        'total_detections': sum(counts.values()),
+    }
+
+
+def add_deltas(metrics, reference):
+    """Adds speedup and per-class count change against the reference backend."""
+    metrics['speedup'] = reference['ms_per_frame'] / metrics['ms_per_frame'] if metrics['ms_per_frame'] else None
+    metrics['count_delta'] = {}
+    metrics['count_delta_pct'] = {}
+    for label, ref_count in reference['counts'].items():
+        delta = metrics['counts'][label] - ref_count
+        metrics['count_delta'][label] = delta
+        metrics['count_delta_pct'][label] = 100.0 * delta / ref_count if ref_count else None
+    return metrics
+
+
+def format_report(scenarios):
+    labels = list(REPORT_CLASSES.values())
+    lines = [f"{'backend':<18} {'ms/frame':>9} {'fps':>7} {'speedup':>8}  " +
+             " ".join(f"{label:>12}" for label in labels)]
+    for scenario in scenarios:
+        m = scenario['metrics']
+        cells = []
+        for label in labels:
+            pct = m['count_delta_pct'][label]
+            delta = f"{pct:+.0f}%" if pct is not None else f"{m['count_delta'][label]:+d}"
+            cells.append(f"{m['counts'][label]:>5} {delta:>6}")
+        lines.append(f"{scenario['name']:<18} {m['ms_per_frame']:>9.1f} {m['frames_per_s']:>7.1f} "
+                     f"{m['speedup'] or 0:>7.2f}x  " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the INT8 detector with yolov8n.pt on a reference ride.")
+    parser.add_argument("--video", required=True, help="Reference ride video")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=200, help="Frames sampled from the reference ride")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for every backend")
+    parser.add_argument("--backends", nargs="+", default=list(DEFAULT_BACKENDS))
+    parser.add_argument("--quantize", nargs="+", metavar="VIDEO",
+                        help="(Re)build the INT8 model first, calibrating on these videos")
+    parser.add_argument("--output", default=os.path.join("bench_results", "quantization.json"))
+    args = parser.parse_args(argv)
+
+    config = {'video': args.video, 'weights': args.weights, 'threads': args.threads}
+    if args.quantize:
+        from quantize_detector import quantize_detector
+        from detector_backends import quantized_model_path
+        target = quantized_model_path(args.weights)
+        if os.path.exists(target):
+            os.remove(target)
+        _, config['quantization'] = quantize_detector(args.quantize, args.weights, output=target)
+
+    frames = sample_frames(args.video, args.frames)
+    if not frames:
+        print(f"No frames could be read from {args.video}")
+        return 1
+    config['frames'] = len(frames)
+
+    backends = [REFERENCE_BACKEND] + [b for b in args.backends if b != REFERENCE_BACKEND]
+    result = new_result('quantization', config)
+    reference = None
+    for name in backends:
+        print(f"[quant] {name} ...", flush=True)
+        metrics = measure_backend(name, frames, args.weights, args.threads)
+        reference = reference or metrics
+        result['scenarios'].append({'name': name, 'params': {'backend': name},
+                                    'metrics': add_deltas(metrics, reference)})
+
+    write_result(result, args.output)
+    print(f"\n{len(frames)} frames of {args.video} (counts, change vs {REFERENCE_BACKEND})")
+    print(format_report(result['scenarios']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
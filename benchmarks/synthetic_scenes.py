@@ -0,0 +1,124 @@
+# benchmarks/synthetic_scenes.py
+"""
+Random box sets, labels and flow fields shaped like what the detector loop
+in VideoProcessor.process_video() sees, without any video or YOLO model.
+Scenes are generated as temporally coherent sequences (boxes drift and grow
+from one window to the next) so stateful detectors behave realistically.
+"""
+import numpy as np
+
+# Label mix roughly matching a busy Dhaka street after classify_dhaka_vehicle()
+DEFAULT_LABEL_WEIGHTS = {
+    'person': 0.25,
+    'car': 0.15,
+    'cng': 0.10,
+    'rickshaw': 0.12,
+    'motorcycle': 0.15,
+    'bicycle': 0.03,
+    'bus': 0.10,
+    'truck': 0.06,
+    'traffic light': 0.04,
+}
+
+
+class SyntheticScene:
+    """One sampled window: boxes (list of [x1, y1, x2, y2]), labels, flow and optional frame."""
+
+    def __init__(self, boxes, labels, flow, width, height, frame=None):
+        self.boxes = boxes
+        self.labels = labels
+        self.flow = flow
+        self.width = width
+        self.height = height
+        self.frame = frame
+        # Computed once here, as the flow stage does, so it isn't charged to detectors
+        self.flow_x = float(np.mean(flow[..., 0])) if flow is not None else 0.0
+
+    @property
+    def box_array(self):
+        return np.asarray(self.boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def _random_boxes(rng, n, width, height):
+    w = rng.uniform(0.03, 0.30, n) * width
+    h = rng.uniform(0.06, 0.45, n) * height
+    x1 = rng.uniform(0, 1, n) * (width - w)
+    y1 = rng.uniform(0.2, 1, n) * (height - h)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def random_flow_field(rng, width, height, ego_dx=0.0, ego_dy=0.0, noise=0.5, boxes=None,
+                      box_motion=None):
+    """
+    Smooth dense flow: global ego-motion + low-frequency noise, with optional
+    per-box motion (e.g. a pedestrian crossing) pasted into the box regions.
+    """
+    flow = np.empty((height, width, 2), dtype=np.float32)
+    coarse = rng.normal(0.0, noise, (max(2, height // 32), max(2, width // 32), 2)).astype(np.float32)
+    ys = np.linspace(0, coarse.shape[0] - 1, height).astype(np.int32)
+    xs = np.linspace(0, coarse.shape[1] - 1, width).astype(np.int32)
+    flow[:] = coarse[ys][:, xs]
+    flow[..., 0] += ego_dx
+    flow[..., 1] += ego_dy
+    if boxes is not None and box_motion is not None:
+        for (x1, y1, x2, y2), (dx, dy) in zip(boxes.astype(np.int32), box_motion):
+            flow[max(0, y1):max(0, y2), max(0, x1):max(0, x2), 0] += dx
+            flow[max(0, y1):max(0, y2), max(0, x1):max(0, x2), 1] += dy
+    return flow
+
+
+def random_frame(rng, width, height, boxes, labels, red_light_ratio=0.5):
+    """BGR frame; traffic-light boxes are painted red (or green) so check_red_light has pixels to test."""
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for (x1, y1, x2, y2), label in zip(boxes.astype(np.int32), labels):
+        if label == 'traffic light':
+            color = (0, 0, 255) if rng.random() < red_light_ratio else (0, 255, 0)
+            frame[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = color
+    return frame
+
+
+def generate_scene_sequence(num_windows, density, width=1280, height=720, seed=0,
+                            label_weights=None, with_frames=False, flow_noise=0.5):
+    """
+    Returns a list of SyntheticScene with `density` objects on average per window.
+    Objects persist across windows with small drifts, occasionally entering/leaving.
+    """
+    rng = np.random.default_rng(seed)
+    label_weights = label_weights or DEFAULT_LABEL_WEIGHTS
+    names = list(label_weights)
+    probs = np.array([label_weights[n] for n in names], dtype=np.float64)
+    probs /= probs.sum()
+
+    boxes = _random_boxes(rng, density, width, height)
+    labels = list(rng.choice(names, size=density, p=probs))
+    scenes = []
+    for _ in range(num_windows):
+        # Drift and mild growth, as traffic approaches or pulls away
+        if len(boxes):
+            shift = rng.normal(0, 0.01, (len(boxes), 2)) * [width, height]
+            grow = rng.normal(1.0, 0.04, (len(boxes), 1))
+            cx = (boxes[:, 0] + boxes[:, 2]) / 2 + shift[:, 0]
+            cy = (boxes[:, 1] + boxes[:, 3]) / 2 + shift[:, 1]
+            bw = (boxes[:, 2] - boxes[:, 0]) * grow[:, 0]
+            bh = (boxes[:, 3] - boxes[:, 1]) * grow[:, 0]
+            boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+        # Turnover: keep the count near `density`
+        keep = rng.random(len(boxes)) > 0.1
+        boxes = boxes[keep]
+        labels = [l for l, k in zip(labels, keep) if k]
+        missing = max(0, int(rng.poisson(density)) - len(boxes))
+        if missing:
+            boxes = np.concatenate([boxes, _random_boxes(rng, missing, width, height)])
+            labels += list(rng.choice(names, size=missing, p=probs))
+
+        box_motion = [(rng.normal(0, 3.0) if l == 'person' else 0.0, 0.0) for l in labels]
+        flow = random_flow_field(rng, width, height, ego_dx=rng.normal(0, 2.5),
+                                 ego_dy=rng.normal(0, 1.5), noise=flow_noise,
+                                 boxes=boxes, box_motion=box_motion)
+        frame = random_frame(rng, width, height, boxes, labels) if with_frames else None
+        scenes.append(SyntheticScene([b.tolist() for b in boxes], [str(l) for l in labels], flow,
+                                     width, height, frame))
+    return scenes
@@ -0,0 +1,78 @@
+# checkpoint.py
+"""
+Checkpoints for long process_video runs.
+
+Every `every` windows, VideoProcessor writes the frame_data so far, the index
+of the next window and the cross-window detector state (see
+VideoProcessor.detector_state) to one pickle file. A rerun with the same
+checkpoint path resumes from there, and its output is identical to an
+uninterrupted run. The file is written to a temporary name and renamed, so
+a crash mid-write leaves the previous checkpoint intact. It is deleted once
+the run completes.
+
+A checkpoint only resumes a run with the same fingerprint: the same video
+files (path, size, modification time), window plan, detector settings and
+telemetry. Otherwise it is ignored and the run starts from the beginning.
+"""
+import hashlib
+import os
+import pickle
+
+from frame_readers import ride_clips
+
+DEFAULT_CHECKPOINT_EVERY = 100  # windows (1500 frames, ~50 s of 30 fps video)
+CHECKPOINT_VERSION = 1
+
+
+def run_fingerprint(processor, windows):
+    """Everything that must match for a checkpoint to resume: inputs, settings and the window plan."""
+    clips = []
+    for clip in ride_clips(processor.video_path):
+        stat = os.stat(clip)
+        clips.append((os.path.abspath(clip), stat.st_size, int(stat.st_mtime)))
+    telemetry = processor.telemetry
+    if telemetry is not None and not isinstance(telemetry, (str, os.PathLike)):
+        telemetry = (telemetry.start, len(telemetry.times))  # an already-loaded Telemetry
+    settings = (CHECKPOINT_VERSION, clips, processor.weights, processor.backend,
+                sorted(processor.backend_options.items()), processor.conf, processor.iou,
+                processor.max_det, processor.imgsz, processor.reader, processor.decode_scale,
+                list(processor.detectors), telemetry, processor.telemetry_offset,
+                processor.telemetry_kmh_per_unit, processor.window_seconds,
+                list(windows))
+    return hashlib.sha256(repr(settings).encode("utf-8")).hexdigest()
+
+
+def save_checkpoint(path, fingerprint, next_window, frame_data, state, counters):
+    """Atomically writes the checkpoint for a run that has finished windows [0, next_window)."""
+    payload = {
+        'fingerprint': fingerprint,
+        'next_window': next_window,
+        'frame_data': frame_data,
+        'state': state,
+        'counters': counters,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, fingerprint):
+    """The checkpoint at `path` if it belongs to this run, else None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if payload.get('fingerprint') != fingerprint:
+        print(f"Ignoring checkpoint {path}: it belongs to a different video or settings")
+        return None
+    return payload
+
+
+def remove_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,341 @@
+# detector_backends.py
+"""
+Pluggable object-detection backends for VideoProcessor.
+
+Every backend exposes the same small interface:
+    backend.names            -> {class_id: label}
+    backend.detect(frame)    -> (boxes, cls, conf)
+where boxes is an (N, 4) float32 array of [x1, y1, x2, y2] in frame pixels,
+cls an (N,) int array and conf an (N,) float32 array. Confidence threshold,
+NMS IoU, max detections and a class whitelist are applied by the backend.
+
+Backends:
+    'ultralytics'  PyTorch eager inference through ultralytics (default)
+    'onnxruntime'  weights exported once to ONNX, run with ONNX Runtime on CPU
+    'openvino'     weights exported once to OpenVINO IR, run on CPU
+    'onnxruntime-int8'  INT8 model built by quantize_detector.py, run with ONNX Runtime
+Heavy libraries are imported only by the backend that needs them.
+"""
+import ast
+import copy
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_WEIGHTS = "yolov8n.pt"
+DEFAULT_IMGSZ = 640
+# Ultralytics predict() defaults, so every backend filters the same way
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+DEFAULT_MAX_DET = 300
+LETTERBOX_COLOR = (114, 114, 114)
+MODEL_STRIDE = 32
+
+
+def _empty_detections():
+    return (np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.int64),
+            np.zeros((0,), dtype=np.float32))
+
+
+class LetterboxPlan:
+    """
+    Letterbox geometry for one frame resolution, computed once, plus the
+    preallocated buffers the frames of that resolution are prepared into.
+    Matches ultralytics' LetterBox: auto=True pads only up to a multiple of
+    `stride` (the rectangular input the PyTorch path uses, e.g. 640x384 for
+    16:9); auto=False pads to imgsz x imgsz.
+    """
+
+    def __init__(self, frame_shape, imgsz=DEFAULT_IMGSZ, auto=True, stride=MODEL_STRIDE):
+        h, w = frame_shape[:2]
+        self.frame_shape = (h, w)
+        self.ratio = min(imgsz / h, imgsz / w)
+        self.new_w, self.new_h = int(round(w * self.ratio)), int(round(h * self.ratio))
+        dw, dh = imgsz - self.new_w, imgsz - self.new_h
+        if auto:
+            dw, dh = dw % stride, dh % stride
+        dw, dh = dw / 2, dh / 2
+        self.top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        self.left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+        self.input_shape = (self.top + self.new_h + bottom, self.left + self.new_w + right)
+
+        # Reused for every frame: the padded image (border painted once) and the model input
+        self.canvas = np.empty(self.input_shape + (3,), dtype=np.uint8)
+        self.canvas[:] = LETTERBOX_COLOR
+        self.resized = (np.empty((self.new_h, self.new_w, 3), dtype=np.uint8)
+                        if (self.new_w, self.new_h) != (w, h) else None)
+        self.blob = np.empty((1, 3) + self.input_shape, dtype=np.float32)
+
+    def letterbox(self, frame):
+        """Resizes `frame` into the padded canvas and returns it (a reused buffer)."""
+        if self.resized is not None:
+            cv2.resize(frame, (self.new_w, self.new_h), dst=self.resized, interpolation=cv2.INTER_LINEAR)
+            frame = self.resized
+        self.canvas[self.top:self.top + self.new_h, self.left:self.left + self.new_w] = frame
+        return self.canvas
+
+    def prepare(self, frame):
+        """BGR frame -> letterboxed RGB NCHW float32 in [0, 1], written into the reused blob."""
+        canvas = self.letterbox(frame)
+        np.multiply(canvas.transpose(2, 0, 1)[::-1], np.float32(1.0 / 255.0), out=self.blob[0],
+                    casting='unsafe')
+        return self.blob
+
+    def unscale(self, boxes):
+        """Maps xyxy boxes from model input pixels back to frame pixels (in place) and clips them."""
+        boxes[:, [0, 2]] -= self.left
+        boxes[:, [1, 3]] -= self.top
+        boxes /= self.ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.frame_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.frame_shape[0])
+        return boxes
+
+
+class LetterboxedBackend:
+    """
+    Shared frame preparation: one LetterboxPlan per input resolution, built by
+    prepare(frame_shape) at the start of a video (or on the first frame of a
+    new resolution) and reused for every window after that.
+    """
+
+    imgsz = DEFAULT_IMGSZ
+    auto = True
+    _plan = None
+
+    def prepare(self, frame_shape):
+        if self._plan is None or self._plan.frame_shape != tuple(frame_shape[:2]):
+            self._plan = LetterboxPlan(frame_shape, self.imgsz, self.auto)
+        return self._plan
+
+    def with_imgsz(self, imgsz):
+        """
+        This backend letterboxing to `imgsz` instead, sharing the loaded model
+        (a shallow copy, so nothing is loaded again). A model with a fixed
+        input size keeps it.
+        """
+        if not self.auto or imgsz == self.imgsz:
+            return self
+        resized = copy.copy(self)
+        resized.imgsz = imgsz
+        resized._plan = None
+        return resized
+
+
+class UltralyticsBackend(LetterboxedBackend):
+    """
+    PyTorch inference through ultralytics' YOLO wrapper (the original code path).
+    Frames are letterboxed here with the per-video plan and handed over as a
+    ready tensor, so ultralytics skips its own per-frame letterbox.
+    """
+
+    name = "ultralytics"
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, imgsz=DEFAULT_IMGSZ, intra_op_threads=None,
+                 conf=DEFAULT_CONF, iou=DEFAULT_IOU, max_det=DEFAULT_MAX_DET, classes=None, **_):
+        import torch
+        from ultralytics import YOLO
+        if intra_op_threads:
+            torch.set_num_threads(int(intra_op_threads))
+        self._torch = torch
+        self.weights = weights
+        self.model = YOLO(weights)
+        self.names = self.model.names
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.classes = sorted(classes) if classes is not None else None
+
+    def detect(self, frame):
+        plan = self.prepare(frame.shape)
+        tensor = self._torch.from_numpy(plan.prepare(frame))
+        results = self.model(tensor, verbose=False, conf=self.conf, iou=self.iou,
+                             max_det=self.max_det, classes=self.classes)[0]
+        boxes = results.boxes
+        if boxes is None or len(boxes) == 0:
+            return _empty_detections()
+        return (plan.unscale(boxes.xyxy.cpu().numpy().astype(np.float32)),
+                boxes.cls.cpu().numpy().astype(np.int64),
+                boxes.conf.cpu().numpy().astype(np.float32))
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression on xyxy boxes; returns kept indices by descending score."""
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(output, plan, conf=DEFAULT_CONF, iou=DEFAULT_IOU, max_det=DEFAULT_MAX_DET,
+                classes=None):
+    """
+    Decodes a raw YOLOv8 head output of shape (1, 4 + num_classes, anchors)
+    into (boxes, cls, conf) in original frame pixels (via the frame's
+    LetterboxPlan), with class-aware NMS.
+    classes (array of class ids), if given, drops every other class before NMS.
+    """
+    pred = output[0].T  # (anchors, 4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(axis=1)
+    best = scores[np.arange(len(cls)), cls]
+    mask = best > conf
+    if classes is not None:
+        mask &= np.isin(cls, classes)
+    if not mask.any():
+        return _empty_detections()
+    pred, cls, best = pred[mask], cls[mask], best[mask]
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Class-aware NMS: offset boxes per class so different classes never overlap
+    offset = cls[:, None].astype(np.float32) * 7680.0
+    keep = nms(boxes + offset, best, iou)[:max_det]
+    boxes, cls, best = boxes[keep], cls[keep], best[keep]
+    boxes = plan.unscale(boxes.astype(np.float32))
+    return boxes, cls.astype(np.int64), best.astype(np.float32)
+
+
+def _parse_names(raw):
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    return {int(k): v for k, v in names.items()}
+
+
+def export_weights(weights=DEFAULT_WEIGHTS, fmt="onnx", imgsz=DEFAULT_IMGSZ, output=None):
+    """
+    Exports ultralytics weights once (ONNX file or OpenVINO IR directory)
+    and returns the exported path. Reuses an existing export. Height and
+    width are dynamic so frames are letterboxed to the same rectangular
+    shape the PyTorch path uses, which keeps boxes in parity with it.
+    """
+    stem = os.path.splitext(weights)[0]
+    if output is None:
+        output = f"{stem}_{imgsz}.onnx" if fmt == "onnx" else f"{stem}_{imgsz}_openvino_model"
+    if os.path.exists(output):
+        return output
+    from ultralytics import YOLO
+    exported = YOLO(weights).export(format=fmt, imgsz=imgsz, dynamic=True, verbose=False)
+    if os.path.abspath(exported) != os.path.abspath(output):
+        os.replace(exported, output)
+    return output
+
+
+def quantized_model_path(weights=DEFAULT_WEIGHTS, imgsz=DEFAULT_IMGSZ):
+    """Where quantize_detector.py writes the INT8 model for these weights."""
+    return f"{os.path.splitext(weights)[0]}_{imgsz}_int8.onnx"
+
+
+class OnnxRuntimeBackend(LetterboxedBackend):
+    """YOLO exported to ONNX and run through ONNX Runtime on CPU."""
+
+    name = "onnxruntime"
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, model_path=None, imgsz=DEFAULT_IMGSZ,
+                 intra_op_threads=None, conf=DEFAULT_CONF, iou=DEFAULT_IOU,
+                 max_det=DEFAULT_MAX_DET, classes=None, providers=None, **_):
+        import onnxruntime as ort
+        self.model_path = model_path or export_weights(weights, "onnx", imgsz)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=providers or ["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Static exports need the full square input; dynamic ones take the rectangular letterbox
+        self.auto = not isinstance(model_input.shape[-1], int)
+        self.imgsz = imgsz if self.auto else model_input.shape[-1]
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = _parse_names(meta['names']) if 'names' in meta else {}
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.classes = np.array(sorted(classes)) if classes is not None else None
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def detect(self, frame):
+        plan = self.prepare(frame.shape)
+        output = self.infer(plan.prepare(frame))
+        return postprocess(output, plan, self.conf, self.iou, self.max_det, self.classes)
+
+
+class QuantizedOnnxBackend(OnnxRuntimeBackend):
+    """
+    INT8 (statically quantized) ONNX model on ONNX Runtime. The model is not
+    built on the fly: calibration needs our own footage, so run
+    quantize_detector.py first.
+    """
+
+    name = "onnxruntime-int8"
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, model_path=None, imgsz=DEFAULT_IMGSZ, **options):
+        model_path = model_path or quantized_model_path(weights, imgsz)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Quantized model not found: {model_path}. "
+                f"Build it with: python quantize_detector.py <ride videos> --weights {weights}")
+        super().__init__(weights, model_path=model_path, imgsz=imgsz, **options)
+
+
+class OpenVinoBackend(OnnxRuntimeBackend):
+    """YOLO exported to OpenVINO IR and compiled for the CPU plugin."""
+
+    name = "openvino"
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, model_path=None, imgsz=DEFAULT_IMGSZ,
+                 intra_op_threads=None, conf=DEFAULT_CONF, iou=DEFAULT_IOU,
+                 max_det=DEFAULT_MAX_DET, classes=None, **_):
+        import openvino as ov
+        import yaml
+        model_dir = model_path or export_weights(weights, "openvino", imgsz)
+        xml = [f for f in os.listdir(model_dir) if f.endswith(".xml")][0]
+        core = ov.Core()
+        config = {"INFERENCE_NUM_THREADS": int(intra_op_threads)} if intra_op_threads else {}
+        self.compiled = core.compile_model(core.read_model(os.path.join(model_dir, xml)), "CPU", config)
+        self.output = self.compiled.output(0)
+        self.model_path = model_dir
+        self.auto = self.compiled.input(0).get_partial_shape().is_dynamic
+        self.imgsz = imgsz
+        with open(os.path.join(model_dir, "metadata.yaml"), encoding="utf-8") as f:
+            self.names = _parse_names(yaml.safe_load(f).get('names', {}))
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.classes = np.array(sorted(classes)) if classes is not None else None
+
+    def infer(self, blob):
+        return self.compiled([blob])[self.output]
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+    QuantizedOnnxBackend.name: QuantizedOnnxBackend,
+}
+
+
+def create_backend(name="ultralytics", **options):
+    """Builds the named backend; options are passed to its constructor."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
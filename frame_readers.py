@@ -0,0 +1,357 @@
+# frame_readers.py
+"""
+Frame sources for VideoProcessor.
+
+Both readers expose the same interface:
+    reader.total_frames, reader.width, reader.height, reader.fps
+    reader.start(indices, keyframes=None)
+                                   -> announce the frame indices to be read, in read order
+                                      (and the keyframe positions, when probed)
+    reader.read(index, out=None)   -> (ok, frame) for the next announced index
+    reader.release()
+    reader.seeks                   -> container seeks so far
+
+A ride recorded as several files (dashcam loop recording) is read as one
+video: pass the ordered list of clip paths wherever a path is accepted.
+MultiClipReader numbers frames across the clips (frame 0 of the second clip
+follows the last frame of the first) and opens each clip's own reader in
+turn, so nothing is concatenated or re-encoded.
+
+'opencv'  cv2.VideoCapture, seeking to every sampled frame (the original path);
+          with keyframes, it decodes forward instead unless a keyframe lets
+          a seek skip more than seek_cost_frames frames
+'ffmpeg'  one local ffmpeg subprocess per video, decoding with threads and
+          emitting only the sampled frames (select filter), optionally
+          scaled, as raw BGR read straight into the caller's buffer.
+          Frames announced out of order (overlapping windows) are held
+          until they are read.
+'auto'    ffmpeg when it is on PATH, otherwise OpenCV
+"""
+import bisect
+import itertools
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+READERS = ("auto", "opencv", "ffmpeg")
+
+
+def ride_clips(video_path):
+    """The clip paths of a ride: a single path is a one-clip ride, a list is kept in order."""
+    if isinstance(video_path, (str, os.PathLike)):
+        return [video_path]
+    return list(video_path)
+
+
+def probe_clips(clips):
+    """
+    ((frame count, width, height, fps) of the clips as one video, first frame
+    number of each clip). All clips must share the first clip's frame size.
+    """
+    infos = [probe_video(clip) for clip in clips]
+    if not infos:
+        raise ValueError("No video clips given")
+    _, width, height, fps = infos[0]
+    for clip, (_, w, h, _) in zip(clips[1:], infos[1:]):
+        if (w, h) != (width, height):
+            raise ValueError(f"Clip {clip} is {w}x{h}, but the ride's first clip is {width}x{height}")
+    offsets = list(itertools.accumulate((info[0] for info in infos), initial=0))
+    return (offsets[-1], width, height, fps), offsets[:-1]
+
+
+def probe_video(video_path):
+    """Frame count, size and fps as OpenCV reports them (the sampling plan is built on these)."""
+    if not isinstance(video_path, (str, os.PathLike)):
+        return probe_clips(ride_clips(video_path))[0]
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    info = (int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    cap.release()
+    return info
+
+
+def scaled_size(width, height, scale):
+    """Output size for a decode scale factor (even dimensions, as most scalers require)."""
+    if not scale or scale == 1:
+        return width, height
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+
+class OpenCVFrameReader:
+    """Seek + read with cv2.VideoCapture. Works everywhere, but single-threaded and not
+    frame-accurate on every container."""
+
+    name = "opencv"
+    # A seek flushes and restarts the decoder (and OpenCV lands before the
+    # keyframe); it only pays off when it skips more frames than this
+    # (measured on 720p H.264 with 12- and 50-frame GOPs)
+    seek_cost_frames = 30
+
+    def __init__(self, video_path, scale=None):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.source_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.width, self.height = scaled_size(*self.source_size, scale)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self._scaled = (self.width, self.height) != self.source_size
+        self._decoded = None
+        self._keyframes = None
+        self._next = None  # frame number the decoder returns next
+        self.seeks = 0
+
+    def start(self, indices, keyframes=None):
+        self._keyframes = sorted(keyframes) if keyframes else None
+
+    def _seek(self, index):
+        """
+        Seek unless decoding forward to `index` is cheaper: a seek restarts at
+        the last keyframe before `index`, so it saves nothing within the
+        current GOP and little when that keyframe is only a few frames ahead.
+        """
+        if self._keyframes is not None and self._next is not None and index >= self._next:
+            pos = bisect.bisect_right(self._keyframes, index)
+            if pos == 0 or self._keyframes[pos - 1] - self._next < self.seek_cost_frames:
+                for _ in range(index - self._next):
+                    self.cap.grab()
+                return
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        self.seeks += 1
+
+    def read(self, index, out=None):
+        self._seek(index)
+        self._next = index + 1
+        if not self._scaled:
+            return self.cap.read(out)
+        ok, self._decoded = self.cap.read(self._decoded)
+        if not ok:
+            return False, None
+        return True, cv2.resize(self._decoded, (self.width, self.height), dst=out,
+                                interpolation=cv2.INTER_AREA)
+
+    def release(self):
+        self.cap.release()
+
+
+def _count_in_range(first, last, period, offset):
+    """How many n in [first, last] have n % period == offset."""
+    return (last - offset) // period - (first - 1 - offset) // period
+
+
+def select_expression(indices):
+    """
+    ffmpeg select filter expression matching exactly `indices` (frame numbers).
+    Periodic plans (the same few offsets in every window, e.g. first and last
+    frame of each 15-frame window) become one mod() test over a frame range
+    instead of one term per frame.
+    """
+    indices = sorted(set(int(i) for i in indices))
+    if not indices:
+        return "0"
+    first, last = indices[0], indices[-1]
+    for period in sorted(set(i - first for i in indices[1:5])):
+        offsets = sorted(set(i % period for i in indices))
+        if len(offsets) > 4:
+            continue
+        expected = sum(_count_in_range(first, last, period, o) for o in offsets)
+        if expected == len(indices):
+            terms = "+".join(f"eq(mod(n\\,{period})\\,{o})" for o in offsets)
+            return f"({terms})*between(n\\,{first}\\,{last})"
+    return "+".join(f"eq(n\\,{i})" for i in indices)
+
+
+class FFmpegFrameReader:
+    """
+    Decodes with a local ffmpeg subprocess. Only the announced frames leave
+    ffmpeg (select filter), so the pipe carries sampled frames only, and
+    selection is by decoded frame number: exact on every container.
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, video_path, scale=None, threads=0, ffmpeg="ffmpeg"):
+        self.video_path = video_path
+        self.ffmpeg = shutil.which(ffmpeg) or ffmpeg
+        self.threads = threads
+        self.total_frames, src_w, src_h, self.fps = probe_video(video_path)
+        self.source_size = (src_w, src_h)
+        self.width, self.height = scaled_size(src_w, src_h, scale)
+        self.frame_bytes = self.width * self.height * 3
+        self.proc = None
+        self._pending = iter(())
+        self._emitted = iter(())
+        self._remaining = {}
+        self._held = {}
+        self.seeks = 0  # decodes sequentially; keyframes do not matter here
+
+    def start(self, indices, keyframes=None):
+        self.release()
+        indices = [int(i) for i in indices]
+        emitted = sorted(set(indices))
+        self._pending = iter(indices)
+        self._emitted = iter(emitted)  # ffmpeg emits each selected frame once, ascending
+        self._remaining = {}
+        for i in indices:
+            self._remaining[i] = self._remaining.get(i, 0) + 1
+        self._held = {}
+        filters = [f"select='{select_expression(emitted)}'"]
+        if (self.width, self.height) != self.source_size:
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+        cmd = [self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+               "-threads", str(self.threads), "-i", self.video_path,
+               "-an", "-sn", "-dn", "-vf", ",".join(filters), "-vsync", "0",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     bufsize=self.frame_bytes)
+
+    def read(self, index, out=None):
+        expected = next(self._pending, None)
+        if expected != index:
+            raise ValueError(f"ffmpeg reader expected frame {expected}, got {index} "
+                             "(frames must be read in the order given to start())")
+        if out is None or out.shape != (self.height, self.width, 3):
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._remaining[index] -= 1
+        if index in self._held:
+            held = self._held[index] if self._remaining[index] else self._held.pop(index)
+            np.copyto(out, held)
+            return True, out
+        # Frames emitted before `index` that are read later are held
+        for frame_no in self._emitted:
+            target = out if frame_no == index else np.empty_like(out)
+            if not self._read_into(target):
+                return False, None
+            if frame_no == index:
+                if self._remaining[index]:
+                    self._held[index] = out.copy()
+                return True, out
+            self._held[frame_no] = target
+        return False, None
+
+    def _read_into(self, out):
+        view = memoryview(out.reshape(-1))
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def release(self):
+        if self.proc is not None:
+            self.proc.stdout.close()
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+        self._held = {}
+
+
+class MultiClipReader:
+    """
+    Consecutive clips read as one video. Ride frame numbers are mapped to
+    (clip, frame in clip), and each clip gets the reader it would get on its
+    own, started with its share of the announced frames. A clip's reader is
+    opened on its first read and released after its last announced frame,
+    so at most two are open at a boundary.
+    """
+
+    def __init__(self, clips, reader="auto", scale=None, threads=0):
+        self.clips = clips
+        self._reader_options = (reader, scale, threads)
+        (self.total_frames, src_w, src_h, self.fps), self.offsets = probe_clips(clips)
+        self.source_size = (src_w, src_h)
+        self.width, self.height = scaled_size(src_w, src_h, scale)
+        self.name = resolve_reader(reader)
+        self._readers = {}
+        self._plans = {}
+        self._remaining = {}
+        self._keyframes = None
+        self._released_seeks = 0
+
+    @property
+    def seeks(self):
+        return self._released_seeks + sum(r.seeks for r in self._readers.values())
+
+    def clip_of(self, index):
+        """Index of the clip holding ride frame `index`."""
+        return max(bisect.bisect_right(self.offsets, index) - 1, 0)
+
+    def start(self, indices, keyframes=None):
+        self.release()
+        self._plans = {}
+        for index in indices:
+            k = self.clip_of(index)
+            self._plans.setdefault(k, []).append(int(index) - self.offsets[k])
+        self._remaining = {k: len(plan) for k, plan in self._plans.items()}
+        self._keyframes = sorted(keyframes) if keyframes else None
+
+    def _clip_reader(self, k):
+        if k not in self._readers:
+            path = self.clips[k]
+            reader = open_reader(path, *self._reader_options)
+            keyframes = None
+            if self._keyframes is not None:
+                end = self.offsets[k + 1] if k + 1 < len(self.offsets) else self.total_frames
+                keyframes = [i - self.offsets[k] for i in self._keyframes if self.offsets[k] <= i < end]
+            reader.start(self._plans.get(k, []), keyframes=keyframes or None)
+            self._readers[k] = reader
+        return self._readers[k]
+
+    def _close(self, k):
+        reader = self._readers.pop(k)
+        self._released_seeks += reader.seeks
+        reader.release()
+
+    def read(self, index, out=None):
+        k = self.clip_of(index)
+        result = self._clip_reader(k).read(index - self.offsets[k], out)
+        self._remaining[k] = self._remaining.get(k, 1) - 1
+        if self._remaining[k] <= 0:
+            self._close(k)
+        return result
+
+    def release(self):
+        for k in list(self._readers):
+            self._close(k)
+
+
+def ffmpeg_available(ffmpeg="ffmpeg"):
+    return shutil.which(ffmpeg) is not None
+
+
+def resolve_reader(reader="auto"):
+    """The reader that will actually be used: 'ffmpeg' or 'opencv'."""
+    return "ffmpeg" if reader in ("auto", "ffmpeg") and ffmpeg_available() else "opencv"
+
+
+def open_reader(video_path, reader="auto", scale=None, threads=0):
+    """
+    Opens a frame reader; 'auto' (and 'ffmpeg' when ffmpeg is missing) fall
+    back to OpenCV. A list of clip paths opens a MultiClipReader.
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown frame reader '{reader}'. Choose from: {', '.join(READERS)}")
+    clips = ride_clips(video_path)
+    if len(clips) != 1:
+        for clip in clips:
+            if not os.path.exists(clip):
+                raise FileNotFoundError(f"Video file not found: {clip}")
+        return MultiClipReader(clips, reader, scale, threads)
+    video_path = clips[0]
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    if reader in ("auto", "ffmpeg"):
+        if ffmpeg_available():
+            return FFmpegFrameReader(video_path, scale=scale, threads=threads)
+        if reader == "ffmpeg":
+            print("ffmpeg not found on PATH; falling back to OpenCV decoding")
+    return OpenCVFrameReader(video_path, scale=scale)
@@ -0,0 +1,339 @@
+# frame_transport.py
+"""
+Shared-memory frame transport for a multi-process VideoProcessor.
+
+Pickling a 1080p BGR frame through a multiprocessing.Queue copies its 6 MB
+at least three times (pickle, pipe, unpickle), and a flow field is 16 MB
+more. FrameRing avoids that: it is one multiprocessing.shared_memory block
+cut into a fixed number of slots, each holding the same named arrays
+(frame1, frame2, flow, gray). A slot is handed from stage to stage in order, so
+the data stays where the decoder wrote it:
+
+    decoder process  --slot-->  flow process  --slot-->  caller (inference, detectors)
+          ^                                                    |
+          +----------------------- slot freed -----------------+
+
+Each stage waits on a semaphore for the next slot the previous stage
+released, and works on numpy views into the slot. Decoding and flow write
+straight into those views. Only slot numbers and a few int64 of metadata
+per slot cross the process boundary. That gives back-pressure for free:
+the decoder blocks once every slot is in flight, so memory stays at
+`slots` windows however far decoding could run ahead.
+
+WindowPipeline runs VideoProcessor.process_video's decode and optical-flow
+steps this way (VideoProcessor(pipeline="processes")). The caller keeps
+inference and the detectors, and the frame_data is identical to the inline
+pipeline. The stage processes are spawned, not forked, because the caller
+may already have PyTorch and OpenCV thread pools running.
+`python -m benchmarks.bench_transport` compares the ring with a queue of
+ndarrays.
+"""
+import multiprocessing as mp
+import queue
+import traceback
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+PIPELINES = ("inline", "processes")
+DEFAULT_SLOTS = 4  # windows in flight between decoder and detectors
+
+# Per-slot metadata (int64): window sequence number, frame pair, flags and
+# the decoder's seek count after the window (sampling report)
+META_FIELDS = ('seq', 'first', 'last', 'flags', 'seeks')
+_SEQ, _FIRST, _LAST, _FLAGS, _SEEKS = range(len(META_FIELDS))
+HAS_FRAME1 = 1
+HAS_FRAME2 = 2
+HAS_FLOW = 4
+END = 8     # no more windows (end of plan, or the first frame failed to decode)
+ERROR = 16  # a stage raised; the traceback is on the pipeline's error queue
+
+_ALIGN = 64  # slot arrays start on cache-line boundaries
+
+
+def stages_supported():
+    """False in a daemonic process (a warm-pool worker), which may not start stage processes."""
+    return not mp.current_process().daemon
+
+
+def _aligned(nbytes):
+    return (nbytes + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class FrameRing:
+    """
+    `slots` slots of named arrays in one shared-memory block, passed through
+    `stages` stages in order. Stage 0 is the producer and gets free slots;
+    stage k gets the slots stage k - 1 released. When the last stage
+    releases a slot, it is free again. Each stage must run in one process
+    (slots are taken in order).
+
+    fields: {name: (shape, dtype)}. Pass the ring to a Process as an
+    argument. The child attaches to the same block, and the creator unlinks it.
+    """
+
+    def __init__(self, fields, slots=DEFAULT_SLOTS, stages=2, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.fields = {name: (tuple(shape), np.dtype(dtype).str) for name, (shape, dtype) in fields.items()}
+        self.slots = slots
+        self.stages = stages
+        self._offsets = {}
+        offset = 0
+        for name, (shape, dtype) in self.fields.items():
+            self._offsets[name] = offset
+            offset += _aligned(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self.slot_bytes = offset
+        self._meta_offset = slots * offset
+        self.nbytes = self._meta_offset + slots * len(META_FIELDS) * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=self.nbytes)
+        self._owner = True
+        self._ready = [ctx.Semaphore(slots if stage == 0 else 0) for stage in range(stages)]
+        self._attach()
+
+    def _attach(self):
+        buf = self._shm.buf
+        self._views = [
+            {name: np.ndarray(shape, dtype, buffer=buf, offset=slot * self.slot_bytes + self._offsets[name])
+             for name, (shape, dtype) in self.fields.items()}
+            for slot in range(self.slots)
+        ]
+        self.meta = np.ndarray((self.slots, len(META_FIELDS)), np.int64, buffer=buf, offset=self._meta_offset)
+        self._cursor = [0] * self.stages
+
+    def __getstate__(self):
+        state = {k: v for k, v in self.__dict__.items() if k not in ('_shm', '_views', 'meta', '_cursor')}
+        state['_shm_name'] = self._shm.name
+        return state
+
+    def __setstate__(self, state):
+        name = state.pop('_shm_name')
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = False
+        self._attach()
+
+    def acquire(self, stage, timeout=None):
+        """
+        The next slot for `stage`, blocking until the previous stage has
+        released it (the producer blocks while every slot is in flight).
+        None if timeout seconds pass first.
+        """
+        if not self._ready[stage].acquire(timeout=timeout):
+            return None
+        slot = self._cursor[stage] % self.slots
+        self._cursor[stage] += 1
+        return slot
+
+    def release(self, stage):
+        """Passes `stage`'s oldest acquired slot on to the next stage."""
+        self._ready[(stage + 1) % self.stages].release()
+
+    def views(self, slot):
+        """{name: ndarray} views into the slot; valid until the slot is released."""
+        return self._views[slot]
+
+    def close(self):
+        self._views = None
+        self.meta = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _read_into(reader, index, out):
+    ok, frame = reader.read(index, out)
+    if ok and frame is not out and not np.shares_memory(frame, out):
+        np.copyto(out, frame)  # readers that could not decode in place
+    return ok
+
+
+def _decode_stage(ring, video_path, reader_name, scale, threads, jobs, use_flow, keyframes, errors):
+    """Stage 0: decodes each window's frames straight into its ring slot."""
+    from frame_readers import open_reader
+    reader = None
+    seeks = 0
+    slot = None  # acquired and not yet released: the END (or END|ERROR) goes there
+    try:
+        reader = open_reader(video_path, reader_name, scale, threads)
+        reader.start([idx for first, last in jobs for idx in ((first, last) if use_flow else (last,))],
+                     keyframes=keyframes)
+        for seq, (first, last) in enumerate(jobs):
+            slot = ring.acquire(0)
+            views = ring.views(slot)
+            flags = 0
+            if use_flow:
+                if not _read_into(reader, first, views['frame1']):
+                    break  # as the inline loop does: no more windows
+                flags |= HAS_FRAME1
+            if _read_into(reader, last, views['frame2']):
+                flags |= HAS_FRAME2
+            seeks = reader.seeks
+            ring.meta[slot] = (seq, first, last, flags, seeks)
+            ring.release(0)
+            slot = None
+        if slot is None:
+            slot = ring.acquire(0)
+        ring.meta[slot] = (-1, -1, -1, END, seeks)
+    except Exception:
+        errors.put(traceback.format_exc())
+        if slot is None:
+            slot = ring.acquire(0)
+        ring.meta[slot] = (-1, -1, -1, END | ERROR, seeks)
+    finally:
+        if reader is not None:
+            reader.release()
+    ring.release(0)
+
+
+def _flow_stage(ring, scale, flow_needed, errors):
+    """Stage 1: Farneback flow between the slot's two frames, into its flow and gray arrays."""
+    import cv2
+    from video_processor import VideoProcessor
+    flow_source = VideoProcessor(None, decode_scale=scale)  # compute_flow only; no model is loaded
+    prev_gray = None
+    while True:
+        slot = ring.acquire(1)
+        meta = ring.meta[slot]
+        flags = int(meta[_FLAGS])
+        if flags & END:
+            ring.release(1)
+            return
+        try:
+            if flow_needed[meta[_SEQ]] and flags & HAS_FRAME1 and flags & HAS_FRAME2:
+                views = ring.views(slot)
+                if prev_gray is None:
+                    prev_gray = np.empty(views['frame1'].shape[:2], dtype=np.uint8)
+                cv2.cvtColor(views['frame1'], cv2.COLOR_BGR2GRAY, dst=prev_gray)
+                cv2.cvtColor(views['frame2'], cv2.COLOR_BGR2GRAY, dst=views['gray'])
+                flow_source.compute_flow(prev_gray, views['gray'], flow=views['flow'])
+                meta[_FLAGS] = flags | HAS_FLOW
+        except Exception:
+            errors.put(traceback.format_exc())
+            meta[_FLAGS] = END | ERROR
+            ring.release(1)
+            return
+        ring.release(1)
+
+
+def _pass_stage(ring):
+    """Stage 1 when no detector needs flow: hands slots straight on."""
+    while True:
+        slot = ring.acquire(1)
+        end = ring.meta[slot, _FLAGS] & END
+        ring.release(1)
+        if end:
+            return
+
+
+class RingWindow:
+    """
+    One job's data from WindowPipeline.next_window(): views into its ring
+    slot, valid until the next call. frame1, flow and gray are None when not
+    decoded or computed, and frame2 is None when it failed to decode.
+    """
+
+    def __init__(self, first, last, frame1, frame2, flow, gray):
+        self.first = first
+        self.last = last
+        self.frame1 = frame1
+        self.frame2 = frame2
+        self.flow = flow
+        self.gray = gray
+
+
+class WindowPipeline:
+    """
+    Decode and optical flow for process_video, in a decoder and a flow
+    process. They run up to `slots` windows ahead of the caller, which takes
+    windows in order with next_window().
+
+    jobs are the (first, last) pairs with last > first, in plan order.
+    flow_needed[i] is False for job i when its ego-motion comes from
+    telemetry. Then no flow is computed, but both frames are still decoded
+    for detectors that ask for flow later.
+    """
+
+    # How long to wait on the ring before checking that the stages are alive
+    poll_seconds = 0.5
+
+    def __init__(self, processor, jobs, keyframes, width, height, use_flow, flow_needed, slots=DEFAULT_SLOTS):
+        ctx = mp.get_context("spawn")
+        fields = {'frame2': ((height, width, 3), np.uint8)}
+        if use_flow:
+            fields['frame1'] = ((height, width, 3), np.uint8)
+            fields['flow'] = ((height, width, 2), np.float32)
+            fields['gray'] = ((height, width), np.uint8)  # frame2 in grayscale, a by-product of flow
+        self.ring = FrameRing(fields, slots, stages=3, ctx=ctx)
+        self.seeks = 0
+        self._errors = ctx.Queue()
+        self._holding = False
+        self._done = False
+        self._processes = [
+            ctx.Process(target=_decode_stage, name="ride-decode", daemon=True,
+                        args=(self.ring, processor.video_path, processor.reader, processor.decode_scale,
+                              processor.decode_threads, jobs, use_flow, keyframes, self._errors)),
+        ]
+        if use_flow:
+            self._processes.append(ctx.Process(target=_flow_stage, name="ride-flow", daemon=True,
+                                               args=(self.ring, processor.decode_scale, list(flow_needed),
+                                                     self._errors)))
+        else:
+            # Nothing to compute between decoding and the caller
+            self._processes.append(ctx.Process(target=_pass_stage, name="ride-pass", daemon=True,
+                                               args=(self.ring,)))
+        for process in self._processes:
+            process.start()
+        # Also runs if the caller never gets to close() (an exception mid-video)
+        self._finalizer = weakref.finalize(self, _stop, self._processes, self.ring)
+
+    def _raise_stage_error(self):
+        try:
+            detail = self._errors.get(timeout=self.poll_seconds)
+        except queue.Empty:
+            detail = "no traceback"
+        raise RuntimeError(f"Frame pipeline stage failed:\n{detail}")
+
+    def next_window(self):
+        """
+        The next job's RingWindow, releasing the previous one's slot.
+        Returns None once the decoder is done; raises RuntimeError if a stage failed.
+        """
+        if self._done:
+            return None
+        if self._holding:
+            self.ring.release(2)
+            self._holding = False
+        slot = None
+        while slot is None:
+            slot = self.ring.acquire(2, timeout=self.poll_seconds)
+            if slot is None and not all(p.is_alive() for p in self._processes):
+                self._done = True
+                self._raise_stage_error()
+        seq, first, last, flags, seeks = (int(v) for v in self.ring.meta[slot])
+        self.seeks = seeks
+        if flags & END:
+            self._done = True
+            if flags & ERROR:
+                self._raise_stage_error()
+            return None
+        self._holding = True
+        views = self.ring.views(slot)
+        return RingWindow(first, last,
+                          views['frame1'] if flags & HAS_FRAME1 else None,
+                          views['frame2'] if flags & HAS_FRAME2 else None,
+                          views['flow'] if flags & HAS_FLOW else None,
+                          views['gray'] if flags & HAS_FLOW else None)
+
+    def close(self):
+        """Stops the stage processes (they may still be decoding ahead) and frees the ring."""
+        self._finalizer()
+
+
+def _stop(processes, ring):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    ring.close()
+
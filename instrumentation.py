@@ -0,0 +1,119 @@
+# instrumentation.py
+import json
+import time
+
+# Per-window stages timed inside VideoProcessor.process_video()
+WINDOW_STAGES = ("decode", "flow", "inference", "detectors")
+# Per-ride stages timed in process_ride_video() after the video pass
+RIDE_STAGES = ("model_init", "text_generation", "risk_prediction", "recommendations")
+
+# Share of the overall progress bar given to the video pass; the rest is
+# model init before it and text/risk/recommendations after it.
+VIDEO_PROGRESS_START = 0.05
+VIDEO_PROGRESS_END = 0.90
+
+
+class PipelineEvent:
+    """
+    One progress/instrumentation update.
+    stage is 'window' for each processed video window, or one of RIDE_STAGES
+    (plus 'done') for the ride-level steps. timings maps stage name -> seconds.
+    """
+
+    def __init__(self, stage, message="", windows_done=0, windows_total=0,
+                 timings=None, frame_id=None, fraction=None):
+        self.stage = stage
+        self.message = message
+        self.windows_done = windows_done
+        self.windows_total = windows_total
+        self.timings = timings or {}
+        self.frame_id = frame_id
+        self.fraction = fraction
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'message': self.message,
+            'windows_done': self.windows_done,
+            'windows_total': self.windows_total,
+            'timings': dict(self.timings),
+            'frame_id': self.frame_id,
+            'fraction': self.fraction,
+        }
+
+
+def video_fraction(windows_done, windows_total):
+    """Map windows processed onto the video part of the overall progress bar."""
+    if windows_total <= 0:
+        return VIDEO_PROGRESS_START
+    done = min(windows_done, windows_total) / float(windows_total)
+    return VIDEO_PROGRESS_START + (VIDEO_PROGRESS_END - VIDEO_PROGRESS_START) * done
+
+
+class StageTimer:
+    """
+    Small helper for timing consecutive stages:
+        timer = StageTimer(); ...; timer.lap('decode'); ...; timer.lap('flow')
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last)
+        self._last = now
+        return self.timings[stage]
+
+    def reset(self):
+        self._last = time.perf_counter()
+
+
+class RideTimingProfile:
+    """
+    Collects PipelineEvents for one ride and summarises them.
+    Can be used directly as (or chained behind) a progress callback.
+    """
+
+    def __init__(self, forward=None):
+        self.forward = forward
+        self.windows = []
+        self.stages = {}
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def __call__(self, event):
+        if event.stage == 'window':
+            self.windows.append({'frame_id': event.frame_id, **event.timings})
+        else:
+            for stage, seconds in event.timings.items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            if event.stage == 'done':
+                self.finished_at = time.time()
+        if self.forward is not None:
+            self.forward(event)
+
+    def summary(self):
+        totals = {stage: 0.0 for stage in WINDOW_STAGES}
+        for window in self.windows:
+            for stage in WINDOW_STAGES:
+                totals[stage] += window.get(stage, 0.0)
+        n = len(self.windows)
+        return {
+            'windows': n,
+            'window_totals': totals,
+            'window_means': {s: (t / n if n else 0.0) for s, t in totals.items()},
+            'ride_stages': dict(self.stages),
+            'wall_seconds': (self.finished_at or time.time()) - self.started_at,
+        }
+
+    def to_dict(self):
+        return {'summary': self.summary(), 'windows': list(self.windows)}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
@@ -0,0 +1,234 @@
+# job_manager.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import ResultCache, make_cache_key
+
+# How many rides may be analysed at the same time. Each analysis holds a YOLO
+# model, decoded frames and optical-flow fields in memory, so keep this low on
+# small cloud instances. Extra jobs wait in the queue.
+DEFAULT_MAX_CONCURRENT_JOBS = int(os.environ.get("RIDE_MAX_CONCURRENT_JOBS", "1"))
+
+# RIDE_WARM_POOL=1 runs analyses in worker processes forked after the models
+# are loaded once (see worker_pool.py), one per concurrent job, instead of in
+# threads that each load the detector and train the risk model per ride.
+WARM_POOL = os.environ.get("RIDE_WARM_POOL", "0") == "1"
+
+# Finished jobs are kept around so a page rerun can still pick up its result.
+DEFAULT_MAX_FINISHED_JOBS = int(os.environ.get("RIDE_MAX_FINISHED_JOBS", "50"))
+
+
+def _default_pipeline():
+    """
+    (process_ride_video, PIPELINE_VERSION), imported on first use: process_video
+    loads OpenCV, NumPy and the detector code, which the page does not need
+    until a video is submitted.
+    """
+    from process_video import process_ride_video, PIPELINE_VERSION
+    return process_ride_video, PIPELINE_VERSION
+
+
+class AnalysisJob:
+    """
+    Bookkeeping for one submitted ride analysis.
+    Status goes queued -> running -> done / failed.
+    """
+
+    def __init__(self, job_id, video_path, cleanup=True, cache_key=None):
+        self.job_id = job_id
+        self.video_path = video_path
+        self.cleanup = cleanup
+        self.cache_key = cache_key
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cached = False
+        self.windows_done = 0
+        self.windows_total = 0
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'cached': self.cached,
+            'windows_done': self.windows_done,
+            'windows_total': self.windows_total,
+        }
+
+
+class JobManager:
+    """
+    Runs ride analyses on a small local worker pool so the Streamlit script
+    thread never blocks on process_ride_video(). Jobs are addressed by id,
+    which the page keeps in session state and polls on every rerun.
+
+    When a video hash is given, finished results are stored in a ResultCache
+    keyed by hash + PIPELINE_VERSION, and identical uploads are answered from
+    the cache (or attached to the job already analysing them).
+
+    The default runner and pipeline version come from process_video, which is
+    imported on the first submit so that creating the manager (on the first
+    page render) stays cheap.
+    """
+
+    def __init__(self, max_workers=None, max_finished_jobs=None, runner=None,
+                 result_cache=None, pipeline_version=None):
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_CONCURRENT_JOBS)
+        self.max_finished_jobs = max_finished_jobs or DEFAULT_MAX_FINISHED_JOBS
+        self._runner = runner
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self._pipeline_version = pipeline_version
+        self._pool = None
+        self._runner_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="ride-analysis"
+        )
+        self.jobs = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    @property
+    def runner(self):
+        with self._runner_lock:  # worker threads may all ask on the first jobs
+            if self._runner is None:
+                if WARM_POOL:
+                    from worker_pool import WarmWorkerPool
+                    self._pool = WarmWorkerPool(self.max_workers)
+                    self._runner = self._pool.run
+                else:
+                    self._runner = _default_pipeline()[0]
+            return self._runner
+
+    @property
+    def pipeline_version(self):
+        if self._pipeline_version is None:
+            self._pipeline_version = _default_pipeline()[1]
+        return self._pipeline_version
+
+    def submit(self, video_path, cleanup=True, video_hash=None):
+        """
+        Queue a video for analysis and return its job id immediately.
+        If cleanup is True the video file is deleted once the job finishes.
+        If video_hash is given, a cached result or an in-flight job for the
+        same content is reused instead of analysing the video again.
+        """
+        cache_key = make_cache_key(video_hash, self.pipeline_version) if video_hash else None
+
+        cached = self.result_cache.get(cache_key) if cache_key else None
+        with self._lock:
+            in_flight = self._find_in_flight(cache_key) if cache_key and cached is None else None
+            if in_flight is None:
+                job_id = uuid.uuid4().hex
+                job = AnalysisJob(job_id, video_path, cleanup=cleanup, cache_key=cache_key)
+                if cached is not None:
+                    job.status = "done"
+                    job.result = cached
+                    job.progress = 1.0
+                    job.message = "Loaded cached analysis."
+                    job.cached = True
+                    job.started_at = job.finished_at = time.time()
+                self.jobs[job_id] = job
+                self._order.append(job_id)
+                self._prune()
+
+        if cached is not None or in_flight is not None:
+            self._discard_video(video_path, cleanup)
+            return job_id if in_flight is None else in_flight
+        self.executor.submit(self._run, job)
+        return job_id
+
+    def get_job(self, job_id):
+        """Return a snapshot dict of the job, or None if it is unknown/expired."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = job.to_dict()
+            if job.status == "queued":
+                snapshot['queue_position'] = self._queue_position(job_id)
+            return snapshot
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for j in self.jobs.values() if j.status in ("queued", "running"))
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _find_in_flight(self, cache_key):
+        for jid in self._order:
+            job = self.jobs[jid]
+            if job.cache_key == cache_key and job.status in ("queued", "running"):
+                return jid
+        return None
+
+    @staticmethod
+    def _discard_video(video_path, cleanup):
+        if cleanup and os.path.exists(video_path):
+            try:
+                os.unlink(video_path)
+            except OSError:
+                pass
+
+    def _queue_position(self, job_id):
+        queued = [jid for jid in self._order if self.jobs[jid].status == "queued"]
+        return queued.index(job_id) + 1 if job_id in queued else 0
+
+    def _update(self, job, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(job, key, value)
+
+    def _run(self, job):
+        self._update(job, status="running", started_at=time.time(),
+                     message="Initializing models...")
+
+        def on_progress(event):
+            fields = {'message': event.message}
+            if event.fraction is not None:
+                fields['progress'] = max(0.0, min(1.0, float(event.fraction)))
+            if event.windows_total:
+                fields['windows_done'] = event.windows_done
+                fields['windows_total'] = event.windows_total
+            self._update(job, **fields)
+
+        try:
+            result = self.runner(job.video_path, progress_callback=on_progress)
+            if result:
+                if job.cache_key:
+                    self.result_cache.put(job.cache_key, result)
+                self._update(job, status="done", result=result, progress=1.0,
+                             message="Analysis complete!")
+            else:
+                self._update(job, status="failed",
+                             error="Failed to process video. Please check the file format.")
+        except Exception as e:
+            self._update(job, status="failed", error=str(e))
+        finally:
+            self._update(job, finished_at=time.time())
+            self._discard_video(job.video_path, job.cleanup)
+
+    def _prune(self):
+        """Drop the oldest finished jobs once we hold more than max_finished_jobs."""
+        finished = [jid for jid in self._order if self.jobs[jid].status in ("done", "failed")]
+        excess = len(finished) - self.max_finished_jobs
+        for jid in finished[:max(0, excess)]:
+            self._order.remove(jid)
+            del self.jobs[jid]
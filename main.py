@@ -1,31 +1,168 @@
-import sys
 import os
+import time
+import argparse
 from video_processor import VideoProcessor
 from text_generator import TextGenerator
 from risk_model import RiskModel
 from recommendations import RecommendationEngine
+from instrumentation import PipelineEvent, RideTimingProfile
+from profiler import PipelineProfiler, VIDEO_PROCESSOR_METHODS
+from detector_backends import BACKENDS
+from checkpoint import DEFAULT_CHECKPOINT_EVERY
+from frame_readers import READERS, probe_clips, ride_clips
+from frame_transport import DEFAULT_SLOTS, PIPELINES
+from sampling import (DEFAULT_KEYFRAME_TOLERANCE, DEFAULT_WINDOW_SECONDS, SAMPLING_STRATEGIES,
+                      format_report as format_sampling)
+from telemetry import (KMH_PER_MOTION_UNIT, calibrate_motion_unit, format_report as format_telemetry,
+                       load_telemetry, resolve_telemetry)
+from two_tier import (DEFAULT_PROXY_IMGSZ, DEFAULT_PROXY_SCALE, DEFAULT_PROXY_STRIDE, process_video_two_tier,
+                      format_report as format_two_tier)
 
-def main():
+DEFAULT_VIDEO_PATH = r"G:\Capstone c\Videos\video 1.mp4"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dhaka-Ride safety analysis for a single ride video.")
     # Allow video path to be passed as command line argument or use default
-    if len(sys.argv) > 1:
-        video_path = sys.argv[1]
-    else:
-        video_path = r"G:\Capstone c\Videos\video 1.mp4"
+    parser.add_argument("video_path", nargs="*", default=[DEFAULT_VIDEO_PATH],
+                        help="Path to the ride video; several paths (dashcam loop clips, in order) "
+                             "are analysed as one continuous ride")
+    parser.add_argument("--timings", metavar="PATH",
+                        help="Write the per-window/per-stage timing profile to this JSON file")
+    parser.add_argument("--profile", metavar="PATH", nargs="?", const="ride_profile.json",
+                        help="Profile every VideoProcessor method and pipeline stage (wall time, "
+                             "call counts) and write a JSON report (default: ride_profile.json)")
+    parser.add_argument("--profile-trace", metavar="PATH",
+                        help="Also write collapsed stacks for flamegraph.pl/speedscope (implies --profile)")
+    parser.add_argument("--backend", default="ultralytics", choices=sorted(BACKENDS),
+                        help="Detector inference backend (onnxruntime/openvino export the weights once)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op threads for the detector backend (default: library default)")
+    parser.add_argument("--imgsz", type=int, default=640,
+                        help="Detector input size, a multiple of 32 (320/480/640: faster <-> more accurate)")
+    parser.add_argument("--reader", default="opencv", choices=READERS,
+                        help="Frame decoding: OpenCV (default, as before readers existed) or an ffmpeg "
+                             "subprocess (threaded, frame-accurate); auto uses ffmpeg when it is installed")
+    parser.add_argument("--decode-scale", type=float, default=None,
+                        help="Decode frames scaled by this factor (e.g. 0.5 for 4K footage)")
+    parser.add_argument("--decode-threads", type=int, default=0, help="ffmpeg decoder threads (0 = auto)")
+    parser.add_argument("--sampling", default="fixed", choices=SAMPLING_STRATEGIES,
+                        help="keyframe: probe keyframes once so OpenCV decoding stops re-seeking within a GOP")
+    parser.add_argument("--keyframe-tolerance", type=int, default=DEFAULT_KEYFRAME_TOLERANCE,
+                        help="With --sampling keyframe, max frames a window start may move to land on a keyframe")
+    parser.add_argument("--window-seconds", type=float, default=DEFAULT_WINDOW_SECONDS,
+                        help="Window length in seconds of ride, at any camera frame rate "
+                             "(default 0.5: 15 frames at 30 fps, 30 at 60 fps)")
+    parser.add_argument("--pipeline", default="inline", choices=PIPELINES,
+                        help="processes: decode and optical flow in two worker processes running ahead of "
+                             "inference, frames passed through a shared-memory ring (same results)")
+    parser.add_argument("--pipeline-slots", type=int, default=DEFAULT_SLOTS,
+                        help="With --pipeline processes, windows the decoder may run ahead (ring slots)")
+    parser.add_argument("--two-tier", action="store_true",
+                        help="Proxy pass at reduced resolution/frame rate first, then re-analyse only the "
+                             "windows it flags (risk >= 1) at full resolution")
+    parser.add_argument("--proxy-scale", type=float, default=DEFAULT_PROXY_SCALE,
+                        help="Proxy pass decode scale (--two-tier)")
+    parser.add_argument("--proxy-stride", type=int, default=DEFAULT_PROXY_STRIDE,
+                        help="Proxy pass analyses every Nth window (--two-tier)")
+    parser.add_argument("--proxy-imgsz", type=int, default=DEFAULT_PROXY_IMGSZ,
+                        help="Proxy pass detector input size (--two-tier)")
+    parser.add_argument("--full-warmup", type=int, default=None,
+                        help="Warm-up windows before each re-analysed run (--two-tier; default: the longest "
+                             "temporal detector history, so entries match an all-full run)")
+    parser.add_argument("--telemetry", metavar="PATH", default="none",
+                        help="GPS/IMU CSV log; windows it covers take speed, jerk and jolt from it instead of "
+                             "optical flow ('auto': ride.telemetry.csv or ride.csv next to the video, skipped "
+                             "with a warning if it is not a telemetry log; default: none)")
+    parser.add_argument("--telemetry-offset", type=float, default=0.0,
+                        help="Seconds from the first log sample to the start of the video")
+    parser.add_argument("--telemetry-kmh-per-unit", type=float, default=KMH_PER_MOTION_UNIT,
+                        help="Log speed (km/h) that counts as one pixel of average flow (see --telemetry-calibrate)")
+    parser.add_argument("--telemetry-calibrate", action="store_true",
+                        help="Analyse the ride with optical flow and fit --telemetry-kmh-per-unit for this camera "
+                             "from the --telemetry log")
+    parser.add_argument("--checkpoint", metavar="PATH", nargs="?", const="ride_checkpoint.pkl",
+                        help="Checkpoint progress to this file (default: ride_checkpoint.pkl) and resume from it "
+                             "if a previous run of the same video and settings was interrupted")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help="Windows between checkpoints")
+    parser.add_argument("--detectors", default="all",
+                        help="Comma-separated detectors to run (frame_data field names, e.g. pinch,proximity); "
+                             "flow, YOLO and first-frame decoding are skipped when no enabled detector needs them")
+    return parser.parse_args(argv)
+
+def print_progress(event):
+    """Console progress line, updated roughly every 5% of windows."""
+    if event.stage != 'window' or event.windows_total <= 0:
+        return
+    step = max(1, event.windows_total // 20)
+    if event.windows_done % step == 0 or event.windows_done == event.windows_total:
+        pct = 100.0 * event.windows_done / event.windows_total
+        end = "\n" if event.windows_done == event.windows_total else ""
+        print(f"\r      windows {event.windows_done}/{event.windows_total} ({pct:.0f}%)", end=end, flush=True)
+
+def record_stage(profile, stage, started):
+    profile(PipelineEvent(stage, timings={stage: time.perf_counter() - started}))
+    return time.perf_counter()
+
+def profile_stage(profiler, name):
+    if profiler is not None:
+        profiler.switch_stage(name)
+
+def main():
+    args = parse_args()
+    # Several clips are one ride: frame numbers and detector state carry across files
+    video_path = args.video_path[0] if len(args.video_path) == 1 else args.video_path
     
     output_file = "ride_safety_report.txt"
+    profile = RideTimingProfile(forward=print_progress)
+    if args.profile_trace and not args.profile:
+        args.profile = "ride_profile.json"
+    profiler = PipelineProfiler(trace=bool(args.profile_trace)) if args.profile else None
     
     print("--- DHAKA-RIDE PROTOCOL (Logic-First) ---")
     
+    telemetry = resolve_telemetry(video_path, args.telemetry)
+    if args.telemetry_calibrate and telemetry is None:
+        print("Error: --telemetry-calibrate needs a telemetry log (--telemetry PATH or auto)")
+        return
+
     # 1. Setup Processor
-    processor = VideoProcessor(video_path, window_size=10)
+    started = time.perf_counter()
+    profile_stage(profiler, 'model_init')
+    processor = VideoProcessor(video_path, window_size=10, backend=args.backend,
+                               backend_options={'intra_op_threads': args.threads}, imgsz=args.imgsz,
+                               reader=args.reader, decode_scale=args.decode_scale,
+                               decode_threads=args.decode_threads, sampling=args.sampling,
+                               keyframe_tolerance=args.keyframe_tolerance,
+                               telemetry=None if args.telemetry_calibrate else telemetry,
+                               telemetry_offset=args.telemetry_offset,
+                               telemetry_kmh_per_unit=args.telemetry_kmh_per_unit, detectors=args.detectors,
+                               checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                               window_seconds=args.window_seconds, pipeline=args.pipeline,
+                               pipeline_slots=args.pipeline_slots)
+    if 'boxes' in processor.detector_inputs():
+        processor.load_model()
     text_gen = TextGenerator()
     risk_ai = RiskModel()
     rec_engine = RecommendationEngine()
     risk_ai.train_mock_model() 
+    record_stage(profile, 'model_init', started)
+    if profiler is not None:
+        profiler.instrument(processor, VIDEO_PROCESSOR_METHODS)
+        profiler.instrument(text_gen, ['generate_description'])
+        profiler.instrument(risk_ai, ['predict_risk', 'interpret_risk'])
+        profiler.instrument(rec_engine, ['get_recommendations', 'format_recommendations'])
+    profile_stage(profiler, 'video')
 
-    print(f"\n[1/4] Processing Video: {video_path}...")
+    print(f"\n[1/4] Processing Video: {', '.join(ride_clips(video_path))}...")
     try:
-        raw_frame_data = processor.process_video()
+        if args.two_tier:
+            raw_frame_data, two_tier_report = process_video_two_tier(
+                processor, risk_ai, text_gen, args.proxy_scale, args.proxy_stride, args.proxy_imgsz,
+                warmup=args.full_warmup, progress_callback=profile)
+            print(format_two_tier(two_tier_report))
+        else:
+            raw_frame_data, two_tier_report = processor.process_video(progress_callback=profile), None
     except Exception as e:
         print(f"Error: {e}")
         return
@@ -34,9 +171,23 @@ def main():
         print("No frames found.")
         return
 
+    if args.telemetry_calibrate:
+        fitted = calibrate_motion_unit(
+            load_telemetry(telemetry, args.telemetry_offset, args.telemetry_kmh_per_unit),
+            [(f['frame_id'] / processor.fps, f['frame_id'] / processor.fps + processor.window_duration,
+              f['avg_motion']) for f in raw_frame_data if processor.fps])
+        if fitted is None:
+            print("Telemetry calibration: no moving window is covered by the log")
+        else:
+            print(f"Telemetry calibration: {fitted:.2f} km/h per unit of flow "
+                  f"(use --telemetry-kmh-per-unit {fitted:.2f})")
+
     print(f"\n[2/4] Generating Dhaka-Context Descriptions...")
+    started = time.perf_counter()
+    profile_stage(profiler, 'text_generation')
     try:
         descriptions = [text_gen.generate_description(f) for f in raw_frame_data]
+        started = record_stage(profile, 'text_generation', started)
     except Exception as e:
         print(f"Error generating descriptions: {e}")
         return
@@ -46,8 +197,10 @@ def main():
         return
     
     print("\n[3/4] Predicting Risk Levels...")
+    profile_stage(profiler, 'risk_prediction')
     try:
         risk_predictions = risk_ai.predict_risk(descriptions)
+        started = record_stage(profile, 'risk_prediction', started)
     except Exception as e:
         print(f"Error predicting risk: {e}")
         return
@@ -76,10 +229,21 @@ def main():
     safe_frames = 0
     total_samples = len(descriptions)
 
+    profile_stage(profiler, 'report')
     try:
         with open(output_file, "w", encoding='utf-8') as f:
             f.write("DHAKA-RIDE SAFETY REPORT\n")
             f.write("========================\n")
+            if len(ride_clips(video_path)) > 1:
+                _, offsets = probe_clips(ride_clips(video_path))
+                f.write("Clips: " + ", ".join(f"{os.path.basename(clip)} from frame {offset}"
+                                              for clip, offset in zip(ride_clips(video_path), offsets)) + "\n")
+            f.write(format_sampling(processor.sampling_report) + "\n")
+            if two_tier_report is not None:
+                f.write(format_two_tier(two_tier_report) + "\n")
+            if processor.telemetry_report is not None:
+                f.write(format_telemetry(processor.telemetry_report) + "\n")
+            f.write("\n")
             f.write("CRITICAL EVENTS:\n")
             f.write("-" * 40 + "\n")
 
@@ -228,6 +392,7 @@ def main():
                 verdict, stats, descriptions, raw_frame_data
             )
             rec_engine.format_recommendations(recommendations, output_file)
+            record_stage(profile, 'recommendations', started)
     except IOError as e:
         print(f"Error writing to file {output_file}: {e}")
         return
@@ -240,5 +405,22 @@ def main():
     print(f"Reactive Swerves: {stats['Reactive Swerves']}")
     print(f"Pinch Points: {stats['Pinch Points']}")
 
+    profile(PipelineEvent('done'))
+    summary = profile.summary()
+    print(f"Processing time: {summary['wall_seconds']:.1f}s over {summary['windows']} windows "
+          + ", ".join(f"{stage} {secs:.1f}s" for stage, secs in summary['window_totals'].items()))
+    if args.timings:
+        profile.save(args.timings)
+        print(f"Timing profile saved to {args.timings}")
+    if profiler is not None:
+        profile_stage(profiler, None)
+        print("\nPROFILE (slowest first)")
+        print(profiler.format_table())
+        profiler.save_json(args.profile)
+        print(f"Profile report saved to {args.profile}")
+        if args.profile_trace:
+            profiler.save_folded(args.profile_trace)
+            print(f"Flamegraph trace saved to {args.profile_trace}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,34 +1,201 @@
 # process_video.py
+import copy
 import os
-from video_processor import VideoProcessor
+import time
+from video_processor import VideoProcessor, resolve_detectors
 from text_generator import TextGenerator
 from risk_model import RiskModel
 from recommendations import RecommendationEngine
+from instrumentation import PipelineEvent, RideTimingProfile, video_fraction
+from profiler import PipelineProfiler, VIDEO_PROCESSOR_METHODS
+from frame_readers import resolve_reader
+from sampling import DEFAULT_KEYFRAME_TOLERANCE, DEFAULT_WINDOW_SECONDS
+from telemetry import KMH_PER_MOTION_UNIT, resolve_telemetry
+from two_tier import process_video_two_tier
 
-def process_ride_video(video_path):
+# Detector inference backend (see detector_backends.py). Backends agree on
+# boxes within numerical tolerance, not bit-for-bit, so the backend is part of
+# the cache key.
+DETECTOR_BACKEND = os.environ.get("RIDE_DETECTOR_BACKEND", "ultralytics")
+DETECTOR_THREADS = int(os.environ.get("RIDE_DETECTOR_THREADS", "0")) or None
+# Detector input size (320/480/640); smaller is faster but misses small/far objects
+DETECTOR_IMGSZ = int(os.environ.get("RIDE_DETECTOR_IMGSZ", "640"))
+# Frame decoding: 'opencv' (the default, as in main.py), 'ffmpeg' (threaded,
+# frame-accurate on MKV/MOV), or 'auto' for ffmpeg when installed, else
+# OpenCV. 'auto' is resolved when a processor is built, so importing this
+# module (and the cache key) does not depend on the host's PATH.
+# RIDE_DECODE_SCALE < 1 decodes smaller; its flow is scaled back to
+# source-resolution pixels since 1.2.
+VIDEO_READER = os.environ.get("RIDE_VIDEO_READER", "opencv")
+DECODE_SCALE = float(os.environ.get("RIDE_DECODE_SCALE", "1")) or None
+DECODE_THREADS = int(os.environ.get("RIDE_DECODE_THREADS", "0"))
+# Window plan: 'keyframe' probes keyframes so the OpenCV reader stops
+# re-seeking within a GOP (same output); RIDE_KEYFRAME_TOLERANCE > 0 also
+# moves window starts onto keyframes (shifted samples, so part of the key)
+SAMPLING = os.environ.get("RIDE_SAMPLING", "fixed")
+KEYFRAME_TOLERANCE = int(os.environ.get("RIDE_KEYFRAME_TOLERANCE", str(DEFAULT_KEYFRAME_TOLERANCE)))
+# Window length in seconds of ride (15 frames at 30 fps, 30 at 60 fps); windows
+# and the temporal detector limits are time-based since 1.1
+WINDOW_SECONDS = float(os.environ.get("RIDE_WINDOW_SECONDS", str(DEFAULT_WINDOW_SECONDS)))
+# Two-tier mode: a reduced-resolution proxy pass over the whole ride, then
+# full resolution only for the windows it flags (see two_tier.py). Since 1.2
+# its frame_data has an entry for every window and the full pass is warmed up.
+TWO_TIER = os.environ.get("RIDE_TWO_TIER", "0") == "1"
+# GPS/IMU sidecar logs (see telemetry.py): 'auto' uses ride.telemetry.csv or
+# ride.csv next to the video in place of optical flow for speed/jerk/jolt.
+# Log values differ from flow estimates, so it is part of the key, with the
+# km/h per unit of flow of this camera (see main.py --telemetry-calibrate)
+# when it is not the default. Since 1.3 jerk is 0 where the source switches;
+# since 1.6 weaving, slalom and pinch entry skip log windows.
+TELEMETRY = os.environ.get("RIDE_TELEMETRY", "none")
+TELEMETRY_KMH_PER_UNIT = float(os.environ.get("RIDE_TELEMETRY_KMH_PER_UNIT", KMH_PER_MOTION_UNIT))
+# Comma-separated detectors to run (see DETECTORS in video_processor.py);
+# the others report defaults and the stages only they need are skipped.
+# Since 1.4 weaving and slalom_aggressive share one direction history update
+# per window; since 1.5 that history spans 7.5 s, as the default run's did.
+DETECTORS = os.environ.get("RIDE_DETECTORS", "all")
+# 'processes' decodes and computes optical flow in two processes running
+# ahead of inference, frames passed in shared memory (see frame_transport.py).
+# Same frame_data as 'inline', so not part of the key.
+PIPELINE = os.environ.get("RIDE_PIPELINE", "inline")
+
+# The settings above that change the analysis output, as (tag, value) in key
+# order. None leaves a setting out of the key (it is at its default), so a
+# default run keeps a short key. Add a setting here when it changes frame_data
+# or the report; settings that only change speed (threads, sampling without
+# tolerance, the pipeline) stay out so their results are shared.
+CACHE_SETTINGS = (
+    ('', "yolov8n"),
+    ('', DETECTOR_BACKEND),
+    ('', DETECTOR_IMGSZ),
+    ('', f"{VIDEO_READER}x{DECODE_SCALE or 1:g}"),
+    ('kf', KEYFRAME_TOLERANCE if SAMPLING == "keyframe" and KEYFRAME_TOLERANCE else None),
+    ('w', f"{WINDOW_SECONDS:g}s" if WINDOW_SECONDS != DEFAULT_WINDOW_SECONDS else None),
+    ('2tier', "" if TWO_TIER else None),
+    ('telemetry', None if TELEMETRY.lower() == "none" else
+                  "" if TELEMETRY_KMH_PER_UNIT == KMH_PER_MOTION_UNIT else f"{TELEMETRY_KMH_PER_UNIT:g}"),
+    ('det:', None if DETECTORS == "all" else ",".join(resolve_detectors(DETECTORS))),
+)
+
+# Bump the leading number whenever detector logic, thresholds, the YOLO
+# weights, the risk model training data or the report format change. Cached
+# results are keyed on this, so old entries stop matching instead of being
+# served stale.
+PIPELINE_VERSION = "+".join(["1.6"] + [f"{tag}{value}" for tag, value in CACHE_SETTINGS if value is not None])
+
+def _stage_done(timing, stage, started, fraction, message):
+    """Record a finished ride-level stage and announce the next one."""
+    timing(PipelineEvent(stage, message=message, timings={stage: time.perf_counter() - started},
+                          fraction=fraction))
+    return time.perf_counter()
+
+def _profile_stage(profiler, name):
+    if profiler is not None:
+        profiler.switch_stage(name)
+
+class PipelineModels:
+    """
+    The models every analysis needs, loaded once: the detector backend and the
+    trained RiskModel. Both are only read while analysing, so one set can
+    serve every ride in a process, or every worker forked from it (see
+    worker_pool.py).
+    """
+
+    def __init__(self, detector, risk_model):
+        self.detector = detector
+        self.risk_model = risk_model
+
+def _make_processor(video_path, model=None):
+    return VideoProcessor(video_path, window_size=10, backend=DETECTOR_BACKEND,
+                          backend_options={'intra_op_threads': DETECTOR_THREADS},
+                          imgsz=DETECTOR_IMGSZ, reader=resolve_reader(VIDEO_READER), decode_scale=DECODE_SCALE,
+                          decode_threads=DECODE_THREADS, sampling=SAMPLING,
+                          keyframe_tolerance=KEYFRAME_TOLERANCE,
+                          telemetry=resolve_telemetry(video_path, TELEMETRY) if video_path else None,
+                          telemetry_kmh_per_unit=TELEMETRY_KMH_PER_UNIT,
+                          detectors=DETECTORS, window_seconds=WINDOW_SECONDS, model=model, pipeline=PIPELINE)
+
+def load_pipeline_models():
+    """
+    Loads the detector backend and trains the RiskModel with the pipeline
+    settings above. The backend is only loaded if an enabled detector reads
+    boxes (RIDE_DETECTORS); otherwise detector is None.
+    """
+    processor = _make_processor(None)
+    detector = processor.load_model() if 'boxes' in processor.detector_inputs() else None
+    risk_ai = RiskModel()
+    risk_ai.train_mock_model()
+    return PipelineModels(detector, risk_ai)
+
+def process_ride_video(video_path, progress_callback=None, profile=False, models=None):
     """
     Process video and return all analysis results.
-    Returns: dict with stats, verdict, recommendations, etc.
+    progress_callback(event), if given, receives a PipelineEvent per processed
+    window and per pipeline stage; event.fraction is the overall progress (0-1).
+    profile: True (or a PipelineProfiler, e.g. one created with trace=True) to
+    record per-method/per-stage wall time and call counts; the report is
+    returned under 'profile'. Disabled by default, with no overhead.
+    models: a PipelineModels from load_pipeline_models() to reuse instead of
+    loading the detector and training the risk model for this ride.
+    Returns: dict with stats, verdict, recommendations, timing profile, etc.
     """
+    profiler = PipelineProfiler() if profile is True else (profile or None)
+
+    def forward(event):
+        if event.stage == 'window':
+            event.fraction = video_fraction(event.windows_done, event.windows_total)
+        if progress_callback is not None:
+            progress_callback(event)
+
+    timing = RideTimingProfile(forward=forward)
+    timing(PipelineEvent('start', message="Initializing models...", fraction=0.0))
+    started = time.perf_counter()
+
     # Initialize components
-    processor = VideoProcessor(video_path, window_size=10)
+    _profile_stage(profiler, 'model_init')
+    processor = _make_processor(video_path, model=models.detector if models is not None else None)
+    if 'boxes' in processor.detector_inputs():
+        processor.load_model()
     text_gen = TextGenerator()
-    risk_ai = RiskModel()
     rec_engine = RecommendationEngine()
-    risk_ai.train_mock_model()
+    if models is not None:
+        # The profiler wraps methods on the instance, so it gets its own copy
+        risk_ai = copy.copy(models.risk_model) if profiler is not None else models.risk_model
+    else:
+        risk_ai = RiskModel()
+        risk_ai.train_mock_model()
+    started = _stage_done(timing, 'model_init', started, 0.05, "Processing video frames...")
+    if profiler is not None:
+        profiler.instrument(processor, VIDEO_PROCESSOR_METHODS)
+        profiler.instrument(text_gen, ['generate_description'])
+        profiler.instrument(risk_ai, ['predict_risk', 'interpret_risk'])
+        profiler.instrument(rec_engine, ['get_recommendations'])
     
     # Process video
-    raw_frame_data = processor.process_video()
+    _profile_stage(profiler, 'video')
+    if TWO_TIER:
+        raw_frame_data, two_tier_report = process_video_two_tier(processor, risk_ai, text_gen,
+                                                                 progress_callback=timing)
+    else:
+        raw_frame_data, two_tier_report = processor.process_video(progress_callback=timing), None
     if not raw_frame_data:
+        _profile_stage(profiler, None)
         return None
     
     # Generate descriptions
+    _profile_stage(profiler, 'text_generation')
+    started = time.perf_counter()
     descriptions = [text_gen.generate_description(f) for f in raw_frame_data]
     if not descriptions:
+        _profile_stage(profiler, None)
         return None
+    started = _stage_done(timing, 'text_generation', started, 0.92, "Predicting risk levels...")
     
     # Predict risks
+    _profile_stage(profiler, 'risk_prediction')
     risk_predictions = risk_ai.predict_risk(descriptions)
+    started = _stage_done(timing, 'risk_prediction', started, 0.95, "Generating recommendations...")
+    _profile_stage(profiler, 'report')
     
     # Initialize stats
     stats = {
@@ -138,9 +305,13 @@ def process_ride_video(video_path):
         reason = "Excellent defensive riding. Minimal hazards detected."
     
     # Get recommendations
+    _profile_stage(profiler, 'recommendations')
     recommendations = rec_engine.get_recommendations(
         verdict, stats, descriptions, raw_frame_data
     )
+    _profile_stage(profiler, None)
+    _stage_done(timing, 'recommendations', started, 1.0, "Analysis complete!")
+    timing(PipelineEvent('done', message="Analysis complete!", fraction=1.0))
     
     # Determine rider style
     reactive_ratio = stats['Reactive Swerves'] / max(critical_frames, 1)
@@ -156,7 +327,7 @@ def process_ride_video(video_path):
         rider_style = "PROACTIVE (Safe)"
         style_analysis = "Rider maintains smooth lane discipline and anticipates hazards."
     
-    return {
+    results = {
         'stats': stats,
         'verdict': verdict,
         'reason': reason,
@@ -167,6 +338,13 @@ def process_ride_video(video_path):
         'recommendations': recommendations,
         'critical_events': critical_events,
         'rider_style': rider_style,
-        'style_analysis': style_analysis
+        'style_analysis': style_analysis,
+        'timing_profile': timing.to_dict(),
+        'sampling': processor.sampling_report,
+        'two_tier': two_tier_report,
+        'telemetry': processor.telemetry_report
     }
+    if profiler is not None:
+        results['profile'] = profiler.report()
+    return results
 
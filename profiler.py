@@ -0,0 +1,153 @@
+# profiler.py
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+# VideoProcessor methods worth timing individually. Everything the window loop
+# calls is here, including the Farneback (compute_flow) and YOLO (run_detector)
+# wrappers, so a ride's cost can be split per detector.
+VIDEO_PROCESSOR_METHODS = (
+    'compute_flow',
+    'run_detector',
+    'estimate_speed_proxy',
+    'flow_speed_proxy',
+    'telemetry_speed_proxy',
+    'classify_dhaka_vehicle',
+    'detect_pinch_point',
+    '_calculate_center_gap',
+    'detect_intentional_pinch_entry',
+    'detect_leguna_brake',
+    'detect_wrong_way',
+    'detect_jaywalker',
+    'detect_jaywalkers',
+    'check_blind_spot_loitering',
+    'check_red_light',
+    'detect_gap_shooting',
+    'detect_speed_breaker',
+    'detect_bus_blockade',
+    'detect_weaving',
+    'detect_slalom_aggressive',
+)
+
+
+class PipelineProfiler:
+    """
+    Records cumulative wall time, self time and call counts per method and
+    per pipeline stage.
+
+    Nothing is patched unless a profiler is created and instrument() is
+    called, so the normal (non-profiling) path has no overhead at all.
+    Instrumentation wraps methods on the *instance*, never on the class.
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.stats = {}     # name -> {'calls', 'total_s', 'self_s'}
+        self.folded = {}    # 'stage;method;...' -> self seconds (flamegraph input)
+        self._stack = []    # [name, start, child_seconds]
+        self._open_stage = False
+        self.started_at = time.perf_counter()
+
+    def instrument(self, obj, methods=None, prefix=None):
+        """Wrap the given (or all public) methods of obj so each call is timed."""
+        prefix = prefix or type(obj).__name__
+        if methods is None:
+            methods = [m for m in dir(obj) if not m.startswith('_') and callable(getattr(obj, m))]
+        for method in methods:
+            bound = getattr(obj, method, None)
+            if bound is None or not callable(bound):
+                continue
+            setattr(obj, method, self._wrap(f"{prefix}.{method}", bound))
+        return obj
+
+    def _wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            self._enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+        return timed
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as a pipeline stage: `with profiler.stage('video'): ...`"""
+        self._enter(f"stage:{name}")
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def switch_stage(self, name):
+        """
+        Ends the currently open stage (if any) and opens `name` (unless None).
+        Handy for straight-line pipelines where `with` blocks would nest deeply.
+        """
+        if self._open_stage:
+            self._exit()
+            self._open_stage = False
+        if name is not None:
+            self._enter(f"stage:{name}")
+            self._open_stage = True
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        name, start, child_seconds = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self_seconds = elapsed - child_seconds
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = {'calls': 0, 'total_s': 0.0, 'self_s': 0.0}
+        stat['calls'] += 1
+        stat['total_s'] += elapsed
+        stat['self_s'] += self_seconds
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        if self.trace:
+            path = ";".join([frame[0] for frame in self._stack] + [name])
+            self.folded[path] = self.folded.get(path, 0.0) + self_seconds
+
+    def report(self):
+        """Per-name stats sorted by total time, plus overall wall time."""
+        entries = []
+        for name, stat in sorted(self.stats.items(), key=lambda kv: -kv[1]['total_s']):
+            entries.append({
+                'name': name,
+                'calls': stat['calls'],
+                'total_s': stat['total_s'],
+                'self_s': stat['self_s'],
+                'mean_ms': 1000.0 * stat['total_s'] / stat['calls'] if stat['calls'] else 0.0,
+            })
+        return {
+            'wall_s': time.perf_counter() - self.started_at,
+            'stages': [e for e in entries if e['name'].startswith('stage:')],
+            'methods': [e for e in entries if not e['name'].startswith('stage:')],
+        }
+
+    def save_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def save_folded(self, path):
+        """
+        Writes collapsed stacks ("a;b;c <microseconds>" per line), the input
+        format of flamegraph.pl, speedscope and inferno. Needs trace=True.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(self.folded.items()):
+                micros = int(round(seconds * 1e6))
+                if micros > 0:
+                    f.write(f"{stack} {micros}\n")
+
+    def format_table(self, limit=25):
+        """Plain-text table of the most expensive entries, for console output."""
+        report = self.report()
+        lines = [f"{'name':<45} {'calls':>7} {'total s':>9} {'self s':>9} {'mean ms':>9}"]
+        for entry in (report['stages'] + report['methods'])[:limit]:
+            lines.append(f"{entry['name']:<45} {entry['calls']:>7} {entry['total_s']:>9.3f} "
+                         f"{entry['self_s']:>9.3f} {entry['mean_ms']:>9.2f}")
+        return "\n".join(lines)
@@ -0,0 +1,147 @@
+# quantize_detector.py
+"""
+Builds an INT8 version of the YOLO detector for the 'onnxruntime-int8' backend.
+
+The FP32 ONNX export (see detector_backends.export_weights) is statically
+quantized with ONNX Runtime. Activation ranges are calibrated on frames
+sampled from our own ride videos, preprocessed exactly as at inference time,
+so the scales match real Dhaka street footage rather than COCO.
+
+    python quantize_detector.py ride1.mp4 ride2.mp4 --frames-per-video 64
+    python main.py ride.mp4 --backend onnxruntime-int8
+
+The box/class decode at the end of the head stays in FP32; only the
+convolutions (the bulk of the compute) run in INT8.
+"""
+import argparse
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+
+from detector_backends import (DEFAULT_IMGSZ, DEFAULT_WEIGHTS, LetterboxPlan, export_weights,
+                               quantized_model_path)
+
+DEFAULT_FRAMES_PER_VIDEO = 64
+CALIBRATION_METHODS = ("minmax", "entropy", "percentile")
+
+
+def sample_calibration_frames(video_paths, frames_per_video=DEFAULT_FRAMES_PER_VIDEO):
+    """Evenly spaced frames across each video, so calibration covers the whole ride."""
+    frames = []
+    for path in video_paths:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {path}")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:
+            cap.release()
+            continue
+        for idx in np.linspace(0, total - 1, min(frames_per_video, total)).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+
+def _head_decode_nodes(model_path):
+    """
+    Nodes of the detection head that are not its convolutions: DFL, anchor
+    decode and concatenation. Quantizing those costs accuracy (box
+    coordinates and scores share one output tensor) and saves little time.
+    """
+    import onnx
+    graph = onnx.load(model_path).graph
+    modules = [int(m.group(1)) for m in (re.match(r"/model\.(\d+)/", n.name) for n in graph.node) if m]
+    if not modules:
+        return []
+    head = f"/model.{max(modules)}/"
+    return [n.name for n in graph.node
+            if n.name.startswith(head) and not (n.op_type == "Conv" and "/dfl/" not in n.name)]
+
+
+def quantize_detector(video_paths, weights=DEFAULT_WEIGHTS, imgsz=DEFAULT_IMGSZ, output=None,
+                      frames_per_video=DEFAULT_FRAMES_PER_VIDEO, method="minmax"):
+    """
+    Exports (once) and statically quantizes the detector to INT8 (QDQ format,
+    per-channel weights), calibrating on frames from video_paths.
+    Returns (output_path, stats dict).
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    frames = sample_calibration_frames(video_paths, frames_per_video)
+    if not frames:
+        raise ValueError("No calibration frames could be read from the given videos")
+
+    fp32_path = export_weights(weights, "onnx", imgsz)
+    output = output or quantized_model_path(weights, imgsz)
+    prepared_path = os.path.splitext(output)[0] + "_prep.onnx"
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {"images": LetterboxPlan(frame.shape, imgsz).prepare(frame)}
+
+    started = time.perf_counter()
+    # Fold constants and infer shapes so the quantizer sees the whole graph
+    quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            prepared_path, output, FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method={
+                "minmax": CalibrationMethod.MinMax,
+                "entropy": CalibrationMethod.Entropy,
+                "percentile": CalibrationMethod.Percentile,
+            }[method],
+            nodes_to_exclude=_head_decode_nodes(prepared_path),
+        )
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+    stats = {
+        'calibration_frames': len(frames),
+        'videos': list(video_paths),
+        'method': method,
+        'seconds': time.perf_counter() - started,
+        'fp32_mb': os.path.getsize(fp32_path) / (1024.0 * 1024.0),
+        'int8_mb': os.path.getsize(output) / (1024.0 * 1024.0),
+    }
+    return output, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize the YOLO detector to INT8, calibrated on local ride videos.")
+    parser.add_argument("videos", nargs="+", help="Ride videos to sample calibration frames from")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--frames-per-video", type=int, default=DEFAULT_FRAMES_PER_VIDEO)
+    parser.add_argument("--method", choices=CALIBRATION_METHODS, default="minmax",
+                        help="Activation range calibration (entropy/percentile are slower and use more memory)")
+    parser.add_argument("--output", help="Quantized model path (default: next to the weights)")
+    args = parser.parse_args(argv)
+
+    output, stats = quantize_detector(args.videos, args.weights, args.imgsz, args.output,
+                                      args.frames_per_video, args.method)
+    print(f"Calibrated on {stats['calibration_frames']} frames from {len(args.videos)} video(s) "
+          f"({stats['method']}, {stats['seconds']:.1f}s)")
+    print(f"INT8 model: {output} ({stats['int8_mb']:.1f} MB, FP32 {stats['fp32_mb']:.1f} MB)")
+    print("Use it with: python main.py <video> --backend onnxruntime-int8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# result_cache.py
+import copy
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_TTL_SECONDS = float(os.environ.get("RIDE_CACHE_TTL_SECONDS", str(24 * 3600)))
+DEFAULT_CACHE_MAX_ENTRIES = int(os.environ.get("RIDE_CACHE_MAX_ENTRIES", "64"))
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get("RIDE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def make_cache_key(video_hash, pipeline_version):
+    """Results are only reusable for the same video content AND the same pipeline."""
+    return f"{video_hash}:{pipeline_version}"
+
+
+class ResultCache:
+    """
+    Thread-safe in-process cache of process_ride_video() results.
+    Entries expire after ttl_seconds; when max_entries or max_bytes is
+    exceeded the least recently used entries are evicted first.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None, max_bytes=None):
+        self.ttl_seconds = DEFAULT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = DEFAULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = DEFAULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()  # key -> (stored_at, size, result)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss/expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, _, result = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own copy so one session can't mutate another's result
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.max_bytes and size > self.max_bytes:
+            return  # Too large to ever fit; don't flush the cache for it
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), size, copy.deepcopy(result))
+            self._total_bytes += size
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _evict(self):
+        now = time.time()
+        if self.ttl_seconds:
+            expired = [k for k, (t, _, _) in self._entries.items() if now - t > self.ttl_seconds]
+            for key in expired:
+                self._remove(key)
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
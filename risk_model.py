@@ -1,8 +1,10 @@
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.tree import DecisionTreeClassifier
-
 class RiskModel:
     def __init__(self):
+        # scikit-learn takes over a second to import, so it is loaded with the
+        # first model rather than with this module (app.py and main.py --help
+        # import the pipeline modules without ever building a model)
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.tree import DecisionTreeClassifier
         self.vectorizer = CountVectorizer()
         self.classifier = DecisionTreeClassifier(max_depth=6, criterion='entropy')
         self.is_trained = False
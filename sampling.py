@@ -0,0 +1,214 @@
+# sampling.py
+"""
+Window plans for VideoProcessor: which (first, last) frame pair each window
+reads.
+
+'fixed'     first and last frame of consecutive windows of `window_seconds`
+            (0.5 s: 15 frames at 30 fps, the original plan)
+'keyframe'  keyframe positions are handed to the reader, which then decodes
+            forward through each GOP instead of seeking back to its keyframe
+            for every sampled frame (same frames, same output). With
+            `tolerance` > 0 each window start also moves to the nearest
+            keyframe at most that many frames away, so a seek lands on a
+            keyframe instead of decoding the partial GOP before it. Windows
+            keep their length (the flow gap is unchanged), so an aligned
+            window can overlap its neighbour by up to `tolerance` frames.
+            That pays off for windows spaced wider than the GOP; with the
+            dense 0.5 s plan forward decoding already reads every frame
+            once, hence the default of 0.
+
+Windows are a fixed length of ride time, not of frames: window_interval()
+turns `window_seconds` into frames at the video's frame rate (30 frames at
+60 fps, 60 at 120 fps). A 60 or 120 fps action camera therefore costs the
+same number of windows per minute of ride as a 30 fps dashcam, and the
+flow between a window's first and last frame spans the same time, so the
+pixel thresholds the detectors were tuned with at 30 fps still apply.
+
+Keyframe positions are probed once per video with ffprobe, or with a one-time
+keyframe-only ffmpeg pass when ffprobe is missing. For a ride split over
+several clips, each clip is probed and its keyframes are offset to ride frame
+numbers, so windows are planned over the whole ride and may span a boundary.
+"""
+import bisect
+import re
+import shutil
+import subprocess
+
+from frame_readers import probe_clips, ride_clips
+
+SAMPLING_STRATEGIES = ("fixed", "keyframe")
+REFERENCE_FPS = 30.0  # frame rate the detector thresholds were tuned at
+DEFAULT_INTERVAL = 15  # frames per window at REFERENCE_FPS (and when the frame rate is unknown)
+DEFAULT_WINDOW_SECONDS = DEFAULT_INTERVAL / REFERENCE_FPS
+DEFAULT_KEYFRAME_TOLERANCE = 0  # frames a window start may move; 0 keeps the fixed windows
+
+
+def _times_to_indices(times, fps):
+    """Keyframe timestamps (s) -> frame numbers, counting from the first keyframe."""
+    times = sorted(set(times))
+    if not times or fps <= 0:
+        return []
+    return sorted(set(int(round((t - times[0]) * fps)) for t in times))
+
+
+def _ffprobe_keyframe_times(video_path, ffprobe):
+    cmd = [ffprobe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+           "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", video_path]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    times = []
+    for line in out.splitlines():
+        value = line.strip().strip(",")
+        try:
+            times.append(float(value))
+        except ValueError:
+            continue
+    return times
+
+
+def _ffmpeg_keyframe_times(video_path, ffmpeg):
+    # Keyframe-only decode (-skip_frame nokey); showinfo logs each frame's pts
+    cmd = [ffmpeg, "-nostdin", "-hide_banner", "-skip_frame", "nokey", "-i", video_path,
+           "-map", "0:v:0", "-an", "-vf", "showinfo", "-f", "null", "-"]
+    err = subprocess.run(cmd, capture_output=True, text=True, check=True).stderr
+    return [float(m.group(1)) for m in re.finditer(r"pts_time:\s*(-?[\d.]+)", err)]
+
+
+def probe_keyframes(video_path, fps):
+    """
+    Frame numbers of the video's keyframes and how they were found:
+    (indices, 'ffprobe' | 'ffmpeg-scan'), or (None, 'unavailable') when
+    neither tool is installed or probing fails. A list of clips gives
+    ride frame numbers (see frame_readers.MultiClipReader).
+    """
+    clips = ride_clips(video_path)
+    if len(clips) != 1:
+        _, offsets = probe_clips(clips)
+        indices, sources = [], set()
+        for clip, offset in zip(clips, offsets):
+            clip_indices, source = probe_keyframes(clip, fps)
+            if clip_indices is None:
+                return None, "unavailable"
+            indices.extend(offset + i for i in clip_indices)
+            sources.add(source)
+        return indices, "+".join(sorted(sources))
+    video_path = clips[0]
+    for tool, probe, source in (("ffprobe", _ffprobe_keyframe_times, "ffprobe"),
+                                ("ffmpeg", _ffmpeg_keyframe_times, "ffmpeg-scan")):
+        path = shutil.which(tool)
+        if path is None:
+            continue
+        try:
+            indices = _times_to_indices(probe(video_path, path), fps)
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        if indices:
+            return indices, source
+    return None, "unavailable"
+
+
+def window_interval(fps, window_seconds=DEFAULT_WINDOW_SECONDS):
+    """
+    Frames per window for `window_seconds` of video at `fps` (at least 2, so
+    a window has two distinct frames); DEFAULT_INTERVAL if fps is unknown.
+    """
+    if not fps or fps <= 0:
+        return DEFAULT_INTERVAL
+    return max(2, int(round(window_seconds * fps)))
+
+
+def window_duration(fps, interval):
+    """Seconds of video one window of `interval` frames spans."""
+    if not fps or fps <= 0:
+        return interval / REFERENCE_FPS
+    return interval / fps
+
+
+def fixed_windows(total_frames, interval=DEFAULT_INTERVAL):
+    """(first, last) frame of each consecutive `interval`-frame window."""
+    windows = []
+    for i in range(total_frames // interval):
+        start_frame = i * interval
+        windows.append((start_frame, min(start_frame + interval - 1, total_frames - 1)))
+    return windows
+
+
+def keyframe_windows(total_frames, keyframes, interval=DEFAULT_INTERVAL,
+                     tolerance=DEFAULT_KEYFRAME_TOLERANCE):
+    """
+    fixed_windows() with each start moved to the nearest keyframe at most
+    `tolerance` frames away (ties go to the earlier one). Starts stay in
+    increasing order. Returns (windows, shifts) where shifts[i] is the start
+    offset in frames.
+    """
+    windows = []
+    shifts = []
+    prev_start = -1
+    for nominal, _ in fixed_windows(total_frames, interval):
+        pos = bisect.bisect_left(keyframes, nominal)
+        candidates = [k for k in keyframes[max(pos - 1, 0):pos + 1]
+                      if abs(k - nominal) <= tolerance and k > prev_start
+                      and k + interval - 1 < total_frames]
+        start = min(candidates, key=lambda k: (abs(k - nominal), k)) if candidates else nominal
+        windows.append((start, min(start + interval - 1, total_frames - 1)))
+        shifts.append(start - nominal)
+        prev_start = start
+    return windows, shifts
+
+
+def plan_windows(video_path, total_frames, fps, strategy="fixed", interval=None,
+                 tolerance=DEFAULT_KEYFRAME_TOLERANCE):
+    """
+    Returns (windows, keyframes, report). keyframes is None for 'fixed'.
+    interval (frames per window) defaults to window_interval(fps). The
+    report records the strategy, window length, tolerance and how many
+    window starts landed on a keyframe, for the ride output.
+    """
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy '{strategy}'. Choose from: {', '.join(SAMPLING_STRATEGIES)}")
+    if interval is None:
+        interval = window_interval(fps)
+    windows = fixed_windows(total_frames, interval)
+    report = {'strategy': strategy, 'interval': interval, 'fps': fps,
+              'window_seconds': window_duration(fps, interval), 'windows': len(windows)}
+    if strategy == "fixed":
+        return windows, None, report
+
+    tolerance = max(0, min(int(tolerance), interval - 1))  # starts must stay in order
+    keyframes, source = probe_keyframes(video_path, fps)
+    report.update(tolerance=tolerance, keyframe_source=source)
+    if not keyframes:
+        print("Keyframe positions unavailable (no ffprobe/ffmpeg); using fixed windows")
+        report.update(strategy="fixed", aligned=0)
+        return windows, None, report
+
+    keyframe_set = set(keyframes)
+    gops = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    windows, shifts = keyframe_windows(total_frames, keyframes, interval, tolerance)
+    aligned = sum(1 for first, _ in windows if first in keyframe_set)
+    report.update(
+        keyframes=len(keyframes),
+        median_gop=sorted(gops)[len(gops) // 2] if gops else None,
+        aligned=aligned,
+        aligned_pct=100.0 * aligned / len(windows) if windows else 0.0,
+        mean_abs_shift=sum(abs(s) for s in shifts) / len(shifts) if shifts else 0.0,
+        max_abs_shift=max((abs(s) for s in shifts), default=0),
+    )
+    return windows, keyframes, report
+
+
+def format_report(report):
+    """One-line summary of a plan_windows() report."""
+    if report.get('strategy') != "keyframe":
+        line = (f"Sampling: fixed {report['window_seconds']:.2f}s windows "
+                f"({report['interval']} frames at {report['fps']:g} fps, {report['windows']} windows)")
+        if report.get('keyframe_source') == "unavailable":
+            line += ", keyframe alignment unavailable"
+        return line
+    line = (f"Sampling: keyframe-aware {report['window_seconds']:.2f}s windows ({report['interval']} frames), "
+            f"tolerance {report['tolerance']} frames "
+            f"({report['keyframe_source']}, {report['keyframes']} keyframes, median GOP {report['median_gop']}): "
+            f"{report['aligned']}/{report['windows']} window starts on a keyframe, "
+            f"mean shift {report['mean_abs_shift']:.1f}, max {report['max_abs_shift']} frames")
+    if report.get('seeks') is not None:
+        line += f", {report['seeks']} seeks"
+    return line
@@ -0,0 +1,261 @@
+# telemetry.py
+"""
+GPS/IMU sidecar logs as a replacement for optical-flow ego-motion.
+
+Many cameras write a CSV log next to the video. When it covers a window,
+VideoProcessor takes speed, jerk and vertical jolt from it instead of running
+Farneback flow on the window's frames.
+
+CSV columns (header names are case-insensitive; extra columns are ignored):
+    time                    seconds; 'time', 't', 'timestamp', 'time_s' or 'seconds'
+    speed                   'speed_kmh', 'speed_mps' or 'speed' (m/s), or
+                            'lat'/'lon' (degrees), from which speed is derived
+    accel_x/accel_y/accel_z m/s^2 ('ax'/'ay'/'az' also accepted); x = lateral
+                            (right), y = forward, z = up (gravity included)
+
+A sidecar is found automatically next to the video as ride.telemetry.csv or
+ride.csv (for ride.mp4).
+
+Time 0 of the video is the log's first timestamp plus `offset` seconds, so
+logs in epoch seconds work as long as logging started with the recording.
+
+Speed is expressed in the flow units the speed thresholds are tuned for;
+the other signals keep their own units and checks:
+    motion  = speed_kmh / kmh_per_motion_unit   (avg flow magnitude: >2 slow, >15 fast)
+    lateral = mean lateral acceleration (m/s^2)  (jerk only; it is not horizontal flow, so
+                                                  weaving, slalom and pinch entry skip log windows)
+    jolt    = peak |vertical accel - gravity| (m/s^2), checked against SPEED_BREAKER_JOLT
+"""
+import bisect
+import csv
+import math
+import os
+
+import numpy as np
+
+# Default km/h of ground speed per pixel of average flow between a window's
+# frames (full-resolution pixels, 0.5 s windows). It is a rough figure, not a
+# measured one: it puts 'slow' above ~4 km/h and 'fast' above ~30 km/h, where
+# the flow thresholds were tuned. The real ratio depends on the camera's field
+# of view, mounting and scene depth; calibrate_motion_unit() fits it for a
+# camera from a ride with both flow and a log (main.py --telemetry-calibrate).
+KMH_PER_MOTION_UNIT = 2.0
+MIN_CALIBRATION_KMH = 5.0     # windows slower than this (or with less flow) say little about the ratio
+MIN_CALIBRATION_MOTION = 0.5
+SPEED_BREAKER_JOLT = 4.0  # m/s^2 (~0.4 g) of vertical acceleration beyond gravity
+MAX_SAMPLE_GAP = 1.0      # seconds; a window with a longer gap in the log is not covered
+
+_TIME_COLUMNS = ("time", "t", "timestamp", "time_s", "seconds")
+_AXES = {
+    'lateral': ("accel_x", "ax"),
+    'forward': ("accel_y", "ay"),
+    'vertical': ("accel_z", "az"),
+}
+
+
+class WindowSignals:
+    """Ego-motion of one window from the log (see the module docstring for units)."""
+
+    def __init__(self, motion, lateral, jolt):
+        self.motion = motion
+        self.lateral = lateral
+        self.jolt = jolt
+
+
+def _column(header, names):
+    for name in names:
+        if name in header:
+            return header[name]
+    return None
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+
+
+class Telemetry:
+    """
+    A telemetry log indexed by time. Samples are sorted once; window queries
+    find their range with a binary search and interpolate the endpoints, so
+    each query costs O(log n + samples in the window).
+    """
+
+    def __init__(self, times, speed_kmh, lateral, vertical, offset=0.0, kmh_per_motion_unit=KMH_PER_MOTION_UNIT):
+        order = np.argsort(times, kind="stable")
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        self.speed_kmh = np.asarray(speed_kmh, dtype=np.float64)[order]
+        self.lateral = np.asarray(lateral, dtype=np.float64)[order]
+        self.vertical = np.asarray(vertical, dtype=np.float64)[order]
+        self.start = self.times[0] + offset if len(self.times) else 0.0
+        self.kmh_per_motion_unit = kmh_per_motion_unit
+        # Gravity plus mounting tilt: the typical vertical reading of this log
+        finite = self.vertical[np.isfinite(self.vertical)]
+        self.gravity = float(np.median(finite)) if len(finite) else 0.0
+        self._gaps = np.diff(self.times)
+        self._times_list = self.times.tolist()
+
+    @classmethod
+    def from_csv(cls, path, offset=0.0, kmh_per_motion_unit=KMH_PER_MOTION_UNIT):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = {name.strip().lower(): i for i, name in enumerate(next(reader, []))}
+            rows = [row for row in reader if row]
+
+        def number(row, index):
+            text = row[index].strip() if index < len(row) else ""
+            if not text:
+                return math.nan
+            try:
+                return float(text)
+            except ValueError:
+                raise ValueError(f"Telemetry file {path}: {text!r} in column {index + 1} is not a number") from None
+
+        def values(index):
+            return np.array([number(row, index) for row in rows], dtype=np.float64)
+
+        t_col = _column(header, _TIME_COLUMNS)
+        if t_col is None:
+            raise ValueError(f"Telemetry file {path} has no time column ({', '.join(_TIME_COLUMNS)})")
+        times = values(t_col)
+
+        if "speed_kmh" in header:
+            speed = values(header["speed_kmh"])
+        elif "speed_mps" in header or "speed" in header:
+            speed = values(_column(header, ("speed_mps", "speed"))) * 3.6
+        else:
+            lat, lon = _column(header, ("lat", "latitude")), _column(header, ("lon", "lng", "longitude"))
+            if lat is None or lon is None:
+                raise ValueError(f"Telemetry file {path} has neither a speed nor lat/lon columns")
+            lat, lon = values(lat), values(lon)
+            dist = _haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+            dt = np.diff(times)
+            step = np.divide(dist, dt, out=np.zeros_like(dist), where=dt > 0) * 3.6
+            speed = np.concatenate([step[:1], step]) if len(step) else np.zeros_like(times)
+
+        axes = {}
+        for axis, names in _AXES.items():
+            col = _column(header, names)
+            axes[axis] = values(col) if col is not None else np.full_like(times, math.nan)
+
+        keep = ~np.isnan(times) & ~np.isnan(speed)
+        return cls(times[keep], speed[keep], axes['lateral'][keep], axes['vertical'][keep], offset,
+                   kmh_per_motion_unit)
+
+    def _window(self, t0, t1):
+        """
+        (log time a, log time b, lo, hi) for video time [t0, t1], where
+        lo:hi are the samples strictly inside; None if the log does not cover it.
+        """
+        a, b = self.start + t0, self.start + t1
+        if len(self.times) < 2 or a < self.times[0] or b > self.times[-1]:
+            return None
+        lo = bisect.bisect_right(self._times_list, a)
+        hi = bisect.bisect_left(self._times_list, b)
+        # Samples around the window must be close enough to interpolate between
+        if self._gaps[max(lo - 1, 0):max(hi, lo)].max(initial=0.0) > MAX_SAMPLE_GAP:
+            return None
+        return a, b, lo, hi
+
+    def _series(self, values, a, b, lo, hi):
+        ends = np.interp([a, b], self.times, values)
+        return np.concatenate([ends[:1], values[lo:hi], ends[1:]])
+
+    def covers(self, t0, t1):
+        return self.window_signals(t0, t1) is not None
+
+    def window_signals(self, t0, t1):
+        """
+        WindowSignals for video time [t0, t1] (seconds), or None when the log
+        does not cover the window or lacks a speed, lateral or vertical value
+        there (the window then falls back to optical flow).
+        """
+        found = self._window(t0, t1)
+        if found is None:
+            return None
+        a, b, lo, hi = found
+        speed = self._series(self.speed_kmh, a, b, lo, hi)
+        lateral = self._series(self.lateral, a, b, lo, hi)
+        vertical = self._series(self.vertical, a, b, lo, hi)
+        if np.isnan(speed).any() or np.isnan(lateral).any() or np.isnan(vertical).any():
+            return None
+        return WindowSignals(
+            motion=float(np.mean(speed)) / self.kmh_per_motion_unit,
+            lateral=float(np.mean(lateral)),
+            jolt=float(np.max(np.abs(vertical - self.gravity))),
+        )
+
+
+def find_sidecar(video_path):
+    """
+    The telemetry CSV recorded next to a video (ride.csv or ride.telemetry.csv
+    for ride.mp4), or None. For a multi-clip ride, the log next to the first
+    clip covers the whole ride.
+    """
+    if not isinstance(video_path, (str, os.PathLike)):
+        video_path = next(iter(video_path), None)
+        if video_path is None:
+            return None
+    stem = os.path.splitext(video_path)[0]
+    for candidate in (stem + ".telemetry.csv", stem + ".csv"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def resolve_telemetry(video_path, telemetry="auto"):
+    """
+    CSV path to use: 'auto' looks for a sidecar, 'none' (or None) disables
+    telemetry. An auto-detected sidecar that does not parse as a telemetry log
+    (any ride.csv may sit next to the video) is skipped with a warning, and
+    the ride uses optical flow; an explicit path is returned as is, so its
+    errors surface when it is loaded.
+    """
+    if telemetry is None or str(telemetry).lower() == "none":
+        return None
+    if str(telemetry).lower() == "auto":
+        sidecar = find_sidecar(video_path)
+        if sidecar is None:
+            return None
+        try:
+            Telemetry.from_csv(sidecar)
+        except (OSError, ValueError) as e:  # UnicodeDecodeError is a ValueError
+            print(f"Warning: ignoring {sidecar} as telemetry ({e}); using optical flow")
+            return None
+        return sidecar
+    return telemetry
+
+
+def load_telemetry(telemetry, offset=0.0, kmh_per_motion_unit=KMH_PER_MOTION_UNIT):
+    """A Telemetry from a CSV path (or an existing Telemetry, returned as is); None passes through."""
+    if telemetry is None or isinstance(telemetry, Telemetry):
+        return telemetry
+    return Telemetry.from_csv(telemetry, offset, kmh_per_motion_unit)
+
+
+def calibrate_motion_unit(telemetry, windows):
+    """
+    km/h per unit of average flow for this camera: the median of log speed
+    over measured flow, for windows given as (t0, t1, avg_motion) in video
+    seconds that the log covers and where the ride was moving. None when no
+    window qualifies.
+    """
+    ratios = []
+    for t0, t1, avg_motion in windows:
+        signals = telemetry.window_signals(t0, t1)
+        if signals is None or avg_motion < MIN_CALIBRATION_MOTION:
+            continue
+        speed_kmh = signals.motion * telemetry.kmh_per_motion_unit
+        if speed_kmh >= MIN_CALIBRATION_KMH:
+            ratios.append(speed_kmh / avg_motion)
+    return float(np.median(ratios)) if ratios else None
+
+
+def format_report(report):
+    """One-line summary of VideoProcessor.telemetry_report."""
+    line = (f"Telemetry: {report['telemetry_windows']}/{report['windows']} windows from the log "
+            f"(optical flow skipped), {report['flow_windows']} from optical flow")
+    if report['pedestrian_flow_windows']:
+        line += f"; flow computed for pedestrians in {report['pedestrian_flow_windows']} log windows"
+    return line
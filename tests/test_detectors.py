@@ -0,0 +1,67 @@
+# tests/test_detectors.py
+"""
+Detector registry behaviour on hand-built windows: no video and no model.
+Each window goes through the enabled detectors the way process_video runs
+them.
+"""
+from sampling import DEFAULT_WINDOW_SECONDS, window_duration, window_interval
+from video_processor import DETECTORS, WEAVING_HISTORY_SECONDS, VideoProcessor, WindowInputs
+
+WIDTH = 1280
+TRAFFIC = ([[0, 300, 200, 500], [400, 300, 600, 500], [800, 300, 1000, 500]], ['car', 'bus', 'truck'])
+
+
+def run_windows(detectors, flow_xs, traffic=TRAFFIC, processor=None):
+    """frame_data-like entries for one window per flow_x value."""
+    processor = processor or VideoProcessor(None, detectors=detectors)
+    enabled = set(processor.detectors)
+    entries = []
+    for flow_x in flow_xs:
+        window = WindowInputs(processor, None, None, WIDTH, None)
+        window.flow_x = flow_x
+        window.boxes, window.labels = traffic
+        entries.append({name: detector.run(processor, window) if name in enabled else detector.default_value()
+                        for name, detector in DETECTORS.items()})
+    return entries
+
+
+def weaving_then_straight(weaving_windows, straight_windows):
+    return [5.0 if i % 2 else -5.0 for i in range(weaving_windows)] + [0.0] * straight_windows
+
+
+def test_slalom_does_not_depend_on_weaving_being_enabled():
+    flow_xs = weaving_then_straight(20, 30)
+    with_weaving = run_windows(['weaving', 'slalom_aggressive'], flow_xs)
+    without_weaving = run_windows(['slalom_aggressive'], flow_xs)
+    assert any(entry['slalom_aggressive'] for entry in with_weaving)
+    assert [e['slalom_aggressive'] for e in with_weaving] == [e['slalom_aggressive'] for e in without_weaving]
+
+
+def test_weaving_history_grows_once_per_window():
+    processor = VideoProcessor(None, detectors=['weaving', 'slalom_aggressive'])
+    window = WindowInputs(processor, None, None, WIDTH, None)
+    window.flow_x = 5.0
+    window.boxes, window.labels = TRAFFIC
+    for name in ('weaving', 'slalom_aggressive'):
+        DETECTORS[name].run(processor, window)
+    assert processor.flow_history == [1]
+
+
+def weaving_span_seconds(fps):
+    """Seconds of ride the weaving verdict outlasts the weaving, at `fps`."""
+    processor = VideoProcessor(None, detectors=['weaving'])
+    duration = window_duration(fps, window_interval(fps, DEFAULT_WINDOW_SECONDS))
+    processor.set_window_duration(duration)
+    flow_xs = weaving_then_straight(int(round(10.0 / duration)), int(round(20.0 / duration)))
+    weaving = [entry['weaving'] for entry in run_windows(None, flow_xs, processor=processor)]
+    last = max(i for i, value in enumerate(weaving) if value)
+    return (last + 1) * duration - 10.0
+
+
+def test_weaving_span_is_the_same_at_30_and_60_fps():
+    for fps in (30, 60):
+        processor = VideoProcessor(None)
+        processor.set_window_duration(window_duration(fps, window_interval(fps, DEFAULT_WINDOW_SECONDS)))
+        assert processor.weaving_history_windows * processor.window_duration == WEAVING_HISTORY_SECONDS
+    assert weaving_span_seconds(30) == weaving_span_seconds(60)
+    assert weaving_span_seconds(30) <= WEAVING_HISTORY_SECONDS
@@ -0,0 +1,56 @@
+# tests/test_telemetry.py
+"""
+A ride whose log covers only its first half: the log windows take speed and
+jerk from the log, and the lateral-flow detectors only evaluate flow windows.
+Runs a small generated video through process_video with flow-only detectors,
+so no model is loaded.
+"""
+import cv2
+import numpy as np
+
+from video_processor import VideoProcessor
+
+FPS = 30
+WINDOW_FRAMES = 15       # 0.5 s windows at 30 fps
+WINDOWS = 24
+LOG_WINDOWS = 12         # the log ends at 6 s
+SIZE = (320, 240)
+
+
+def write_weaving_video(path):
+    """Texture panning right in even windows and left in odd ones (~14 px of flow per window)."""
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur(rng.integers(0, 255, (SIZE[1], SIZE[0] + 64, 3), dtype=np.uint8), (5, 5), 0)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, SIZE)
+    x = 32
+    for frame in range(WINDOWS * WINDOW_FRAMES):
+        if frame % WINDOW_FRAMES:
+            x += 1 if (frame // WINDOW_FRAMES) % 2 == 0 else -1
+        writer.write(np.ascontiguousarray(texture[:, x:x + SIZE[0]]))
+    writer.release()
+
+
+def write_weaving_log(path):
+    """10 Hz log to 6 s whose lateral acceleration swings +-5 m/s^2 every half second."""
+    lines = ["time,speed_kmh,accel_x,accel_y,accel_z"]
+    for n in range(LOG_WINDOWS * 5 + 1):
+        t = n / 10
+        lines.append(f"{t:.1f},20.0,{5.0 if int(t * 2) % 2 == 0 else -5.0},0.0,9.8")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_lateral_flow_detectors_skip_log_windows(tmp_path):
+    video, log = tmp_path / "ride.avi", tmp_path / "ride.telemetry.csv"
+    write_weaving_video(video)
+    write_weaving_log(log)
+    processor = VideoProcessor(str(video), telemetry=str(log), detectors=['speed', 'jerk', 'weaving'])
+    frame_data = processor.process_video()
+
+    assert len(frame_data) == WINDOWS
+    assert processor.telemetry_report['telemetry_windows'] == LOG_WINDOWS
+    weaving = [entry['weaving'] for entry in frame_data]
+    # m/s^2 swings are not lateral flow: no weaving from the log
+    assert not any(weaving[:LOG_WINDOWS])
+    # The flow windows build their own history: more than 5 reversals take 7 windows
+    assert not any(weaving[LOG_WINDOWS:LOG_WINDOWS + 6])
+    assert all(weaving[LOG_WINDOWS + 6:])
@@ -0,0 +1,362 @@
+# threshold_sweep.py
+"""
+Threshold sweeps over cached per-window primitives.
+
+Re-tuning a threshold such as `proximity > 0.4` in TextGenerator or the
+5/15/25% verdict cut-offs used to mean re-running the whole pipeline per
+value. Instead, each ride is analysed once and its per-window primitives are
+cached (raw avg_motion, jerk and proximity, plus the detector flags). A grid
+of threshold configurations is then evaluated over all cached rides in one
+vectorized pass:
+
+    python threshold_sweep.py cache ride1.mp4 ride2.mp4 --out sweep_cache
+    python threshold_sweep.py sweep sweep_cache --proximity 0.3:0.5:0.05 --unsafe 20,25,30 --out sweep.csv
+
+Only three things in a window's description depend on the swept thresholds:
+the speed status (avg_motion vs speed_slow/speed_fast), the jerk state
+(jerk vs jerk_swerve/jerk_stable) and whether the nearest object is close
+(proximity). That gives 3 x 3 x 2 = 18 cases. For every distinct combination
+of detector flags, TextGenerator and RiskModel run once per case. The result
+is a table of risk level and stat counters per (flags, case). A configuration
+then costs a few comparisons per window, a table lookup, a per-ride sum and
+the verdict rules, all as array operations over configurations x windows.
+
+The stat counters and verdict rules mirror process_ride_video. Detector
+flags are taken as cached: detector-internal thresholds (e.g. the red-light
+check's use of the speed status) are not re-evaluated.
+"""
+import argparse
+import glob
+import itertools
+import os
+import time
+
+import numpy as np
+
+# Swept parameters: name -> (pipeline default, what it thresholds)
+PARAMETERS = {
+    'speed_slow': (2.0, "avg_motion above which speed is 'slow' (VideoProcessor.estimate_speed_proxy)"),
+    'speed_fast': (15.0, "avg_motion above which speed is 'fast'"),
+    'jerk_swerve': (1.0, "jerk above which a window is a reactive swerve (TextGenerator)"),
+    'jerk_stable': (0.5, "jerk below which a fast window is stable control"),
+    'proximity': (0.4, "proximity above which an object is very close (tailgating outside jams)"),
+    'caution': (5.0, "critical-window % above which the verdict is CAUTION"),
+    'moderate': (15.0, "critical-window % above which the verdict is MODERATE RISK"),
+    'unsafe': (25.0, "critical-window % above which the verdict is UNSAFE"),
+}
+PARAMETER_NAMES = tuple(PARAMETERS)
+VERDICTS = ("SAFE", "CAUTION", "MODERATE RISK", "UNSAFE")
+
+# Detector flags a window's description depends on besides the swept values
+FLAGS = ('pinch', 'intentional_pinch_entry', 'rickshaw', 'cng', 'heavy_vehicle', 'glare', 'leguna_brake',
+         'wrong_way', 'jaywalker', 'blind_spot_loitering', 'red_light_violation', 'gap_shooting',
+         'speed_breaker', 'bus_blockade', 'weaving', 'slalom_aggressive')
+
+# Per-ride counters, as process_ride_video counts them over critical windows
+# (plus safe windows): stat name -> token in the description
+STATS = {
+    'Reactive Swerves': "reactive_swerve",
+    'Pinch Points': "critical_pinch_point",
+    'Distracted Riding': "distracted_riding",
+    'Heavy Vehicle Conflicts': "heavy_vehicle_conflict",
+    'Tailgating': "tailgating_critical",
+    'Leguna Emergency Stops': "CRITICAL_LEGUNA_STOP",
+    'Wrong-Way Vehicles': "WRONG_WAY_HAZARD",
+    'Jaywalker Crossings': "ACTIVE_CROSSING_RISK",
+    'Blind Spot Loitering': "BLIND_SPOT_LOITERING",
+    'Red Light Violations': "RED_LIGHT_VIOLATION",
+    'Gap Shooting': "AGGRESSIVE_GAP_SHOOTING",
+    'Speed Breaker Hits': "SPEED_BREAKER_IMPACT",
+    'Bus Blockades': "BUS_BLOCKING_LANE",
+    'Weaving Events': "AGGRESSIVE_WEAVING",
+    'Slalom Maneuvers': "SLALOM_AGGRESSIVE",
+    'Aggressive Pinch Entries': "AGGRESSIVE_PINCH_ENTRY",
+}
+_COUNTERS = ('critical', 'safe') + tuple(STATS)
+
+# The 18 threshold cases: (speed status, jerk state, close)
+_SPEEDS = ('stationary', 'slow', 'fast')
+_JERKS = (2.0, 0.0, 0.75)  # jerk values giving swerve / low / neither at the default thresholds
+_CASES = list(itertools.product(range(3), range(3), (False, True)))
+
+
+def ride_primitives(frame_data):
+    """
+    Per-window arrays of one ride's frame_data: the raw values the swept
+    thresholds apply to and the detector flags (as int8 codes).
+    """
+    if frame_data and 'avg_motion' not in frame_data[0]:
+        raise ValueError("frame_data has no 'avg_motion'; re-run the video with the current pipeline")
+    objects = [f.get('objects', []) if isinstance(f.get('objects', []), list) else [] for f in frame_data]
+    weaving = [f.get('weaving') for f in frame_data]
+    flags = {
+        'pinch': [bool(f.get('pinch', False)) for f in frame_data],
+        'intentional_pinch_entry': [bool(f.get('intentional_pinch_entry', False)) for f in frame_data],
+        'rickshaw': ['rickshaw' in o for o in objects],
+        'cng': ['cng' in o for o in objects],
+        'heavy_vehicle': ['bus' in o or 'truck' in o for o in objects],
+        'jaywalker': [f.get('jaywalker') == "ACTIVE_CROSSING_RISK" for f in frame_data],
+        # 1 aggressive, 0 stable lane, -1 no weaving token
+        'weaving': [1 if w is True or w == "AGGRESSIVE_WEAVING" else (0 if w is False or w == "STABLE_LANE" else -1)
+                    for w in weaving],
+    }
+    for name in FLAGS:
+        if name not in flags:
+            flags[name] = [bool(f.get(name)) for f in frame_data]
+    return {
+        'avg_motion': np.array([f.get('avg_motion', 0.0) for f in frame_data], dtype=np.float64),
+        'jerk': np.array([f.get('jerk', 0) for f in frame_data], dtype=np.float64),
+        'proximity': np.array([f.get('proximity', 0) for f in frame_data], dtype=np.float64),
+        'flags': np.array([flags[name] for name in FLAGS], dtype=np.int8).T.reshape(len(frame_data), len(FLAGS)),
+    }
+
+
+def save_primitives(path, primitives):
+    np.savez_compressed(path, **primitives)
+
+
+def load_primitives(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _representative_frame(flags, speed, jerk_state, close):
+    """A frame_data dict that TextGenerator turns into the description of one (flags, case)."""
+    f = dict(zip(FLAGS, (int(v) for v in flags)))
+    objects = [name for name, key in (('rickshaw', 'rickshaw'), ('cng', 'cng'), ('bus', 'heavy_vehicle')) if f[key]]
+    return {
+        'speed': _SPEEDS[speed],
+        'jerk': _JERKS[jerk_state],
+        'proximity': 1.0 if close else 0.0,
+        'objects': objects,
+        'pinch': bool(f['pinch']),
+        'intentional_pinch_entry': bool(f['intentional_pinch_entry']),
+        'glare': bool(f['glare']),
+        'leguna_brake': bool(f['leguna_brake']),
+        'wrong_way': bool(f['wrong_way']),
+        'jaywalker': "ACTIVE_CROSSING_RISK" if f['jaywalker'] else "STATIONARY_PEDESTRIAN",
+        'blind_spot_loitering': bool(f['blind_spot_loitering']),
+        'red_light_violation': bool(f['red_light_violation']),
+        'gap_shooting': bool(f['gap_shooting']),
+        'speed_breaker': bool(f['speed_breaker']),
+        'bus_blockade': bool(f['bus_blockade']),
+        'weaving': {1: True, 0: False}.get(f['weaving']),
+        'slalom_aggressive': bool(f['slalom_aggressive']),
+    }
+
+
+def outcome_table(unique_flags, text_generator, risk_model):
+    """
+    (U, 18, counters) int16: for each distinct flag combination and threshold
+    case, whether the window is critical or safe and which stats it adds to.
+    """
+    frames = [_representative_frame(flags, *case) for flags in unique_flags for case in _CASES]
+    descriptions = [text_generator.generate_description(f) for f in frames]
+    levels = risk_model.predict_risk(descriptions) if descriptions else []
+    table = np.zeros((len(frames), len(_COUNTERS)), dtype=np.int16)
+    for row, (desc, level) in enumerate(zip(descriptions, levels)):
+        if level == 2:
+            table[row, 0] = 1
+            tokens = desc.split()
+            for col, token in enumerate(STATS.values(), start=2):
+                table[row, col] = token in tokens
+        elif level == 0:
+            table[row, 1] = 1
+    return table.reshape(len(unique_flags), len(_CASES), len(_COUNTERS))
+
+
+class SweepData:
+    """Cached primitives of several rides, concatenated window-wise, with the outcome table built."""
+
+    def __init__(self, rides, text_generator=None, risk_model=None):
+        if text_generator is None:
+            from text_generator import TextGenerator
+            text_generator = TextGenerator()
+        if risk_model is None:
+            from risk_model import RiskModel
+            risk_model = RiskModel()
+            risk_model.train_mock_model()
+        self.names = list(rides)
+        primitives = [rides[name] for name in self.names]
+        self.lengths = np.array([len(p['avg_motion']) for p in primitives])
+        if not len(self.lengths) or (self.lengths == 0).any():
+            raise ValueError("Every ride needs at least one window")
+        self.starts = np.concatenate([[0], np.cumsum(self.lengths)[:-1]])
+        self.avg_motion = np.concatenate([p['avg_motion'] for p in primitives])
+        self.jerk = np.concatenate([p['jerk'] for p in primitives])
+        self.proximity = np.concatenate([p['proximity'] for p in primitives])
+        unique_flags, self.flag_index = np.unique(np.concatenate([p['flags'] for p in primitives]),
+                                                  axis=0, return_inverse=True)
+        self.flag_index = self.flag_index.reshape(-1)
+        self.table = outcome_table(unique_flags, text_generator, risk_model)
+
+    @property
+    def windows(self):
+        return len(self.avg_motion)
+
+
+def parameter_grid(**values):
+    """(C, len(PARAMETER_NAMES)) array of every combination; unspecified parameters keep their defaults."""
+    axes = [np.atleast_1d(np.asarray(values.get(name, PARAMETERS[name][0]), dtype=np.float64))
+            for name in PARAMETER_NAMES]
+    unknown = set(values) - set(PARAMETER_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}. Choose from: {', '.join(PARAMETER_NAMES)}")
+    return np.stack([a.reshape(-1) for a in np.meshgrid(*axes, indexing='ij')], axis=1)
+
+
+def _verdicts(counts, total, caution, moderate, unsafe):
+    """Verdict codes (index into VERDICTS) from per-ride counters, as in process_ride_video."""
+    stat = {name: counts[..., col] for col, name in enumerate(_COUNTERS)}
+    critical = stat['critical']
+    risk_pct = critical * 100.0 / total
+    swerve_ratio = stat['Reactive Swerves'] / np.maximum(critical, 1)
+    aggressive = stat['Aggressive Pinch Entries']
+    conditions = [
+        stat['Distracted Riding'] > 0,
+        aggressive > 2,
+        (stat['Wrong-Way Vehicles'] > 5) | (stat['Bus Blockades'] > 10),
+        (stat['Reactive Swerves'] > 20) & (swerve_ratio > 0.5),
+        (aggressive > 0) & (risk_pct > 10),
+        risk_pct > unsafe,
+        risk_pct > moderate,
+        risk_pct > caution,
+    ]
+    choices = [3, 2, 3, 3, 2, 3, 2, 1]
+    return np.select(conditions, choices, default=0), risk_pct
+
+
+def evaluate(data, grid, chunk_cells=4_000_000):
+    """
+    Evaluates every configuration (row of `grid`) over every ride.
+    Returns {'verdicts': (C, R) codes, 'risk_pct': (C, R), 'counts': (C, R, counters)}.
+    """
+    grid = np.atleast_2d(np.asarray(grid, dtype=np.float64))
+    p = {name: grid[:, i][:, None] for i, name in enumerate(PARAMETER_NAMES)}
+    n_configs = len(grid)
+    counts = np.empty((n_configs, len(data.names), len(_COUNTERS)), dtype=np.int32)
+    step = max(1, chunk_cells // max(data.windows, 1))
+    for lo in range(0, n_configs, step):
+        hi = min(lo + step, n_configs)
+        c = slice(lo, hi)
+        # Threshold case per (configuration, window), in _CASES order
+        speed = np.where(data.avg_motion > p['speed_fast'][c], 2, np.where(data.avg_motion > p['speed_slow'][c], 1, 0))
+        jerk = np.where(data.jerk > p['jerk_swerve'][c], 0, np.where(data.jerk < p['jerk_stable'][c], 1, 2))
+        close = data.proximity > p['proximity'][c]
+        case = (speed * 3 + jerk) * 2 + close
+        outcomes = data.table[data.flag_index, case]  # (configs, windows, counters)
+        counts[c] = np.add.reduceat(outcomes, data.starts, axis=1, dtype=np.int32)
+    verdicts, risk_pct = _verdicts(counts, data.lengths, p['caution'], p['moderate'], p['unsafe'])
+    return {'verdicts': verdicts, 'risk_pct': risk_pct, 'counts': counts}
+
+
+def summarize(grid, result):
+    """One row per configuration: parameters, verdict counts over the rides and mean stats per ride."""
+    rows = []
+    verdicts, risk_pct, counts = result['verdicts'], result['risk_pct'], result['counts']
+    for i, params in enumerate(grid):
+        row = dict(zip(PARAMETER_NAMES, params.tolist()))
+        for code, name in enumerate(VERDICTS):
+            row[name] = int((verdicts[i] == code).sum())
+        row['mean_risk_pct'] = float(risk_pct[i].mean())
+        for col, name in enumerate(_COUNTERS):
+            row[f"mean {name}"] = float(counts[i, :, col].mean())
+        rows.append(row)
+    return rows
+
+
+def write_csv(path, rows):
+    import csv
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_values(spec):
+    """'a:b:step' (inclusive range), 'v1,v2,...' or a single value -> array."""
+    if ":" in spec:
+        start, stop, step = (float(v) for v in spec.split(":"))
+        return np.round(np.arange(start, stop + step / 2, step), 10)
+    return np.array([float(v) for v in spec.split(",")])
+
+
+def cache_rides(videos, out_dir, **processor_options):
+    """Runs the detector pipeline once per video and saves its primitives as <out_dir>/<name>.npz."""
+    from video_processor import VideoProcessor
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for video in videos:
+        processor = VideoProcessor(video, window_size=10, **processor_options)
+        frame_data = processor.process_video()
+        path = os.path.join(out_dir, os.path.splitext(os.path.basename(video))[0] + ".npz")
+        save_primitives(path, ride_primitives(frame_data))
+        print(f"{video}: {len(frame_data)} windows -> {path}")
+        paths.append(path)
+    return paths
+
+
+def load_rides(sources):
+    """{ride name: primitives} from .npz files and directories of them."""
+    rides = {}
+    for source in sources:
+        files = sorted(glob.glob(os.path.join(source, "*.npz"))) if os.path.isdir(source) else [source]
+        for path in files:
+            rides[os.path.splitext(os.path.basename(path))[0]] = load_primitives(path)
+    if not rides:
+        raise ValueError(f"No cached rides (.npz) found in {', '.join(sources)}")
+    return rides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep detector and verdict thresholds over cached ride primitives.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cache = sub.add_parser("cache", help="Analyse rides once and cache their per-window primitives")
+    cache.add_argument("videos", nargs="+")
+    cache.add_argument("--out", default="sweep_cache", help="Directory for the .npz files")
+    cache.add_argument("--backend", default="ultralytics")
+    cache.add_argument("--imgsz", type=int, default=640)
+    cache.add_argument("--reader", default="auto")
+
+    sweep = sub.add_parser("sweep", help="Evaluate a grid of thresholds over cached rides")
+    sweep.add_argument("rides", nargs="+", help=".npz files or directories written by 'cache'")
+    for name, (default, text) in PARAMETERS.items():
+        sweep.add_argument("--" + name.replace("_", "-"), default=None,
+                           help=f"{text}; 'a:b:step' or 'v1,v2,...' (default {default:g})")
+    sweep.add_argument("--out", help="Write one CSV row per configuration")
+    args = parser.parse_args(argv)
+
+    if args.command == "cache":
+        cache_rides(args.videos, args.out, backend=args.backend, imgsz=args.imgsz, reader=args.reader)
+        return
+
+    values = {name: parse_values(getattr(args, name)) for name in PARAMETER_NAMES
+              if getattr(args, name) is not None}
+    started = time.perf_counter()
+    data = SweepData(load_rides(args.rides))
+    prepared = time.perf_counter() - started
+    grid = parameter_grid(**values)
+    started = time.perf_counter()
+    result = evaluate(data, grid)
+    elapsed = time.perf_counter() - started
+    print(f"{len(grid)} configurations x {len(data.names)} rides ({data.windows} windows): "
+          f"{elapsed:.2f}s ({len(grid) / max(elapsed, 1e-9):,.0f} configurations/s), "
+          f"table of {data.table.shape[0]} flag combinations built in {prepared:.2f}s")
+
+    rows = summarize(grid, result)
+    baseline = summarize(parameter_grid(), evaluate(data, parameter_grid()))[0]
+    changed = [r for r in rows if any(r[v] != baseline[v] for v in VERDICTS)]
+    print("Defaults: " + ", ".join(f"{v} {baseline[v]}" for v in VERDICTS)
+          + f", mean critical {baseline['mean_risk_pct']:.1f}%")
+    print(f"{len(changed)}/{len(rows)} configurations change the verdict distribution")
+    for row in changed[:10]:
+        params = ", ".join(f"{n}={row[n]:g}" for n in PARAMETER_NAMES if row[n] != PARAMETERS[n][0])
+        print(f"  {params}: " + ", ".join(f"{v} {row[v]}" for v in VERDICTS)
+              + f", mean critical {row['mean_risk_pct']:.1f}%")
+    if args.out:
+        write_csv(args.out, rows)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
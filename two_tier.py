@@ -0,0 +1,200 @@
+# two_tier.py
+"""
+Two-tier analysis: a cheap proxy pass over the whole ride, then full
+resolution only where it matters.
+
+1. Proxy pass: every `proxy_stride`-th window, decoded at `proxy_scale` and
+   detected at `proxy_imgsz`. Its flow is converted back to full-resolution
+   pixels (VideoProcessor.pixel_scale), so the pixel thresholds flag the same
+   motion as at full resolution. Each proxy window is described and scored
+   with RiskModel; risk level >= 1 marks it as a candidate.
+2. Full pass: candidates, widened by `margin` windows on each side (this also
+   covers the windows the proxy stride skipped), are re-analysed with the
+   normal processor (full resolution, full detector set). Each run of
+   consecutive candidates starts from reset state and is preceded by
+   `warmup` warm-up windows (default VideoProcessor.warmup_windows(), the
+   longest temporal history). Runs whose warm-ups touch are analysed as one.
+   With the default warm-up the re-analysed entries match an all-full run;
+   a shorter one trades that for speed, and the loitering, weaving and
+   slalom detectors may then miss behaviour that started before the run.
+
+The merged frame_data has one entry per window, like an all-full run: the
+full-resolution entry where a window was re-analysed, the proxy entry
+elsewhere, and, for a window the stride skipped, a copy of the proxy entry
+of its stride block ("analysis_pass" is "full", "proxy" or "filled"). Rates
+computed from entry counts (risk percentage, verdict) then weight each proxy
+window by the windows it stands for.
+"""
+import time
+
+from frame_readers import probe_video
+from sampling import plan_windows, window_duration, window_interval
+
+DEFAULT_PROXY_SCALE = 0.5
+DEFAULT_PROXY_STRIDE = 2
+DEFAULT_PROXY_IMGSZ = 320
+RISK_THRESHOLD = 1  # RiskModel level that sends a window to the full pass
+
+
+def make_proxy_processor(processor, scale=DEFAULT_PROXY_SCALE, imgsz=DEFAULT_PROXY_IMGSZ):
+    """
+    A VideoProcessor with the same settings, decoding smaller and detecting at
+    `imgsz` with `processor`'s loaded detector (loaded here if it is not yet),
+    so the proxy pass loads no second model.
+    """
+    from video_processor import VideoProcessor
+    model = processor.model.with_imgsz(imgsz) if 'boxes' in processor.detector_inputs() else None
+    return VideoProcessor(
+        processor.video_path, processor.window_size, weights=processor.weights, backend=processor.backend,
+        backend_options=processor.backend_options, conf=processor.conf, iou=processor.iou,
+        max_det=processor.max_det, imgsz=imgsz, reader=processor.reader,
+        decode_scale=scale * (processor.decode_scale or 1), decode_threads=processor.decode_threads,
+        telemetry=processor.telemetry, telemetry_offset=processor.telemetry_offset,
+        telemetry_kmh_per_unit=processor.telemetry_kmh_per_unit, detectors=processor.detectors,
+        window_seconds=processor.window_seconds, model=model, pipeline=processor.pipeline,
+        pipeline_slots=processor.pipeline_slots)
+
+
+def _pass_progress(progress_callback, offset, total):
+    """Window events of one pass, renumbered as part of the whole two-tier run."""
+    if progress_callback is None:
+        return None
+
+    def forward(event):
+        if event.stage == 'window':
+            event.windows_done += offset
+            event.windows_total = max(total, event.windows_done)
+        progress_callback(event)
+    return forward
+
+
+def candidate_runs(flagged, num_windows, margin):
+    """Window indices within `margin` of a flagged one, grouped into consecutive runs."""
+    wanted = sorted({j for i in flagged for j in range(max(i - margin, 0), min(i + margin + 1, num_windows))})
+    runs = []
+    for i in wanted:
+        if runs and i == runs[-1][-1] + 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+    return runs
+
+
+def full_pass_segments(runs, warmup):
+    """[start, end] window ranges covering each run and the `warmup` windows before it, merged where they touch."""
+    segments = []
+    for run in runs:
+        start = max(run[0] - warmup, 0)
+        if segments and start <= segments[-1][1] + 1:
+            segments[-1][1] = run[-1]
+        else:
+            segments.append([start, run[-1]])
+    return segments
+
+
+def process_video_two_tier(processor, risk_model, text_generator, proxy_scale=DEFAULT_PROXY_SCALE,
+                           proxy_stride=DEFAULT_PROXY_STRIDE, proxy_imgsz=DEFAULT_PROXY_IMGSZ,
+                           margin=None, warmup=None, progress_callback=None):
+    """
+    Runs the proxy pass and the full-resolution pass over `processor`'s video.
+    risk_model must be trained. Returns (frame_data, report); the report
+    counts windows per pass and estimates the compute saved against running
+    every window at full resolution.
+    """
+    margin = proxy_stride if margin is None else margin
+    proxy_stride = max(proxy_stride, 1)
+    total_frames, _, _, fps = probe_video(processor.video_path)
+    if total_frames <= 0:
+        raise ValueError("Video file appears to be empty or invalid")
+    interval = window_interval(fps, processor.window_seconds)
+    windows, _, processor.sampling_report = plan_windows(processor.video_path, total_frames, fps, processor.sampling,
+                                                         interval, processor.keyframe_tolerance)
+    processor.set_window_duration(window_duration(fps, interval))
+    warmup = processor.warmup_windows() if warmup is None else warmup
+    proxy_indices = list(range(0, len(windows), proxy_stride))
+
+    # 1. Proxy pass
+    print(f"Proxy pass: {len(proxy_indices)}/{len(windows)} windows at {proxy_scale:g}x decode, "
+          f"imgsz {proxy_imgsz}...")
+    # Model set-up is part of the proxy's cost (it loads the shared detector
+    # if the caller has not)
+    started = time.perf_counter()
+    proxy = make_proxy_processor(processor, proxy_scale, proxy_imgsz)
+    proxy_model_init_seconds = time.perf_counter() - started
+    proxy_data = proxy.process_video(_pass_progress(progress_callback, 0, len(windows)),
+                                     windows=[windows[i] for i in proxy_indices])
+    proxy_seconds = time.perf_counter() - started
+    window_of = {first: i for i, (first, _) in enumerate(windows)}
+    flagged = []
+    if proxy_data:
+        levels = risk_model.predict_risk([text_generator.generate_description(f) for f in proxy_data])
+        flagged = [window_of[f['frame_id']] for f, level in zip(proxy_data, levels) if level >= RISK_THRESHOLD]
+
+    # 2. Full-resolution pass over the candidate runs, each after its warm-up
+    runs = candidate_runs(flagged, len(windows), margin)
+    segments = full_pass_segments(runs, warmup)
+    print(f"Full pass: {sum(len(r) for r in runs)} candidate windows in {len(runs)} runs "
+          f"({len(flagged)} flagged by the proxy), {warmup} warm-up windows per run")
+    candidate_frames = {windows[i][0] for run in runs for i in run}
+    full_data = {}
+    full_windows = 0
+    total = len(proxy_indices) + sum(end - start + 1 for start, end in segments)
+    started = time.perf_counter()
+    for start, end in segments:
+        processor.reset_state()
+        progress = _pass_progress(progress_callback, len(proxy_indices) + full_windows, total)
+        data = processor.process_video(progress, windows=windows[start:end + 1])
+        full_windows += end - start + 1
+        full_data.update((f['frame_id'], f) for f in data if f['frame_id'] in candidate_frames)
+    full_seconds = time.perf_counter() - started
+
+    # One entry per window, as an all-full run has: a window the stride
+    # skipped stands in with its stride block's proxy entry
+    proxy_entries = {window_of[f['frame_id']]: f for f in proxy_data}
+    frame_data = []
+    filled = 0
+    for i, (first, last) in enumerate(windows):
+        if first in full_data:
+            frame_data.append(dict(full_data[first], analysis_pass="full"))
+        elif i in proxy_entries:
+            frame_data.append(dict(proxy_entries[i], analysis_pass="proxy"))
+        elif last > first and i - i % proxy_stride in proxy_entries:
+            frame_data.append(dict(proxy_entries[i - i % proxy_stride], frame_id=first, analysis_pass="filled"))
+            filled += 1
+
+    # Compute saved, against every window at full resolution
+    full_per_window = full_seconds / full_windows if full_windows else None
+    estimated_full = full_per_window * len(windows) if full_per_window else None
+    spent = proxy_seconds + full_seconds
+    report = {
+        'windows': len(windows),
+        'proxy_windows': len(proxy_indices),
+        'proxy_scale': proxy_scale,
+        'proxy_imgsz': proxy_imgsz,
+        'proxy_stride': proxy_stride,
+        'flagged': len(flagged),
+        'full_windows': len(full_data),
+        'warmup_windows': full_windows - len(full_data),
+        'warmup': warmup,
+        'filled_windows': filled,
+        'proxy_seconds': proxy_seconds,  # including proxy_model_init_seconds
+        'proxy_model_init_seconds': proxy_model_init_seconds,
+        'full_seconds': full_seconds,
+        'full_windows_avoided_pct': 100.0 * (1 - full_windows / len(windows)) if windows else 0.0,
+        'estimated_all_full_seconds': estimated_full,
+        'compute_saved_pct': 100.0 * (1 - spent / estimated_full) if estimated_full else None,
+    }
+    return frame_data, report
+
+
+def format_report(report):
+    """One-line summary of a process_video_two_tier() report."""
+    line = (f"Two-tier: proxy {report['proxy_windows']}/{report['windows']} windows "
+            f"({report['proxy_seconds']:.1f}s), {report['flagged']} flagged, "
+            f"{report['full_windows']} re-analysed at full resolution after {report['warmup_windows']} warm-up "
+            f"windows ({report['full_seconds']:.1f}s), {report['filled_windows']} filled from the proxy; "
+            f"{report['full_windows_avoided_pct']:.0f}% of full-resolution windows avoided")
+    if report['compute_saved_pct'] is not None:
+        line += (f", ~{report['compute_saved_pct']:.0f}% compute saved "
+                 f"(all-full estimate {report['estimated_all_full_seconds']:.1f}s)")
+    return line
@@ -0,0 +1,47 @@
+# upload_store.py
+import hashlib
+import os
+import tempfile
+
+# Size of each read/write when copying an upload to disk. Peak memory for the
+# copy is one chunk, no matter how long the ride video is.
+UPLOAD_CHUNK_BYTES = int(os.environ.get("RIDE_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+ALLOWED_SUFFIXES = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def upload_suffix(filename, default='.mp4'):
+    """Keep the container extension of the upload so the decoder sees MKV/MOV as such."""
+    suffix = os.path.splitext(filename or '')[1].lower()
+    return suffix if suffix in ALLOWED_SUFFIXES else default
+
+
+def save_upload_to_disk(source, suffix='.mp4', chunk_size=None, directory=None):
+    """
+    Streams a file-like upload to a temporary file in fixed-size chunks,
+    hashing the content while copying.
+    Returns: (path, sha256 hex digest, size in bytes)
+    """
+    chunk_size = chunk_size or UPLOAD_CHUNK_BYTES
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory) as tmp_file:
+        try:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp_file.write(chunk)
+                size += len(chunk)
+        except Exception:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+        path = tmp_file.name
+
+    return path, digest.hexdigest(), size
+
@@ -8,18 +8,328 @@ except ImportError as e:
         "pip install opencv-python-headless"
     ) from e
 
+from functools import cached_property
+
 import numpy as np
-from ultralytics import YOLO
-import os
+
+from detector_backends import create_backend, DEFAULT_CONF, DEFAULT_IOU, DEFAULT_IMGSZ, DEFAULT_MAX_DET
+from checkpoint import (DEFAULT_CHECKPOINT_EVERY, load_checkpoint, remove_checkpoint, run_fingerprint,
+                        save_checkpoint)
+from flow_stats import FlowIntegral
+from frame_readers import MultiClipReader, open_reader
+from frame_transport import DEFAULT_SLOTS, WindowPipeline, stages_supported
+from telemetry import KMH_PER_MOTION_UNIT, SPEED_BREAKER_JOLT, load_telemetry, format_report as format_telemetry
+from sampling import (DEFAULT_KEYFRAME_TOLERANCE, DEFAULT_WINDOW_SECONDS, plan_windows, window_duration,
+                      window_interval, format_report)
+from instrumentation import PipelineEvent, StageTimer
+
+# Temporal detector limits, in seconds of ride. Each video converts them to a
+# number of windows from its window length (see set_window_duration); with
+# 0.5 s windows they are the original 30-window loitering and 3-window slalom
+# limits, and 15 windows of weaving history (the original 30 entries filled
+# two per window, since weaving and slalom both appended to it).
+BLIND_SPOT_LOITER_SECONDS = 15.0  # bus/truck held at a side edge this long is loitering
+WEAVING_HISTORY_SECONDS = 7.5     # lateral-direction history detect_weaving counts reversals in
+SLALOM_SUSTAIN_SECONDS = 1.5      # weaving in dense traffic this long is slalom
+
+class FrameBuffers:
+    """
+    Per-video pool of the arrays every window needs: the two sampled frames,
+    their grayscale versions, the flow field, its split planes and the
+    magnitude/angle arrays. They are filled in place through the OpenCV
+    dst=/flow=/magnitude= output arguments, so a window allocates no
+    frame-sized memory. On 4K footage that is ~150 MB per window that is no
+    longer allocated and freed.
+    """
+
+    def __init__(self, height, width):
+        self.shape = (height, width)
+        self.frame1 = np.empty((height, width, 3), dtype=np.uint8)
+        self.frame2 = np.empty((height, width, 3), dtype=np.uint8)
+        self.prev_gray = np.empty((height, width), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.flow = np.empty((height, width, 2), dtype=np.float32)
+        self.flow_planes = [np.empty((height, width), dtype=np.float32) for _ in range(2)]
+        self.magnitude = np.empty((height, width), dtype=np.float32)
+        self.angle = np.empty((height, width), dtype=np.float32)
+        # Summed-area table of the window's flow, allocated on first box query
+        self.flow_integral = FlowIntegral()
+
+    def fits(self, frame):
+        return frame.shape[:2] == self.shape
+
+    @property
+    def nbytes(self):
+        arrays = [self.frame1, self.frame2, self.prev_gray, self.gray, self.flow,
+                  self.magnitude, self.angle] + self.flow_planes
+        if self.flow_integral.sums is not None:
+            arrays.append(self.flow_integral.sums)
+        return sum(a.nbytes for a in arrays)
+
+
+# Detector registry: each detector fills one frame_data field and declares
+# the per-window inputs it reads. process_video only computes the inputs
+# some enabled detector declares:
+#   'frame'   the window's last frame (pixels: glare, traffic-light colour)
+#   'flow'    ego-motion of the window (speed, jerk, lateral/vertical flow):
+#             optical flow, or telemetry where a log covers the window.
+#             Without it the window's first frame is not decoded at all
+#   'boxes'   YOLO detections on the last frame, with Dhaka labels
+#   'tracks'  the previous window's boxes (implies 'boxes')
+DETECTOR_INPUTS = ('frame', 'flow', 'boxes', 'tracks')
+
+
+class Detector:
+    """A registered detector: run(processor, window) -> field value."""
+
+    def __init__(self, name, inputs, default, run):
+        self.name = name
+        self.inputs = frozenset(inputs)
+        self.default = default
+        self.run = run
+
+    def default_value(self):
+        """Field value while the detector is disabled (a fresh copy of mutable defaults)."""
+        return list(self.default) if isinstance(self.default, list) else self.default
+
+
+DETECTORS = {}  # field name -> Detector, in frame_data field order
+
+
+def register_detector(name, inputs, default=False):
+    """Decorator adding a detector for frame_data field `name` to the registry."""
+    unknown = set(inputs) - set(DETECTOR_INPUTS)
+    if unknown:
+        raise ValueError(f"Unknown detector inputs {sorted(unknown)}. Choose from: {', '.join(DETECTOR_INPUTS)}")
+
+    def add(run):
+        DETECTORS[name] = Detector(name, inputs, default, run)
+        return run
+    return add
+
+
+def resolve_detectors(detectors=None):
+    """
+    Enabled detector names in registry order. detectors is None or 'all'
+    (every registered detector), or names as a list or a comma-separated
+    string.
+    """
+    if detectors is None or detectors == "all":
+        return list(DETECTORS)
+    if isinstance(detectors, str):
+        detectors = [name.strip() for name in detectors.split(",") if name.strip()]
+    unknown = [name for name in detectors if name not in DETECTORS]
+    if unknown:
+        raise ValueError(f"Unknown detectors {unknown}. Choose from: {', '.join(DETECTORS)}")
+    return [name for name in DETECTORS if name in set(detectors)]
+
+
+def detector_inputs(detectors):
+    """Inputs the given detectors read, with 'tracks' implying 'boxes'."""
+    needs = set()
+    for name in detectors:
+        needs |= DETECTORS[name].inputs
+    if 'tracks' in needs:
+        needs.add('boxes')
+    return needs
+
+
+def format_detector_plan(detectors):
+    """One-line summary of the enabled detectors and the stages they let the pipeline skip."""
+    needs = detector_inputs(detectors)
+    skipped = []
+    if 'flow' not in needs:
+        skipped.append("optical flow and first-frame decode")
+    if 'boxes' not in needs:
+        skipped.append("YOLO inference")
+    line = f"Detectors: {len(detectors)}/{len(DETECTORS)} enabled ({', '.join(detectors) or 'none'})"
+    return line + (f"; skipping {', '.join(skipped)}" if skipped else "")
+
+
+class WindowInputs:
+    """
+    One window as the detectors see it. process_video fills the inputs the
+    enabled detectors declared; the others keep neutral values. Values
+    derived from the inputs are computed on first use, so one no enabled
+    detector reads is never computed.
+    """
+
+    def __init__(self, processor, frame1, frame2, width, timer, prev_boxes=()):
+        self.processor = processor
+        self.frame1 = frame1
+        self.frame2 = frame2
+        self.width = width
+        self.timer = timer
+        # 'flow'
+        self.flow = None
+        self.speed_status = 'stationary'
+        self.jerk_score = 0
+        self.avg_motion = 0
+        self.flow_x = 0  # mean horizontal flow (px); None in a telemetry window
+        self.vertical_jolt = None
+        self.from_telemetry = False
+        self.pedestrian_flow = False  # flow computed only for pedestrian boxes
+        self.flow_gray = None  # grayscale last frame a flow process produced (pipeline="processes")
+        self._flow_integral = None
+        # 'boxes'
+        self.det_boxes = np.empty((0, 4), dtype=np.float32)
+        self.boxes = []
+        self.class_ids = []
+        self.labels = []
+        # 'tracks'
+        self.prev_boxes = prev_boxes
+
+    @property
+    def flow_integral(self):
+        """
+        Per-box flow means (table built on first query). Telemetry has no
+        box-local motion, so a telemetry window computes flow here, only
+        when a detector asks for it.
+        """
+        if self._flow_integral is None:
+            processor = self.processor
+            if self.flow is None and self.from_telemetry:
+                self.timer.lap('detectors')
+                self.flow = processor.window_flow(self.frame1, self.frame2)
+                self.pedestrian_flow = True
+                self.timer.lap('flow')
+            buffers = processor.buffers
+            self._flow_integral = buffers.flow_integral if buffers is not None else FlowIntegral()
+            self._flow_integral.set_flow(self.flow)
+        return self._flow_integral
+
+    @cached_property
+    def gray(self):
+        # The flow stage already converted the last frame to grayscale into the
+        # buffer pool (or into the ring slot, when flow ran in another process)
+        if self.flow_gray is not None:
+            return self.flow_gray
+        buffers = self.processor.buffers
+        if self.flow is not None and buffers is not None and buffers.fits(self.frame2):
+            return buffers.gray
+        return cv2.cvtColor(self.frame2, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def max_proximity(self):
+        # Proximity Score (Width of object relative to frame)
+        box_sizes = [coords[2] - coords[0] for coords in self.boxes]
+        max_proximity = max(box_sizes) / self.width if box_sizes and self.width > 0 else 0
+        return max(max_proximity, 0)
+
+    @cached_property
+    def ttc_status(self):
+        # TTC heuristic (very rough): if an object occupies >60% width ratio -> critical
+        return "critical" if self.max_proximity > 0.6 else ("warning" if self.max_proximity > 0.35 else "safe")
+
+    @cached_property
+    def is_pinch(self):
+        return self.processor.detect_pinch_point(self.boxes, self.width)
+
+    @cached_property
+    def weaving(self):
+        # detect_weaving adds this window's direction to the history, so it
+        # runs once per window whether weaving, slalom_aggressive or both read it
+        return self.processor.detect_weaving(self.flow_x)
+
+    def width_change_rates(self):
+        """(box, label, previous-window box or None, width change rate) per detection."""
+        for idx, (box, label) in enumerate(zip(self.boxes, self.labels)):
+            prev_box = self.prev_boxes[idx] if idx < len(self.prev_boxes) else None
+            curr_w = box[2] - box[0]
+            prev_w = prev_box[2] - prev_box[0] if prev_box is not None else 0
+            yield box, label, prev_box, (curr_w - prev_w) / prev_w if prev_w > 0 else 0
+
 
 class VideoProcessor:
-    def __init__(self, video_path, window_size=10):
+    def __init__(self, video_path, window_size=10, weights="yolov8n.pt", backend="ultralytics",
+                 backend_options=None, conf=DEFAULT_CONF, iou=DEFAULT_IOU, max_det=DEFAULT_MAX_DET,
+                 imgsz=DEFAULT_IMGSZ, reader="opencv", decode_scale=None, decode_threads=0,
+                 sampling="fixed", keyframe_tolerance=DEFAULT_KEYFRAME_TOLERANCE, telemetry=None,
+                 telemetry_offset=0.0, telemetry_kmh_per_unit=KMH_PER_MOTION_UNIT, detectors=None,
+                 checkpoint=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, window_seconds=DEFAULT_WINDOW_SECONDS,
+                 model=None, pipeline="inline", pipeline_slots=DEFAULT_SLOTS):
+        # One path, or an ordered list of clips analysed as one ride
+        # (dashcam loop recording; see frame_readers.MultiClipReader)
         self.video_path = video_path
         self.window_size = window_size
-        self.model = YOLO("yolov8n.pt") 
+        self.weights = weights
+        # Inference backend: 'ultralytics', 'onnxruntime' or 'openvino' (see detector_backends.py)
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        # Loaded on first use (see load_model), unless an already-loaded backend
+        # is passed in (warm workers share one; see worker_pool.py)
+        self._model = model
         # Standard classes: 0=person, 1=bicycle, 2=car, 3=motorcycle, 5=bus, 7=truck, 67=cell phone
-        self.relevant_classes = [0, 1, 2, 3, 5, 7, 67] 
+        self.relevant_classes = frozenset([0, 1, 2, 3, 5, 7, 67])
+        # Filtering done inside the detector (before NMS), not per box in Python
+        self.conf = conf            # Minimum detection confidence
+        self.iou = iou              # NMS IoU threshold
+        self.max_det = max_det      # Maximum detections kept per frame
+        # Inference resolution (longest side): 320/480/640 trade accuracy for speed
+        self.imgsz = imgsz
+        self.buffers = None  # Per-video FrameBuffers, allocated in process_video
+        # Frame source (see frame_readers.py): 'opencv', 'ffmpeg' or 'auto' (ffmpeg if installed)
+        self.reader = reader
+        self.decode_scale = decode_scale      # e.g. 0.5 decodes at half resolution
+        # Source-resolution pixels per decoded pixel. The flow and pixel
+        # thresholds are tuned at source resolution, so a smaller decode
+        # (decode_scale, two-tier proxy) scales its flow and distances back
+        self.pixel_scale = 1.0 / decode_scale if decode_scale else 1.0
+        self.decode_threads = decode_threads  # ffmpeg decoder threads (0 = auto)
+        # Window plan (see sampling.py): 'fixed' or 'keyframe' (starts moved to
+        # keyframes at most keyframe_tolerance frames away)
+        self.sampling = sampling
+        self.keyframe_tolerance = keyframe_tolerance
+        # Window length in seconds of ride, whatever the camera's frame rate
+        # (15 frames at 30 fps, 30 at 60 fps); temporal limits follow it
+        self.window_seconds = window_seconds
+        self.set_window_duration(window_seconds)
+        self.sampling_report = None  # plan_windows() report of the last process_video run
+        self.fps = None  # frame rate of the video the last process_video run read
+        # GPS/IMU sidecar CSV (see telemetry.py): windows it covers take speed,
+        # jerk and vertical jolt from the log and skip optical flow
+        self.telemetry = telemetry
+        self.telemetry_offset = telemetry_offset  # seconds from log start to video start
+        self.telemetry_kmh_per_unit = telemetry_kmh_per_unit  # log speed per unit of flow (telemetry.py)
+        self.telemetry_report = None
+        # Enabled detectors (see DETECTORS); stages only disabled ones read are skipped
+        self.detectors = resolve_detectors(detectors)
+        # Resume file for long runs (see checkpoint.py); None disables checkpointing
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every  # windows between checkpoints
+        # 'inline' decodes and computes flow in this thread; 'processes' runs
+        # them in a decoder and a flow process ahead of inference, handing
+        # frames over in a shared-memory ring of pipeline_slots windows
+        # (see frame_transport.py). The frame_data is the same.
+        self.pipeline = pipeline
+        self.pipeline_slots = pipeline_slots
+        self.reset_state()
+
+    @property
+    def model(self):
+        if self._model is None:
+            options = {'conf': self.conf, 'iou': self.iou, 'max_det': self.max_det,
+                       'classes': self.relevant_classes, 'imgsz': self.imgsz}
+            options.update(self.backend_options)
+            self._model = create_backend(self.backend, weights=self.weights, **options)
+        return self._model
+
+    def load_model(self):
+        """
+        Loads the detector backend now rather than on the first window.
+        The detectors themselves never touch the model, so they can be
+        exercised (e.g. by benchmarks) without loading it.
+        """
+        return self.model
+
+    def detector_inputs(self):
+        """Per-window inputs the enabled detectors read ('frame', 'flow', 'boxes', 'tracks')."""
+        return detector_inputs(self.detectors)
+
+    def reset_state(self):
+        """Clears the temporal detector state carried from window to window."""
         self.prev_flow_x = 0  # To calculate "Jerk" (Change in acceleration)
+        self.prev_ego_source = 'flow'  # 'flow' (pixels) or 'telemetry' (m/s^2) behind prev_flow_x
         self.blind_spot_timer = 0  # Track loitering duration in blind spots
         self.flow_x_history = []  # Track lateral flow direction reversals for weaving
         self.slalom_counter = 0  # Track aggressive weaving in dense traffic
@@ -27,6 +337,38 @@ class VideoProcessor:
         self.flow_history = []     # For weaving/slalom direction history
         self.prev_speed_score = 0  # For gap-shooting detection (acceleration proxy)
 
+    def set_window_duration(self, seconds):
+        """Converts the temporal detector limits (in seconds) to windows of `seconds` each."""
+        self.window_duration = seconds
+        self.blind_spot_windows = max(1, int(round(BLIND_SPOT_LOITER_SECONDS / seconds)))
+        self.weaving_history_windows = max(2, int(round(WEAVING_HISTORY_SECONDS / seconds)))
+        self.slalom_windows = max(1, int(round(SLALOM_SUSTAIN_SECONDS / seconds)))
+
+    def warmup_windows(self):
+        """
+        Consecutive windows after which the temporal detector state no longer
+        depends on where a run started: the loitering timer past its limit,
+        a full weaving history, and the slalom counter on top of it.
+        """
+        return max(self.blind_spot_windows + 1, self.weaving_history_windows + self.slalom_windows)
+
+    def detector_state(self):
+        """The temporal detector state reset_state() clears, as a copy (for checkpoints)."""
+        return {
+            'prev_flow_x': self.prev_flow_x,
+            'prev_ego_source': self.prev_ego_source,
+            'blind_spot_timer': self.blind_spot_timer,
+            'flow_x_history': list(self.flow_x_history),
+            'slalom_counter': self.slalom_counter,
+            'flow_history': list(self.flow_history),
+            'prev_speed_score': self.prev_speed_score,
+        }
+
+    def restore_detector_state(self, state):
+        """Puts back a detector_state() snapshot."""
+        for name, value in state.items():
+            setattr(self, name, list(value) if isinstance(value, list) else value)
+
     def estimate_speed_proxy(self, frame, prev_gray):
         """ 
         Uses Optical Flow Magnitude as a proxy for speed.
@@ -34,25 +376,101 @@ class VideoProcessor:
         """
         if prev_gray is None:
             return 'stationary', 0, None, 0
-            
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+
+        buffers = self.buffers if self.buffers is not None and self.buffers.fits(frame) else None
+        if buffers is not None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.gray)
+            flow = self.compute_flow(prev_gray, gray, flow=buffers.flow)
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            flow = self.compute_flow(prev_gray, gray)
+        status, jerk_score, avg_motion = self.flow_speed_proxy(flow)
+        return status, jerk_score, flow, avg_motion
+
+    def flow_speed_proxy(self, flow):
+        """
+        The speed/jerk half of estimate_speed_proxy(), for a flow field
+        already computed (by the flow process of pipeline="processes").
+        Returns: status, jerk_score, avg_motion.
+        """
+        buffers = self.buffers if self.buffers is not None and self.buffers.fits(flow) else None
+        if buffers is not None:
+            # Split into contiguous planes in place of the copies cartToPolar would make
+            cv2.split(flow, buffers.flow_planes)
+            magnitude, _ = cv2.cartToPolar(buffers.flow_planes[0], buffers.flow_planes[1],
+                                           magnitude=buffers.magnitude, angle=buffers.angle)
+        else:
+            magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
 
         # Calculate Flow Magnitude (Speed Proxy)
-        magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
         avg_motion = np.mean(magnitude)
 
         # Calculate Jerk (Sudden lateral movement) - "Reactive" behavior
         flow_x = np.mean(flow[..., 0])
+        jerk_score = self.lateral_jerk(flow_x, 'flow')
+
+        # Tuned thresholds: make 'slow' and 'fast' more sensitive for urban footage
+        status = 'stationary'
+        if avg_motion > 2.0: status = 'slow'
+        if avg_motion > 15.0: status = 'fast'
+
+        return status, jerk_score, avg_motion
+
+    def lateral_jerk(self, flow_x, source):
+        """
+        Change in mean lateral motion since the previous window. Flow is in
+        pixels and telemetry in m/s^2, so the window where the ego-motion
+        source changes has no previous value to compare with and scores 0.
+        """
+        if source != self.prev_ego_source:
+            self.prev_flow_x = flow_x
+            self.prev_ego_source = source
         jerk_score = abs(flow_x - self.prev_flow_x)
         self.prev_flow_x = flow_x
+        return jerk_score
+
+    def telemetry_speed_proxy(self, signals):
+        """
+        estimate_speed_proxy() from telemetry instead of optical flow.
+        signals is a telemetry.WindowSignals (motion in flow-equivalent units).
+        Returns: status, jerk_score, avg_motion.
+        """
+        avg_motion = signals.motion
+        jerk_score = self.lateral_jerk(signals.lateral, 'telemetry')
 
-        # Tuned thresholds: make 'slow' and 'fast' more sensitive for urban footage
         status = 'stationary'
         if avg_motion > 2.0: status = 'slow'
         if avg_motion > 15.0: status = 'fast'
 
-        return status, jerk_score, flow, avg_motion
+        return status, jerk_score, avg_motion
+
+    def window_flow(self, frame1, frame2):
+        """Dense flow between two frames, into the buffer pool when it fits (no speed/jerk side effects)."""
+        if self.buffers is not None and self.buffers.fits(frame1):
+            prev_gray = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY, dst=self.buffers.prev_gray)
+            gray = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY, dst=self.buffers.gray)
+            return self.compute_flow(prev_gray, gray, flow=self.buffers.flow)
+        return self.compute_flow(cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY),
+                                 cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY))
+
+    def compute_flow(self, prev_gray, gray, flow=None):
+        """
+        Dense Farneback optical flow between two grayscale frames.
+        flow, if given, is an (H, W, 2) float32 array the result is written into.
+        The flow is in source-resolution pixels (see pixel_scale).
+        """
+        flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, flow, 0.5, 3, 15, 3, 5, 1.2, 0)
+        if self.pixel_scale != 1.0:
+            flow *= self.pixel_scale
+        return flow
+
+    def run_detector(self, frame):
+        """
+        Runs the detector backend on one frame.
+        Returns (boxes, cls): an (N, 4) xyxy float array and an (N,) class id array.
+        """
+        boxes, cls, _ = self.model.detect(frame)
+        return boxes, cls
 
     def classify_dhaka_vehicle(self, label, box):
         """
@@ -136,7 +554,7 @@ class VideoProcessor:
         Detects when rider intentionally enters a pinch point.
         Signs: Moving toward a narrow gap, lateral movement toward obstacles.
         """
-        if not prev_boxes or len(boxes) < 2:
+        if not prev_boxes or len(boxes) < 2 or flow_x is None:  # None: no lateral flow (telemetry)
             return False
         
         # Calculate if gap is narrowing and rider is moving into it
@@ -194,7 +612,7 @@ class VideoProcessor:
 
         # Object is in your lane (Center of screen) — use relative threshold
         obj_center = (box[0] + box[2]) / 2
-        in_ego_lane = abs(obj_center - frame_center_x) < 200
+        in_ego_lane = abs(obj_center - frame_center_x) * self.pixel_scale < 200  # source-resolution pixels
 
         if expanding and in_ego_lane:
             return "WRONG_WAY_HAZARD"
@@ -232,10 +650,23 @@ class VideoProcessor:
         except Exception:
             return "STATIONARY_PEDESTRIAN"
 
+    def detect_jaywalkers(self, boxes, flow_integral):
+        """
+        Batch detect_jaywalker: one state per row of an (N, 4) box array,
+        from O(1) per-box mean horizontal flow (see flow_stats.FlowIntegral).
+        """
+        if flow_integral is None or flow_integral.flow is None or len(boxes) == 0:
+            return ["STATIONARY_PEDESTRIAN"] * len(boxes)
+        means, valid = flow_integral.box_means(boxes)
+        # Threshold: moving sideways faster than 2 pixels/frame
+        active = valid & (np.abs(means[:, 0]) > 2.0)
+        return ["ACTIVE_CROSSING_RISK" if a else "STATIONARY_PEDESTRIAN" for a in active.tolist()]
+
     def check_blind_spot_loitering(self, boxes, labels, width):
         """
         Tracks large vehicles on side edges (kill zones).
-        If a large vehicle stays on the left/right edge for >30 frames, flag loitering.
+        If a large vehicle stays on the left/right edge for more than
+        BLIND_SPOT_LOITER_SECONDS, flag loitering.
         """
         large_vehicle_on_side = False
 
@@ -251,7 +682,7 @@ class VideoProcessor:
         else:
             self.blind_spot_timer = 0
 
-        if self.blind_spot_timer > 30:  # 30 frames ~ 1 second (approx)
+        if self.blind_spot_timer > self.blind_spot_windows:  # windows; 15 s of ride
             return "BLIND_SPOT_LOITERING"
         return None
 
@@ -312,11 +743,14 @@ class VideoProcessor:
             return "AGGRESSIVE_GAP_SHOOTING"
         return None
 
-    def detect_speed_breaker(self, flow):
+    def detect_speed_breaker(self, flow, vertical_jolt=None):
         """
         Detects sudden vertical jolts consistent with hitting a speed breaker.
-        Uses vertical optical flow (flow[...,1]) to detect camera bounce.
+        Uses vertical optical flow (flow[...,1]) to detect camera bounce, or
+        the accelerometer's vertical jolt (m/s^2) when telemetry supplies it.
         """
+        if vertical_jolt is not None:
+            return "SPEED_BREAKER_IMPACT" if vertical_jolt > SPEED_BREAKER_JOLT else None
         if flow is None:
             return None
 
@@ -351,13 +785,19 @@ class VideoProcessor:
     def detect_weaving(self, current_flow_x):
         """
         Detects weaving using a short history of lateral flow directions.
-        Returns 'AGGRESSIVE_WEAVING' or 'STABLE_LANE'.
+        Returns 'AGGRESSIVE_WEAVING' or 'STABLE_LANE', or None when there is
+        no lateral flow (a telemetry window): not evaluated, and the history
+        restarts, so it never spans windows it could not see.
         """
+        if current_flow_x is None:
+            self.flow_history = []
+            return None
+
         # 1 = Moving Right, -1 = Moving Left, 0 = Straight
         direction = 1 if current_flow_x > 2 else (-1 if current_flow_x < -2 else 0)
 
         self.flow_history.append(direction)
-        if len(self.flow_history) > 30:  # Keep last 30 frames (~3s)
+        if len(self.flow_history) > self.weaving_history_windows:  # One entry per window: the last WEAVING_HISTORY_SECONDS
             self.flow_history.pop(0)
 
         # Count direction changes (zero crossings)
@@ -366,20 +806,24 @@ class VideoProcessor:
             if self.flow_history[i] != self.flow_history[i-1] and self.flow_history[i] != 0:
                 changes += 1
 
-        if changes > 5:  # Changed direction 5+ times in 3 seconds
+        if changes > 5:  # Changed direction 5+ times within the history
             return "AGGRESSIVE_WEAVING"
         return "STABLE_LANE"
 
-    def detect_slalom_aggressive(self, boxes, labels, current_flow_x, frame_width):
+    def detect_slalom_aggressive(self, boxes, labels, current_flow_x, frame_width, weaving=None):
         """
         Detects aggressive slalom (rapid lane changing with traffic).
         Combination of gap detection + weaving + nearby traffic.
+        weaving, if given, is this window's detect_weaving() verdict; without
+        it detect_weaving runs here (and adds to the direction history).
         """
         if not hasattr(self, 'slalom_counter'):
             self.slalom_counter = 0
         
         # Check if weaving
-        if current_flow_x is not None:
+        if weaving is not None:
+            is_weaving = weaving
+        elif current_flow_x is not None:
             is_weaving = self.detect_weaving(current_flow_x)
         else:
             is_weaving = "STABLE_LANE"
@@ -394,210 +838,360 @@ class VideoProcessor:
         else:
             self.slalom_counter = 0
         
-        # Sustained slalom = 3+ frames of combined behavior
-        return self.slalom_counter >= 3
-
-    def process_video(self):
-        # Validate video file exists
-        if not os.path.exists(self.video_path):
-            raise FileNotFoundError(f"Video file not found: {self.video_path}")
-        
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Could not open video file: {self.video_path}")
+        # Sustained slalom = SLALOM_SUSTAIN_SECONDS (3 windows at 0.5 s) of combined behavior
+        return self.slalom_counter >= self.slalom_windows
+
+    def _report_window(self, progress_callback, windows_done, windows_total, timer, frame_id):
+        if progress_callback is None:
+            return
+        progress_callback(PipelineEvent(
+            'window',
+            message=f"Processing window {windows_done}/{windows_total}...",
+            windows_done=windows_done,
+            windows_total=windows_total,
+            timings=timer.timings,
+            frame_id=frame_id,
+        ))
+
+    def process_video(self, progress_callback=None, windows=None):
+        """
+        Runs the detector pipeline over sampled windows of the video.
+        progress_callback(event), if given, receives a PipelineEvent after every
+        window with windows done/total and the decode/flow/inference/detectors
+        timings (seconds) of that window.
+        windows, if given, is the list of (first, last) frame pairs to analyse
+        instead of the sampling plan; they should be consecutive windows, since
+        the cross-window detector state assumes each follows the previous one.
+        """
+        # Validate video file exists (open_reader raises FileNotFoundError / ValueError)
+        reader = open_reader(self.video_path, self.reader, self.decode_scale, self.decode_threads)
+        if isinstance(reader, MultiClipReader):
+            # Frame numbers (frame_id) and detector state run on across clip boundaries
+            print(f"Ride of {len(reader.clips)} clips, {reader.total_frames} frames")
         
         frame_data = []
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        total_frames = reader.total_frames
+        width = reader.width
+        height = reader.height
         
         if total_frames <= 0:
-            cap.release()
+            reader.release()
             raise ValueError("Video file appears to be empty or invalid")
-        
-        # We'll sample the first and last frame of each 15-frame window (reduced from 30 for better detection)
-        sampling_interval = 15
-        if sampling_interval <= 0:
-            sampling_interval = 15
-
-        num_windows = total_frames // sampling_interval
-        print(f"Sampling {num_windows} windows (first+last frame of each 15-frame window) with Dhaka Context Logic...")
 
+        # Resolution is fixed within a video: compute the letterbox once and
+        # allocate the model-input buffers up front (only if a detector reads
+        # boxes; otherwise the model is never loaded)
+        if width > 0 and height > 0:
+            if 'boxes' in self.detector_inputs():
+                self.model.prepare((height, width))
+            # Reusable frame/gray/flow arrays for every window of this video
+            self.buffers = FrameBuffers(height, width)
+        
+        # We'll sample the first and last frame of each window of window_seconds
+        # (0.5 s: 15 frames at 30 fps, reduced from 30 for better detection).
+        # Window length is in time, so 60/120 fps footage costs the same per
+        # minute of ride and the temporal limits cover the same ride time
+        sampling_interval = window_interval(reader.fps, self.window_seconds)
+        self.set_window_duration(window_duration(reader.fps, sampling_interval))
+
+        # Deterministic sampling: take the first and last frame in each window,
+        # optionally moving window starts onto keyframes (cheaper seeks).
+        # The reader is told every frame up front so ffmpeg can decode only those.
+        if windows is None:
+            windows, keyframes, self.sampling_report = plan_windows(self.video_path, total_frames, reader.fps,
+                                                                    self.sampling, sampling_interval,
+                                                                    self.keyframe_tolerance)
+            print(f"Sampling {len(windows)} windows (first+last frame of each {sampling_interval}-frame, "
+                  f"{self.window_duration:.2f}s window) with Dhaka Context Logic...")
+            print(format_report(self.sampling_report))
+        else:
+            windows = [(first, min(last, total_frames - 1)) for first, last in windows if first < total_frames]
+            keyframes = None
+        num_windows = len(windows)
+
+        # Only the stages an enabled detector reads run; without flow the
+        # first frame of each window is not even decoded
+        enabled = set(self.detectors)
+        needs = self.detector_inputs()
+        use_flow = 'flow' in needs
+        use_boxes = 'boxes' in needs
+        if len(enabled) < len(DETECTORS):
+            print(format_detector_plan(self.detectors))
+
+        # Resume from a checkpoint of this same run, if one was left behind
+        fingerprint = run_fingerprint(self, windows) if self.checkpoint else None
+        resumed = load_checkpoint(self.checkpoint, fingerprint)
+        start_window = 0
+        counters = {'telemetry_windows': 0, 'pedestrian_flow_windows': 0, 'seeks': 0}
         # previous frame object tracking for simple width-change heuristics
         prev_boxes = []
-        prev_labels = []
-        prev_box_sizes = []
-
-        for i in range(num_windows):
-            # Deterministic sampling: take the first and last frame in each 30-frame window
-            start_frame = i * sampling_interval
-            first_idx = start_frame
-            last_idx = min(start_frame + sampling_interval - 1, total_frames - 1)
+        if resumed is not None:
+            start_window = resumed['next_window']
+            frame_data = resumed['frame_data']
+            self.restore_detector_state(resumed['state']['detectors'])
+            prev_boxes = resumed['state']['prev_boxes']
+            counters = resumed['counters']
+            print(f"Resuming from checkpoint {self.checkpoint}: window {start_window}/{num_windows}")
+
+        # Windows with frames to decode (a window needs two distinct frames)
+        jobs = [(first, last) for first, last in windows[start_window:] if last > first]
+
+        # Parsed once per processor (two-tier runs call process_video repeatedly)
+        self.telemetry = telemetry = load_telemetry(self.telemetry, self.telemetry_offset,
+                                                    self.telemetry_kmh_per_unit)
+        self.fps = fps = reader.fps
+        if fps <= 0:
+            telemetry = None  # window times are unknown
+        telemetry_windows = counters['telemetry_windows']
+        pedestrian_flow_windows = counters['pedestrian_flow_windows']
+
+        # Decode (and flow) either here, or in processes running ahead of
+        # inference; `frames` is whichever one delivers the windows
+        pipeline = None
+        use_processes = self.pipeline == "processes" and bool(jobs)
+        if use_processes and not stages_supported():
+            print("Daemonic worker process: decoding inline instead of in pipeline processes")
+            use_processes = False
+        if use_processes:
+            reader.release()  # the decoder process opens its own
+            flow_needed = [telemetry is None or telemetry.window_signals(first / fps, last / fps) is None
+                           for first, last in jobs]
+            pipeline = WindowPipeline(self, jobs, keyframes, width, height, use_flow, flow_needed,
+                                      self.pipeline_slots)
+        else:
+            reader.start([idx for first, last in jobs for idx in ((first, last) if use_flow else (last,))],
+                         keyframes=keyframes)
+        frames = pipeline or reader
+
+        for i, (first_idx, last_idx) in enumerate(windows[start_window:], start=start_window):
+            if self.checkpoint and i > start_window and i % self.checkpoint_every == 0:
+                state = {'detectors': self.detector_state(), 'prev_boxes': prev_boxes}
+                save_checkpoint(self.checkpoint, fingerprint, i, frame_data, state,
+                                {'telemetry_windows': telemetry_windows,
+                                 'pedestrian_flow_windows': pedestrian_flow_windows,
+                                 'seeks': counters['seeks'] + frames.seeks})
+            timer = StageTimer()
 
             # Need at least two distinct frames to compute optical flow
             if last_idx <= first_idx:
+                self._report_window(progress_callback, i + 1, num_windows, timer, first_idx)
                 continue
 
-            # Read first frame
-            cap.set(cv2.CAP_PROP_POS_FRAMES, int(first_idx))
-            ret1, frame1 = cap.read()
-            if not ret1:
-                break
-
-            # Read last frame
-            cap.set(cv2.CAP_PROP_POS_FRAMES, int(last_idx))
-            ret2, frame2 = cap.read()
+            flow = flow_gray = None
+            if pipeline is not None:
+                # Views into the next ring slot, decoded (and flow computed) ahead;
+                # 'decode' is then the time spent waiting for them
+                ring_window = pipeline.next_window()
+                if ring_window is None:
+                    break
+                frame1, frame2 = ring_window.frame1, ring_window.frame2
+                flow, flow_gray = ring_window.flow, ring_window.gray
+                ret2 = frame2 is not None
+            else:
+                # Read first frame (only optical flow compares it with the last one)
+                frame1 = None
+                if use_flow:
+                    ret1, frame1 = reader.read(first_idx, self.buffers.frame1 if self.buffers is not None else None)
+                    if not ret1:
+                        break
+
+                # Read last frame
+                ret2, frame2 = reader.read(last_idx, self.buffers.frame2 if self.buffers is not None else None)
             if not ret2:
                 # if we couldn't read the last frame, skip this window
+                timer.lap('decode')
+                self._report_window(progress_callback, i + 1, num_windows, timer, first_idx)
                 continue
+            timer.lap('decode')
+            window = WindowInputs(self, frame1, frame2, width, timer, prev_boxes)
+
+            # 1. Speed & Jerk: from telemetry when the log covers this window,
+            # otherwise from optical flow (whose output the detectors also use)
+            if use_flow:
+                signals = telemetry.window_signals(first_idx / fps, last_idx / fps) if telemetry is not None else None
+                if signals is not None:
+                    window.speed_status, window.jerk_score, window.avg_motion = self.telemetry_speed_proxy(signals)
+                    # Lateral acceleration is not horizontal flow: the detectors
+                    # tuned on flow_x (weaving, slalom, pinch entry) skip this window
+                    window.flow_x = None
+                    window.vertical_jolt = signals.jolt
+                    window.from_telemetry = True
+                    telemetry_windows += 1
+                elif flow is not None:
+                    window.flow, window.flow_gray = flow, flow_gray
+                    window.speed_status, window.jerk_score, window.avg_motion = self.flow_speed_proxy(flow)
+                    window.flow_x = np.mean(flow[..., 0])
+                else:
+                    if self.buffers is not None and self.buffers.fits(frame1):
+                        prev_gray = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY, dst=self.buffers.prev_gray)
+                    else:
+                        prev_gray = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
+                    window.speed_status, window.jerk_score, window.flow, window.avg_motion = \
+                        self.estimate_speed_proxy(frame2, prev_gray)
+                    window.flow_x = np.mean(window.flow[..., 0]) if window.flow is not None else 0
+                timer.lap('flow')
 
-            # 1. Optical Flow (Speed & Jerk) + flow output for detectors
-            prev_gray = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
-            speed_status, jerk_score, flow, avg_motion = self.estimate_speed_proxy(frame2, prev_gray)
-            flow_x = np.mean(flow[..., 0]) if flow is not None else 0
-            
             # 2. Object Detection with Dhaka Logic
-            results = self.model(frame2, verbose=False)[0]
-            detected_objs = []
-            max_proximity = 0
-            has_phone = False
-            current_boxes = []
-            box_sizes = []
-
-            for box in results.boxes:
-                cls = int(box.cls[0])
-                if cls in self.relevant_classes:
-                    raw_label = self.model.names[cls]
-                    coords = box.xyxy[0].tolist()
-                    
-                    # Apply Dhaka Classifier
-                    final_label = self.classify_dhaka_vehicle(raw_label, coords)
-                    
-                    if cls == 67: 
-                        has_phone = True
-                    detected_objs.append(final_label)
-                    current_boxes.append(coords)
-                    
-                    # Proximity Score (Width of object relative to frame)
-                    curr_width = coords[2] - coords[0]
-                    box_sizes.append(curr_width)
-                    width_ratio = curr_width / width if width > 0 else 0
-                    max_proximity = max(max_proximity, width_ratio)
-
-            # 3. Analyze Risks
-            is_pinch = self.detect_pinch_point(current_boxes, width)
-
-            # Detect intentional aggressive pinch point entry
-            intentional_pinch_entry = False
-            if is_pinch and len(prev_boxes) > 0:
-                intentional_pinch_entry = self.detect_intentional_pinch_entry(
-                    current_boxes, prev_boxes, flow_x, width
-                )
-
-            # Simple glare check (very bright frame)
-            gray = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
-            is_glare = np.mean(gray) > 230
-
-            # Prepare detector outputs (defaults)
-            leguna_flag = False
-            wrong_way_flag = False
-            jaywalker_state = "STATIONARY_PEDESTRIAN"
-            blind_spot_flag = False
-            red_light_flag = False
-            gap_shoot_flag = False
-            speed_breaker_flag = False
-            bus_blockade_flag = False
-            weaving_flag = False
-            slalom_flag = False
-
-            # TTC heuristic (very rough): if an object occupies >60% width ratio -> critical
-            ttc_status = "critical" if max_proximity > 0.6 else ("warning" if max_proximity > 0.35 else "safe")
-
-            # Gap shooting uses avg motion as a speed proxy
-            current_speed_score = avg_motion
-
-            # Loop objects for per-object detectors
-            frame_center_x = width / 2
-            for idx, (box, label) in enumerate(zip(current_boxes, detected_objs)):
-                prev_box = prev_boxes[idx] if idx < len(prev_boxes) else None
-
-                # width change rate for leguna/wrong-way heuristics
-                curr_w = box[2] - box[0]
-                prev_w = prev_box[2] - prev_box[0] if prev_box is not None else 0
-                width_change_rate = (curr_w - prev_w) / prev_w if prev_w > 0 else 0
-
-                # Leguna brake
-                if self.detect_leguna_brake(box, label, width_change_rate) is not None:
-                    leguna_flag = True
-
-                # Wrong-way
-                if self.detect_wrong_way(box, prev_box, frame_center_x) is not None:
-                    wrong_way_flag = True
-
-                # Jaywalker (only for person labels)
-                if label in ['person']:
-                    jaywalker_state = self.detect_jaywalker(box, flow)
-
-                # Bus blockade (check first bus that satisfies condition)
-                if not bus_blockade_flag and label == 'bus':
-                    bus_prev = prev_boxes[idx] if idx < len(prev_boxes) else None
-                    if self.detect_bus_blockade('bus', box, bus_prev) is not None:
-                        bus_blockade_flag = True
-
-            # Blind spot loitering (uses all boxes + labels)
-            if self.check_blind_spot_loitering(current_boxes, detected_objs, width) is not None:
-                blind_spot_flag = True
-
-            # Red light check
-            if self.check_red_light(frame2, current_boxes, detected_objs, speed_status) is not None:
-                red_light_flag = True
-
-            # Gap shooting
-            if self.detect_gap_shooting(ttc_status, current_speed_score, self.prev_speed_score) is not None:
-                gap_shoot_flag = True
-
-            # Speed breaker
-            if self.detect_speed_breaker(flow) is not None:
-                speed_breaker_flag = True
-
-            # Weaving detection (lateral flow)
-            weaving_res = self.detect_weaving(flow_x)
-            if weaving_res == "AGGRESSIVE_WEAVING":
-                weaving_flag = True
-
-            # Slalom detection (needs current labels/flow_x)
-            if self.detect_slalom_aggressive(current_boxes, detected_objs, flow_x, width):
-                slalom_flag = True
-
-            # Update prev_speed_score for next frame
-            self.prev_speed_score = current_speed_score
-
-            frame_data.append({
-                "frame_id": first_idx,
-                "objects": detected_objs,
-                "proximity": max_proximity,
-                "speed": speed_status,
-                "jerk": jerk_score,
-                "pinch": is_pinch,
-                "phone": has_phone,
-                "glare": is_glare,
-                # Advanced detectors
-                "leguna_brake": leguna_flag,
-                "wrong_way": wrong_way_flag,
-                "jaywalker": jaywalker_state,
-                "blind_spot_loitering": blind_spot_flag,
-                "red_light_violation": red_light_flag,
-                "gap_shooting": gap_shoot_flag,
-                "speed_breaker": speed_breaker_flag,
-                "bus_blockade": bus_blockade_flag,
-                "weaving": weaving_flag,
-                "slalom_aggressive": slalom_flag,
-                "intentional_pinch_entry": intentional_pinch_entry
-            })
+            # The backend already dropped irrelevant classes; boxes/classes come
+            # back as arrays and are converted to Python lists in one call each
+            if use_boxes:
+                det_boxes, det_cls = self.run_detector(frame2)
+                window.det_boxes = det_boxes
+                window.boxes = det_boxes.tolist()
+                window.class_ids = det_cls.tolist()
+                names = self.model.names
+
+                # Apply Dhaka Classifier
+                window.labels = [self.classify_dhaka_vehicle(names[cls], coords)
+                                 for coords, cls in zip(window.boxes, window.class_ids)]
+                timer.lap('inference')
+
+            # 3. Analyze Risks: enabled detectors in registry order; disabled
+            # ones report their default so every entry has the same fields
+            entry = {"frame_id": first_idx}
+            for name, detector in DETECTORS.items():
+                entry[name] = detector.run(self, window) if name in enabled else detector.default_value()
+            frame_data.append(entry)
+            pedestrian_flow_windows += window.pedestrian_flow
 
             # store current as previous for next iteration (simple matching by index)
-            prev_boxes = [b.copy() if hasattr(b, 'copy') else b for b in current_boxes]
-            prev_labels = list(detected_objs)
-            prev_box_sizes = list(box_sizes)
-
-        cap.release()
+            prev_boxes = [b.copy() if hasattr(b, 'copy') else b for b in window.boxes]
+            timer.lap('detectors')
+            self._report_window(progress_callback, i + 1, num_windows, timer, first_idx)
+
+        if keyframes is not None:
+            self.sampling_report['seeks'] = counters['seeks'] + frames.seeks
+        if telemetry is not None:
+            self.telemetry_report = {
+                'windows': num_windows,
+                'telemetry_windows': telemetry_windows,
+                'flow_windows': num_windows - telemetry_windows,
+                'pedestrian_flow_windows': pedestrian_flow_windows,
+            }
+            print(format_telemetry(self.telemetry_report))
+        else:
+            self.telemetry_report = None
+        if pipeline is not None:
+            pipeline.close()
+        reader.release()
+        self.buffers = None  # Frame-sized memory is only held while a video is processed
+        remove_checkpoint(self.checkpoint)  # the run is complete
         return frame_data
+
+
+# Built-in detectors, in frame_data field order (also the order they run in,
+# which matters for state shared between them: weaving before slalom)
+
+@register_detector('objects', ('boxes',), default=[])
+def _objects(processor, window):
+    return window.labels
+
+
+@register_detector('proximity', ('boxes',), default=0)
+def _proximity(processor, window):
+    return window.max_proximity
+
+
+@register_detector('speed', ('flow',), default='stationary')
+def _speed(processor, window):
+    return window.speed_status
+
+
+@register_detector('jerk', ('flow',), default=0)
+def _jerk(processor, window):
+    return window.jerk_score
+
+
+@register_detector('pinch', ('boxes',))
+def _pinch(processor, window):
+    return window.is_pinch
+
+
+@register_detector('phone', ('boxes',))
+def _phone(processor, window):
+    return 67 in window.class_ids
+
+
+@register_detector('glare', ('frame',))
+def _glare(processor, window):
+    # Simple glare check (very bright frame)
+    return np.mean(window.gray) > 230
+
+
+@register_detector('leguna_brake', ('boxes', 'tracks'))
+def _leguna_brake(processor, window):
+    return any(processor.detect_leguna_brake(box, label, rate) is not None
+               for box, label, _, rate in window.width_change_rates())
+
+
+@register_detector('wrong_way', ('boxes', 'tracks'))
+def _wrong_way(processor, window):
+    frame_center_x = window.width / 2
+    return any(processor.detect_wrong_way(box, prev_box, frame_center_x) is not None
+               for box, _, prev_box, _ in window.width_change_rates())
+
+
+@register_detector('jaywalker', ('boxes', 'flow'), default="STATIONARY_PEDESTRIAN")
+def _jaywalker(processor, window):
+    # Mean lateral flow of every pedestrian box in one batch; the window
+    # keeps the state of the last pedestrian
+    person_rows = [idx for idx, label in enumerate(window.labels) if label == 'person']
+    if not person_rows:
+        return "STATIONARY_PEDESTRIAN"
+    return processor.detect_jaywalkers(window.det_boxes[person_rows], window.flow_integral)[-1]
+
+
+@register_detector('blind_spot_loitering', ('boxes',))
+def _blind_spot_loitering(processor, window):
+    return processor.check_blind_spot_loitering(window.boxes, window.labels, window.width) is not None
+
+
+@register_detector('red_light_violation', ('frame', 'boxes', 'flow'))
+def _red_light_violation(processor, window):
+    return processor.check_red_light(window.frame2, window.boxes, window.labels, window.speed_status) is not None
+
+
+@register_detector('gap_shooting', ('boxes', 'flow'))
+def _gap_shooting(processor, window):
+    # Gap shooting uses avg motion as a speed proxy
+    flag = processor.detect_gap_shooting(window.ttc_status, window.avg_motion, processor.prev_speed_score) is not None
+    processor.prev_speed_score = window.avg_motion
+    return flag
+
+
+@register_detector('speed_breaker', ('flow',))
+def _speed_breaker(processor, window):
+    return processor.detect_speed_breaker(window.flow, window.vertical_jolt) is not None
+
+
+@register_detector('bus_blockade', ('boxes', 'tracks'))
+def _bus_blockade(processor, window):
+    return any(label == 'bus' and processor.detect_bus_blockade('bus', box, prev_box) is not None
+               for box, label, prev_box, _ in window.width_change_rates())
+
+
+@register_detector('weaving', ('flow',))
+def _weaving(processor, window):
+    # Lateral flow direction history
+    return window.weaving == "AGGRESSIVE_WEAVING"
+
+
+@register_detector('slalom_aggressive', ('boxes', 'flow'))
+def _slalom_aggressive(processor, window):
+    return bool(processor.detect_slalom_aggressive(window.boxes, window.labels, window.flow_x, window.width,
+                                                   weaving=window.weaving))
+
+
+@register_detector('intentional_pinch_entry', ('boxes', 'tracks', 'flow'))
+def _intentional_pinch_entry(processor, window):
+    # Detect intentional aggressive pinch point entry
+    if not (window.is_pinch and len(window.prev_boxes) > 0):
+        return False
+    return processor.detect_intentional_pinch_entry(window.boxes, window.prev_boxes, window.flow_x, window.width)
+
+
+@register_detector('avg_motion', ('flow',), default=0.0)
+def _avg_motion(processor, window):
+    # Raw speed proxy behind 'speed', kept so thresholds can be re-tuned
+    # offline (threshold_sweep.py) without re-running the video
+    return float(window.avg_motion)
@@ -0,0 +1,407 @@
+# worker_pool.py
+"""
+Pre-forked pool of warm analysis workers.
+
+Without it, every worker process imports torch, loads the YOLO weights and
+trains the RiskModel before it can take its first ride. WarmWorkerPool does
+that once, in a dedicated parent process (load_pipeline_models), and then
+forks the workers. Each child starts with the models already in memory and
+shares their pages with the parent copy-on-write, so a worker is ready in
+milliseconds and adds only the memory it writes to.
+
+    pool = WarmWorkerPool(workers=4)
+    result = pool.run("ride.mp4", progress_callback=print)   # blocks
+    future = pool.submit("ride2.mp4")                         # or not
+    print(format_report(pool.report()))
+    pool.shutdown()
+
+The parent that forks is not the caller's process. The caller (e.g. the
+multi-threaded Streamlit server, from a job thread holding a lock) only
+spawns it, which is a fork+exec. The parent is a fresh interpreter with a
+single thread: it loads the models, runs no inference (so torch has no
+intra-op thread pool yet), freezes the GC and forks. No other thread can
+hold a lock or be half-way through an update when a worker is forked.
+gc.freeze keeps the collector from walking the inherited objects and
+dirtying their pages.
+
+The parent runs one event loop over the pool's pipe, each worker's pipe and
+each worker's process sentinel. It passes each ride to the worker the pool
+assigned it to, relays the workers' events back, and learns that a worker
+died as soon as it does, however busy the pipes are. The pool records a
+ride's worker before sending it. When a worker exits, the pool fails its
+ride, even one the worker had not started yet, and the parent forks a
+replacement. If the parent itself dies, every unfinished ride fails.
+
+Memory is read from /proc/<pid>/smaps_rollup. PSS splits shared pages
+between the processes sharing them, and USS is what a process holds alone.
+The sum of PSS is what the pool really costs. Without /proc (not Linux) the
+memory fields are None. Forking needs the 'fork' start method (Linux, macOS).
+
+    python worker_pool.py ride1.mp4 ride2.mp4 --workers 2
+"""
+import argparse
+import atexit
+import collections
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+import weakref
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+DEFAULT_WORKERS = 2
+
+_MODELS = None  # set in the pool's parent before forking; inherited by every worker
+
+
+def _smaps_rollup(pid):
+    """{'rss_mb', 'pss_mb', 'uss_mb', 'shared_mb'} of a process, or None without /proc."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024.0
+    except OSError:
+        return None
+    private = fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+    return {
+        'rss_mb': fields.get("Rss", 0.0),
+        'pss_mb': fields.get("Pss", 0.0),
+        'uss_mb': private,
+        'shared_mb': fields.get("Rss", 0.0) - private,
+    }
+
+
+def _worker_main(index, conn, forked_at, inherited):
+    # Pipe ends of the parent and of other workers, copied by the fork
+    for other in inherited:
+        other.close()
+    conn.send(('ready', index, os.getpid(), time.monotonic() - forked_at))
+    from process_video import process_ride_video
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, video_path = task
+
+        def forward(event, task_id=task_id):
+            conn.send(('progress', index, task_id, event))
+
+        try:
+            result = process_ride_video(video_path, progress_callback=forward, models=_MODELS)
+            conn.send(('done', index, task_id, result))
+        except Exception:
+            conn.send(('error', index, task_id, traceback.format_exc()))
+
+
+def _parent_main(workers, control):
+    """The pool's parent process: loads the models, forks the workers and relays their rides."""
+    global _MODELS
+    try:
+        from process_video import load_pipeline_models
+        started = time.perf_counter()
+        _MODELS = load_pipeline_models()
+        control.send(('loaded', time.perf_counter() - started, _smaps_rollup(os.getpid())))
+    except Exception:
+        control.send(('failed', traceback.format_exc()))
+        return
+    # Objects that exist now are shared; keep the collector off their pages
+    gc.freeze()
+    ctx = mp.get_context("fork")
+    processes = {}  # worker index -> Process
+    pipes = {}      # worker index -> this end of its pipe
+
+    def fork(index):
+        forked_at = time.monotonic()
+        conn, child_conn = ctx.Pipe()
+        inherited = [control, conn] + list(pipes.values())
+        process = ctx.Process(target=_worker_main, args=(index, child_conn, forked_at, inherited),
+                              name=f"ride-worker-{index}", daemon=True)
+        process.start()
+        child_conn.close()
+        processes[index], pipes[index] = process, conn
+        control.send(('forked', index, process.pid, 1000.0 * (time.monotonic() - forked_at)))
+
+    for index in range(workers):
+        fork(index)
+    running = True
+    while running:
+        sentinels = {process.sentinel: index for index, process in processes.items()}
+        readers = {conn: index for index, conn in pipes.items()}
+        ready = wait([control] + list(readers) + list(sentinels))
+        for source in ready:
+            if source is control:
+                try:
+                    message = control.recv()
+                except EOFError:  # the pool's process is gone
+                    message = None
+                if message is None:
+                    running = False
+                    continue
+                _, index, pid, task = message
+                # A ride for a worker that has since been replaced was already failed
+                if index in pipes and processes[index].pid == pid:
+                    pipes[index].send(task)
+            elif source in readers:
+                try:
+                    control.send(source.recv())
+                except (EOFError, OSError):
+                    # Died mid-message; the sentinel reports the exit
+                    pipes.pop(readers[source]).close()
+        for sentinel, index in sentinels.items():
+            if sentinel in ready:
+                process = processes.pop(index)
+                process.join()
+                if index in pipes:
+                    pipes.pop(index).close()
+                control.send(('exited', index, process.pid, process.exitcode))
+                if running:
+                    fork(index)
+    for conn in pipes.values():
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+    for process in processes.values():
+        process.join(10.0)
+        if process.is_alive():
+            process.terminate()
+
+
+def _stop_parent(control, process, timeout):
+    """Tells the pool's parent to stop its workers and exit; kills it if it does not."""
+    try:
+        control.send(None)
+    except OSError:
+        pass
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    control.close()
+
+
+class WarmWorkerPool:
+    """
+    A parent process that loads one detector and RiskModel, and `workers`
+    processes forked from it that share them.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        ctx = mp.get_context("spawn")
+        self._control, parent_conn = ctx.Pipe()
+        self._parent = ctx.Process(target=_parent_main, args=(self.workers, parent_conn),
+                                   name="ride-pool-parent")
+        self._parent.start()
+        parent_conn.close()
+        # The parent is not daemonic (it has children), so multiprocessing's
+        # exit handler would wait for it; this one, registered later, runs first
+        self._finalizer = weakref.finalize(self, _stop_parent, self._control, self._parent, 10.0)
+        self._finalizer.atexit = False
+        atexit.register(self._finalizer)
+
+        self._ids = itertools.count()
+        self._futures = {}     # task id -> (Future, progress_callback)
+        self._pending = collections.deque()  # (task id, video path) not yet given to a worker
+        self._idle = set()     # worker indexes ready for a ride
+        self._running = {}     # worker index -> task id, recorded before the ride is sent
+        self._spawn = {}       # worker index -> {'pid', 'fork_ms', 'ready_ms'}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        try:
+            message = self._control.recv()
+        except EOFError:
+            message = ('failed', f"exited with code {self._parent.exitcode}")
+        if message[0] == 'failed':
+            self._finalizer()
+            raise RuntimeError(f"Warm pool could not load the models:\n{message[1]}")
+        _, self.model_load_s, self.parent_memory = message
+        self._dispatcher = threading.Thread(target=self._dispatch, name="warm-pool-events", daemon=True)
+        self._dispatcher.start()
+        self.wait_ready()
+
+    def wait_ready(self, timeout=30.0):
+        """Blocks until every worker has reported in (or timeout seconds pass)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if len(self._spawn) == self.workers and all(s['ready_ms'] is not None
+                                                            for s in self._spawn.values()):
+                    return True
+            time.sleep(0.005)
+        return False
+
+    def submit(self, video_path, progress_callback=None):
+        """Queues a ride; returns a Future of process_ride_video's result."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WarmWorkerPool is shut down")
+            task_id = next(self._ids)
+            self._futures[task_id] = (future, progress_callback)
+            self._pending.append((task_id, video_path))
+            self._assign()
+        return future
+
+    def run(self, video_path, progress_callback=None):
+        """process_ride_video(video_path) on a warm worker; usable as JobManager's runner."""
+        return self.submit(video_path, progress_callback).result()
+
+    def _assign(self):
+        """Gives pending rides to idle workers. Called with the lock held."""
+        while self._pending and self._idle:
+            index = self._idle.pop()
+            task_id, video_path = self._pending.popleft()
+            self._running[index] = task_id
+            try:
+                self._control.send(('run', index, self._spawn[index]['pid'], (task_id, video_path)))
+            except OSError:
+                return  # the parent is gone; _dispatch fails every ride
+
+    def _dispatch(self):
+        while True:
+            try:
+                message = self._control.recv()
+            except (EOFError, OSError):
+                self._fail_all("WarmWorkerPool is shut down" if self._closed else
+                               f"Warm pool parent exited with code {self._parent.exitcode}")
+                return
+            kind, index = message[0], message[1]
+            future = callback = None
+            with self._lock:
+                if kind == 'forked':
+                    _, _, pid, fork_ms = message
+                    self._spawn[index] = {'pid': pid, 'fork_ms': fork_ms, 'ready_ms': None}
+                elif kind == 'ready':
+                    self._spawn[index]['ready_ms'] = 1000.0 * message[3]
+                    self._idle.add(index)
+                elif kind == 'exited':
+                    self._idle.discard(index)
+                    task_id = self._running.pop(index, None)
+                    future, _ = self._futures.pop(task_id, (None, None))
+                else:
+                    future, callback = self._futures.get(message[2], (None, None))
+                    if kind in ('done', 'error'):
+                        self._futures.pop(message[2], None)
+                        self._running.pop(index, None)
+                        self._idle.add(index)
+                if not self._closed:
+                    self._assign()
+            if kind == 'exited':
+                _, _, pid, exitcode = message
+                if future is not None:
+                    future.set_exception(RuntimeError(f"Worker {index} (pid {pid}) exited with code {exitcode}"))
+                if not self._closed:
+                    print(f"Worker {index} exited with code {exitcode}; forking a replacement")
+            elif future is None:
+                continue
+            elif kind == 'progress':
+                if callback is not None:
+                    callback(message[3])
+            elif kind == 'done':
+                future.set_result(message[3])
+            elif kind == 'error':
+                future.set_exception(RuntimeError(f"Analysis failed in a worker:\n{message[3]}"))
+
+    def _fail_all(self, reason):
+        """Fails every unfinished ride (the parent, and with it every worker, is gone)."""
+        with self._lock:
+            futures = [future for future, _ in self._futures.values()]
+            self._futures.clear()
+            self._pending.clear()
+            self._running.clear()
+            self._idle.clear()
+            self._closed = True
+        for future in futures:
+            future.set_exception(RuntimeError(reason))
+
+    def report(self):
+        """Spawn latency and memory of the parent (which loaded the models) and every worker."""
+        with self._lock:
+            spawn = {i: dict(s) for i, s in self._spawn.items()}
+        workers = []
+        for index in sorted(spawn):
+            memory = _smaps_rollup(spawn[index]['pid'])
+            workers.append(dict(spawn[index], index=index, memory=memory))
+        parent = _smaps_rollup(self._parent.pid)
+        ready = [w['ready_ms'] for w in workers if w['ready_ms'] is not None]
+        measured = parent is not None and all(w['memory'] for w in workers)
+        return {
+            'workers': workers,
+            'model_load_s': self.model_load_s,
+            'ready_ms_max': max(ready) if ready else None,
+            'parent_memory': parent,
+            'parent_memory_after_load': self.parent_memory,
+            # What the pool costs (PSS counts each shared page once overall),
+            # against every worker holding its own copy of the parent
+            'total_pss_mb': (parent['pss_mb'] + sum(w['memory']['pss_mb'] for w in workers)
+                             if measured else None),
+            'unshared_estimate_mb': parent['rss_mb'] * (len(workers) + 1) if measured else None,
+        }
+
+    def shutdown(self, timeout=10.0):
+        """Stops the workers and their parent; rides not yet finished fail."""
+        with self._lock:
+            self._closed = True
+        self._finalizer.detach()
+        _stop_parent(self._control, self._parent, timeout)
+        self._dispatcher.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def format_report(report):
+    """Multi-line summary of WarmWorkerPool.report()."""
+    lines = [f"Warm pool: {len(report['workers'])} workers forked after {report['model_load_s']:.1f}s of "
+             f"model loading; slowest ready in {report['ready_ms_max'] or 0:.0f} ms"]
+    for w in report['workers']:
+        line = f"  worker {w['index']} (pid {w['pid']}): fork {w['fork_ms']:.0f} ms, ready {w['ready_ms'] or 0:.0f} ms"
+        if w['memory']:
+            m = w['memory']
+            line += (f", RSS {m['rss_mb']:.0f} MB ({m['shared_mb']:.0f} shared, "
+                     f"{m['uss_mb']:.0f} private), PSS {m['pss_mb']:.0f} MB")
+        lines.append(line)
+    if report['total_pss_mb'] is not None:
+        lines.append(f"  parent RSS {report['parent_memory']['rss_mb']:.0f} MB; pool total PSS "
+                     f"{report['total_pss_mb']:.0f} MB vs ~{report['unshared_estimate_mb']:.0f} MB "
+                     f"with an unshared copy per process")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse rides on a pre-forked pool of warm workers.")
+    parser.add_argument("video_paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    with WarmWorkerPool(args.workers) as pool:
+        print(format_report(pool.report()))
+        started = time.perf_counter()
+        futures = [(path, pool.submit(path)) for path in args.video_paths]
+        for path, future in futures:
+            try:
+                result = future.result()
+                print(f"{path}: {result['verdict'] if result else 'no result'}")
+            except RuntimeError as e:
+                print(f"{path}: {e}")
+        print(f"{len(futures)} rides in {time.perf_counter() - started:.1f}s")
+        print(format_report(pool.report()))
+
+
+if __name__ == "__main__":
+    main()